@@ -0,0 +1,863 @@
+#!/usr/bin/env python3
+"""
+Headless HTTP API for YouTube Transcript LLM App.
+
+Serves transcripts, summaries, suggested questions and chat answers as JSON, without
+the Streamlit UI, and streams answers as server-sent events. Built on asyncio and the
+standard library: each worker process runs one event loop that reads requests and
+writes responses, while the blocking transcript and OpenAI calls (with their routing,
+retries and caches) run on a bounded thread pool, so a slow upstream never stalls
+the loop and other connections keep being served.
+
+Endpoints:
+    GET  /healthz
+    GET  /metrics                                  Prometheus text format
+    GET  /v1/videos/{video}/transcript?languages=en,de
+    POST /v1/summarize  {"video": ..., "languages": [...], "stream": false}
+    POST /v1/questions  {"video": ..., "num_questions": 5}
+    POST /v1/chat       {"video": ..., "message": ..., "history": [...], "stream": true}
+
+`video` is a YouTube URL or video ID. Streamed responses send `delta` events with
+{"text": ...}, then one `done` event with the whole answer and its timing, or an
+`error` event if the answer fails part way.
+
+Example:
+    python api.py --port 8080 --workers 4
+    curl -N localhost:8080/v1/chat -d '{"video": "dQw4w9WgXcQ", "message": "Who is speaking?"}'
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from llm import interactions, memory, retrieval
+from llm.tokens import count_tokens
+from utils import instrumentation, transcript_utils
+from utils.resilience import CircuitOpenError, ResilienceError
+from utils.shared_cache import get_shared_cache
+
+logger = logging.getLogger("api")
+
+# Threads per worker for blocking transcript and OpenAI calls; bounds upstream concurrency
+API_THREADS = int(os.getenv("API_THREADS", 32))
+# Requests in progress per worker beyond which new ones are refused with 503
+API_MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", 256))
+MAX_BODY_BYTES = 1024 * 1024
+# Seconds an idle keep-alive connection (or a slow client's request) may hold a socket
+KEEPALIVE_TIMEOUT = 15.0
+# Seconds a stopping worker gives requests in progress to finish
+SHUTDOWN_GRACE = 10.0
+
+# Same process-wide caches as the Streamlit app, so concurrent requests for a video share one fetch
+transcript_cache = get_shared_cache("transcripts", max_entries=128, max_bytes=128 * 1024 * 1024)
+retrieval_cache = get_shared_cache("retrieval", max_entries=64, max_bytes=256 * 1024 * 1024)
+
+# HTTP status for transcript lookups that did not produce a transcript
+TRANSCRIPT_STATUS_CODES = {"not_found": 404, "disabled": 404, "unavailable": 404, "error": 502}
+
+# A handler answers with (status, JSON payload or pre-encoded body) or with (event, data) pairs to stream
+Response = Union[Tuple[int, Any], AsyncIterator[Tuple[str, Dict[str, Any]]]]
+
+
+class HTTPError(Exception):
+    """Ends a request with an error status and a body of {"error": {"type": ..., "message": ...}}."""
+
+    def __init__(self, status: int, message: str, kind: str = "invalid_request",
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.kind = kind
+        self.headers = headers or {}
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    __slots__ = ("method", "path", "query", "headers", "body", "keep_alive")
+
+    def __init__(self, method: str, path: str, query: Dict[str, List[str]], headers: Dict[str, str],
+                 body: bytes, keep_alive: bool):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+
+    def json(self) -> Dict[str, Any]:
+        """
+        Decode the body as a JSON object.
+
+        Returns:
+            Dict[str, Any]: Decoded body (empty when there is none)
+        """
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPError(400, "Request body is not valid JSON.")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object.")
+        return payload
+
+
+async def read_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[Request]:
+    """
+    Read one request from a connection.
+
+    Args:
+        reader (asyncio.StreamReader): Connection input
+        writer (asyncio.StreamWriter): Connection output, for '100 Continue'
+
+    Returns:
+        Optional[Request]: The request, or None if the client closed or went idle
+    """
+    try:
+        line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+        while line in (b"\r\n", b"\n"):
+            line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    if not line:
+        return None
+
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+        raise HTTPError(400, "Malformed request line.")
+    method, target, version = parts
+
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+        if line in (b"\r\n", b"\n"):
+            break
+        if not line:
+            raise asyncio.IncompleteReadError(b"", None)
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(400, "Malformed header line.")
+        headers[name.strip().lower()] = value.strip()
+        if len(headers) > 100:
+            raise HTTPError(431, "Too many headers.")
+
+    if headers.get("transfer-encoding"):
+        raise HTTPError(411, "Send the request body with a Content-Length.")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length.")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body is larger than {MAX_BODY_BYTES} bytes.")
+    if length and headers.get("expect", "").lower() == "100-continue":
+        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+    body = await asyncio.wait_for(reader.readexactly(length), KEEPALIVE_TIMEOUT) if length else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    return Request(method.upper(), unquote(url.path), parse_qs(url.query), headers, body, keep_alive)
+
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def encode_json(payload: Any) -> bytes:
+    """
+    Encode a JSON response body.
+
+    Args:
+        payload (Any): JSON-serializable value
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def error_response(error: BaseException) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+    """
+    Map an exception raised while handling a request to an HTTP error.
+
+    Args:
+        error (BaseException): The exception
+
+    Returns:
+        Tuple[int, Dict[str, Any], Dict[str, str]]: Status, JSON body and extra headers
+    """
+    if isinstance(error, HTTPError):
+        status, kind, message, headers = error.status, error.kind, error.message, error.headers
+    elif isinstance(error, CircuitOpenError):
+        status, kind, message = 503, "upstream_unavailable", str(error)
+        headers = {"Retry-After": str(max(1, math.ceil(error.retry_in)))}
+    elif isinstance(error, ResilienceError):
+        status, kind, message, headers = 503, "upstream_unavailable", str(error), {"Retry-After": "1"}
+    elif getattr(error, "status_code", None):
+        # An upstream API error that retries and model fallbacks could not get past
+        status, kind, message, headers = 502, "upstream_error", str(error), {}
+    else:
+        logger.error("Request failed", exc_info=error)
+        status, kind, message, headers = 500, "internal_error", "Internal server error.", {}
+    return status, {"error": {"type": kind, "message": message}}, headers
+
+
+async def iterate_in_thread(make_iterator: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    """
+    Run a blocking iterator on the worker's thread pool and yield its items on the event loop.
+
+    The iterator runs in a copy of the caller's context, so its spans join the request's
+    trace. Closing this generator early (e.g. the client went away) makes the producer
+    stop at its next item and close the iterator, which closes any upstream stream.
+
+    Args:
+        make_iterator (Callable[[], Iterator[Any]]): Creates the iterator; called on the pool
+
+    Yields:
+        Any: Items of the iterator; its exception, if any, is raised here
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def post(kind: str, value: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+        except RuntimeError:
+            # The loop has already closed (worker shutting down); nobody is listening
+            stop.set()
+
+    def produce() -> None:
+        iterator = None
+        try:
+            iterator = make_iterator()
+            for item in iterator:
+                if stop.is_set():
+                    return
+                post("item", item)
+        except Exception as e:
+            post("error", e)
+        else:
+            post("end", None)
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    loop.run_in_executor(None, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+
+
+def _video_id(value: Any) -> str:
+    video_id = transcript_utils.extract_video_id(value.strip()) if isinstance(value, str) else None
+    if not video_id:
+        raise HTTPError(400, "'video' must be a YouTube URL or video ID.")
+    return video_id
+
+
+def _languages(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, list):
+        value = ",".join(value) if all(isinstance(code, str) for code in value) else None
+    if not isinstance(value, str):
+        raise HTTPError(400, "'languages' must be a list of language codes.")
+    return [code.strip() for code in value.split(",") if code.strip()] or None
+
+
+def _history(value: Any) -> List[Dict[str, str]]:
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(
+            isinstance(message, dict) and message.get("role") in ("user", "assistant")
+            and isinstance(message.get("content"), str) for message in value):
+        raise HTTPError(400, "'history' must be a list of {\"role\": \"user\"|\"assistant\", \"content\": ...}.")
+    return value
+
+
+def _flag(body: Dict[str, Any], name: str, default: bool) -> bool:
+    value = body.get(name, default)
+    if not isinstance(value, bool):
+        raise HTTPError(400, f"'{name}' must be true or false.")
+    return value
+
+
+async def load_transcript(video: Any, languages: Optional[List[str]] = None):
+    """
+    Resolve a video's transcript, sharing one fetch between concurrent requests.
+
+    Args:
+        video (Any): YouTube URL or video ID from the request
+        languages (List[str], optional): Preferred language codes
+
+    Returns:
+        TranscriptResult: A transcript with status 'ok'; anything else raises HTTPError
+    """
+    video_id = _video_id(video)
+    key = video_id if not languages else f"{video_id}:{','.join(languages)}"
+    result = await asyncio.to_thread(
+        transcript_cache.get_or_compute,
+        key,
+        lambda: transcript_utils.get_transcript_result(video_id, languages),
+        should_cache=lambda result: result.status != "error"
+    )
+    if not result.ok:
+        raise HTTPError(TRANSCRIPT_STATUS_CODES.get(result.status, 502), result.message,
+                        kind=f"transcript_{result.status}")
+    return result
+
+
+def chat_context(key: str, result, message: str, history: List[Dict[str, str]]) -> Tuple[Optional[str], List[Dict]]:
+    """
+    Choose the context and earlier turns sent with a chat question, as the app does.
+
+    Long transcripts are answered from the excerpts most relevant to the question,
+    unless it is about the whole video. History from the client is fitted to the
+    conversation token budget, with older turns summarized extractively.
+
+    Args:
+        key (str): Cache key of the transcript
+        result (TranscriptResult): The video's transcript
+        message (str): The question
+        history (List[Dict[str, str]]): Earlier turns, oldest first
+
+    Returns:
+        Tuple[Optional[str], List[Dict]]: Context for this turn (None sends the whole
+            transcript) and the history as chat messages
+    """
+    fitted = memory.ConversationMemory()
+    for turn in history:
+        fitted.add(turn["role"], turn["content"])
+
+    with instrumentation.span("api.retrieval") as attrs:
+        if count_tokens(result.text) <= retrieval.RETRIEVAL_MIN_TOKENS or \
+                retrieval.WHOLE_VIDEO_PATTERN.search(message):
+            return None, fitted.messages()
+        index = retrieval_cache.get_or_compute(key, lambda: retrieval.build_retrieval_index(result))
+        excerpts = index.search(message, k=retrieval.RETRIEVAL_TOP_K)
+        attrs["excerpts"] = len(excerpts)
+    if not excerpts:
+        return None, fitted.messages()
+    return f"{retrieval.EXCERPTS_LABEL}:\n\n{retrieval.format_excerpts(excerpts)}", fitted.messages()
+
+
+async def answer_events(result, request: str, history: Optional[List[Dict]] = None,
+                        excerpts: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream an answer about a transcript as server-sent events.
+
+    Args:
+        result (TranscriptResult): The video's transcript
+        request (str): Instruction or question
+        history (List[Dict], optional): Earlier conversation as chat messages
+        excerpts (str, optional): Context sent instead of the whole transcript
+
+    Yields:
+        Tuple[str, Dict[str, Any]]: ('delta', {'text'}) events, then ('done', {...}) with the answer
+    """
+    timing: Dict[str, float] = {}
+    answer = []
+    deltas = iterate_in_thread(lambda: interactions.analyze_transcript_stream(
+        result.text, request, segments=result.transcript, metrics=timing, history=history, excerpts=excerpts
+    ))
+    try:
+        async for delta in deltas:
+            answer.append(delta)
+            yield "delta", {"text": delta}
+    finally:
+        await deltas.aclose()
+    yield "done", {
+        "video_id": result.video_id,
+        "answer": "".join(answer),
+        "ttft_ms": round(timing.get("ttft_seconds", 0.0) * 1000, 1),
+        "total_ms": round(timing.get("total_seconds", 0.0) * 1000, 1),
+    }
+
+
+async def collect_answer(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Wait for a streamed answer and return its final 'done' payload.
+
+    Args:
+        events (AsyncIterator[Tuple[str, Dict[str, Any]]]): Events from answer_events
+
+    Returns:
+        Dict[str, Any]: The 'done' payload
+    """
+    async for event, data in events:
+        if event == "done":
+            return data
+    raise RuntimeError("Answer stream ended without a result")
+
+
+async def healthz(request: Request) -> Response:
+    return 200, {"status": "ok"}
+
+
+async def metrics(request: Request) -> Response:
+    text = instrumentation.get_registry().to_prometheus()
+    return 200, text.encode("utf-8")
+
+
+async def get_transcript(request: Request, video: str) -> Response:
+    result = await load_transcript(video, _languages(",".join(request.query.get("languages", [])) or None))
+    metadata = await asyncio.to_thread(transcript_utils.get_video_metadata, result.video_id)
+
+    def payload() -> bytes:
+        # Segments of a long video run to megabytes of JSON; encode them off the loop
+        return encode_json({
+            "video_id": result.video_id,
+            "title": metadata.get("title"),
+            "language_code": result.language_code,
+            "is_generated": result.is_generated,
+            "translated_from": result.translated_from,
+            "text": result.text,
+            "segments": result.transcript.to_segments(),
+        })
+
+    return 200, await asyncio.to_thread(payload)
+
+
+async def summarize(request: Request) -> Response:
+    body = request.json()
+    result = await load_transcript(body.get("video"), _languages(body.get("languages")))
+    if _flag(body, "stream", False):
+        return answer_events(result, interactions.SUMMARY_REQUEST)
+    summary = await asyncio.to_thread(interactions.summarize_transcript, result.text, result.transcript)
+    return 200, {"video_id": result.video_id, "summary": summary}
+
+
+async def questions(request: Request) -> Response:
+    body = request.json()
+    num_questions = body.get("num_questions", 5)
+    if not isinstance(num_questions, int) or isinstance(num_questions, bool) or not 1 <= num_questions <= 20:
+        raise HTTPError(400, "'num_questions' must be an integer from 1 to 20.")
+    result = await load_transcript(body.get("video"), _languages(body.get("languages")))
+    suggested = await asyncio.to_thread(interactions.suggest_questions, result.text, num_questions, result.transcript)
+    return 200, {"video_id": result.video_id, "questions": suggested}
+
+
+async def chat(request: Request) -> Response:
+    body = request.json()
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise HTTPError(400, "'message' must be a non-empty string.")
+    history = _history(body.get("history"))
+    stream = _flag(body, "stream", True)
+    languages = _languages(body.get("languages"))
+    result = await load_transcript(body.get("video"), languages)
+    key = result.video_id if not languages else f"{result.video_id}:{','.join(languages)}"
+    excerpts, fitted = await asyncio.to_thread(chat_context, key, result, message, history)
+
+    events = answer_events(result, message, history=fitted, excerpts=excerpts)
+    if stream:
+        return events
+    return 200, await collect_answer(events)
+
+
+# (method, path pattern, handler, name); path groups are passed to the handler
+ROUTES = [
+    ("GET", re.compile(r"/healthz"), healthz, "healthz"),
+    ("GET", re.compile(r"/metrics"), metrics, "metrics"),
+    ("GET", re.compile(r"/v1/videos/([^/]+)/transcript"), get_transcript, "transcript"),
+    ("POST", re.compile(r"/v1/summarize"), summarize, "summarize"),
+    ("POST", re.compile(r"/v1/questions"), questions, "questions"),
+    ("POST", re.compile(r"/v1/chat"), chat, "chat"),
+]
+
+
+class APIServer:
+    """
+    One worker's request handling: routing, load shedding, responses and shutdown.
+
+    Every request runs under an instrumentation trace named 'api.<route>', so the
+    pipeline spans of the transcript and LLM calls it makes are attached to it.
+    """
+
+    def __init__(self, max_inflight: int = API_MAX_INFLIGHT):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        # Open connections (task -> writer) and those currently handling a request
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._busy = set()
+
+    def _match(self, request: Request) -> Tuple[Callable, str, Tuple[str, ...]]:
+        allowed = []
+        for method, pattern, handler, name in ROUTES:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            if method == request.method:
+                return handler, name, match.groups()
+            allowed.append(method)
+        if allowed:
+            raise HTTPError(405, f"Use {', '.join(allowed)} for {request.path}.", kind="method_not_allowed",
+                            headers={"Allow": ", ".join(allowed)})
+        raise HTTPError(404, f"No endpoint at {request.path}.", kind="not_found")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve requests on one connection until it closes, goes idle or a stream ends.
+
+        Args:
+            reader (asyncio.StreamReader): Connection input
+            writer (asyncio.StreamWriter): Connection output
+        """
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, writer)
+                except HTTPError as e:
+                    status, body, headers = error_response(e)
+                    await self._send(writer, status, encode_json(body), keep_alive=False, headers=headers)
+                    return
+                except ValueError:
+                    # Request line or a header longer than the stream limit
+                    await self._send(writer, 431, encode_json({"error": {
+                        "type": "invalid_request", "message": "Request head too large."}}), keep_alive=False)
+                    return
+                if request is None:
+                    return
+                self._busy.add(task)
+                try:
+                    if not await self._respond(request, writer):
+                        return
+                finally:
+                    self._busy.discard(task)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _respond(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        # Returns whether the connection can serve another request
+        try:
+            handler, name, args = self._match(request)
+        except HTTPError as e:
+            status, body, headers = error_response(e)
+            await self._send(writer, status, encode_json(body), request.keep_alive, headers)
+            return request.keep_alive
+
+        if self.inflight >= self.max_inflight and name not in ("healthz", "metrics"):
+            status, body, headers = error_response(HTTPError(
+                503, "Server is at capacity; retry shortly.", kind="overloaded", headers={"Retry-After": "1"}
+            ))
+            await self._send(writer, status, encode_json(body), request.keep_alive, headers)
+            return request.keep_alive
+
+        self.inflight += 1
+        instrumentation.get_registry().set_gauge("api_inflight_requests", self.inflight)
+        try:
+            with instrumentation.trace(f"api.{name}", method=request.method, path=request.path), \
+                    instrumentation.span(f"api.{name}") as attrs:
+                try:
+                    response = await handler(request, *args)
+                    if not isinstance(response, tuple):
+                        return await self._stream(response, writer, attrs)
+                    status, payload = response
+                    body = payload if isinstance(payload, bytes) else encode_json(payload)
+                    content_type = "text/plain; version=0.0.4" if name == "metrics" else "application/json"
+                    headers = {}
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    status, error_body, headers = error_response(e)
+                    body, content_type = encode_json(error_body), "application/json"
+                    attrs["error"] = error_body["error"]["type"]
+                attrs["status"] = status
+                await self._send(writer, status, body, request.keep_alive, headers, content_type)
+                return request.keep_alive
+        finally:
+            self.inflight -= 1
+            instrumentation.get_registry().set_gauge("api_inflight_requests", self.inflight)
+
+    async def _stream(self, events: AsyncIterator[Tuple[str, Dict[str, Any]]], writer: asyncio.StreamWriter,
+                      attrs: Dict[str, Any]) -> bool:
+        # Wait for the first event before answering, so failures up to then get a proper status
+        try:
+            try:
+                first = await events.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                status, body, headers = error_response(e)
+                attrs["status"], attrs["error"] = status, body["error"]["type"]
+                await self._send(writer, status, encode_json(body), False, headers)
+                return False
+
+            attrs["status"] = 200
+            writer.write(_head(200, {
+                "Content-Type": "text/event-stream; charset=utf-8",
+                "Cache-Control": "no-cache",
+                "Connection": "close",
+                "X-Accel-Buffering": "no",
+            }))
+            if first is not None:
+                writer.write(_sse(*first))
+            await writer.drain()
+            try:
+                async for event in events:
+                    writer.write(_sse(*event))
+                    await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                # Too late to change the status: report the failure in the stream
+                _, body, _ = error_response(e)
+                attrs["error"] = body["error"]["type"]
+                writer.write(_sse("error", body["error"]))
+                await writer.drain()
+        finally:
+            await events.aclose()
+        # The stream is delimited by closing the connection
+        return False
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, keep_alive: bool,
+                    headers: Optional[Dict[str, str]] = None, content_type: str = "application/json") -> None:
+        head = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        head.update(headers or {})
+        writer.write(_head(status, head) + body)
+        await writer.drain()
+
+    async def shutdown(self, grace: float = SHUTDOWN_GRACE) -> None:
+        """
+        Close idle connections and give requests in progress up to `grace` seconds to finish.
+
+        Args:
+            grace (float): Seconds to wait before dropping the connections still busy
+        """
+        # Closing the socket ends a connection's wait for its next request
+        for task, writer in list(self._connections.items()):
+            if task not in self._busy:
+                writer.close()
+        pending = list(self._connections)
+        if pending:
+            _, still_running = await asyncio.wait(pending, timeout=grace)
+            for task in still_running:
+                self._connections[task].transport.abort()
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+
+def bind(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    """
+    Open the listening socket shared by all workers.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port (0 picks a free one)
+        backlog (int): Pending connection queue length
+
+    Returns:
+        socket.socket: Listening socket
+    """
+    return socket.create_server((host, port), backlog=backlog)
+
+
+async def run_worker(sock: socket.socket, threads: int = API_THREADS) -> None:
+    """
+    Serve requests on a listening socket until SIGINT or SIGTERM.
+
+    Args:
+        sock (socket.socket): Listening socket from bind()
+        threads (int): Size of the thread pool for blocking calls
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=threads, thread_name_prefix="api"))
+    # Create the OpenAI client before accepting connections, so the first requests do not pay for it
+    await asyncio.to_thread(_warm_up)
+    app = APIServer()
+    server = await asyncio.start_server(app.handle_connection, sock=sock)
+    stopping = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows or off the main thread; Ctrl-C still ends the loop
+            pass
+    logger.info("Worker %d serving on %s", os.getpid(), sock.getsockname())
+    await stopping.wait()
+    server.close()
+    await app.shutdown()
+    await server.wait_closed()
+
+
+def _warm_up() -> None:
+    # The API reads its key from the environment only; Streamlit secrets do not apply here
+    if not os.getenv("OPENAI_API_KEY"):
+        logger.warning("OPENAI_API_KEY is not set; summary, questions and chat requests will fail")
+        return
+    try:
+        interactions.get_client()
+    except Exception as e:
+        logger.warning("OpenAI client unavailable; summary, questions and chat requests will fail: %s", e)
+
+
+def _run_worker_process(sock: socket.socket, threads: int) -> None:
+    try:
+        asyncio.run(run_worker(sock, threads))
+    except KeyboardInterrupt:
+        pass
+
+
+def spawn_workers(sock: socket.socket, workers: int, threads: int = API_THREADS) -> List[int]:
+    """
+    Fork worker processes that accept connections on a shared socket.
+
+    Each worker has its own event loop, thread pool and in-memory caches; the kernel
+    spreads incoming connections across them.
+
+    Args:
+        sock (socket.socket): Listening socket from bind()
+        workers (int): Number of worker processes
+        threads (int): Thread pool size per worker
+
+    Returns:
+        List[int]: Worker process IDs
+    """
+    # Import the OpenAI SDK once here so the forked workers share it. Each worker builds its
+    # own client in run_worker, since the client's pooled connections must not cross a fork
+    import openai  # noqa: F401
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                _run_worker_process(sock, threads)
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        pids.append(pid)
+    return pids
+
+
+def stop_workers(pids: List[int], timeout: float = SHUTDOWN_GRACE + 5) -> None:
+    """
+    Ask worker processes to shut down gracefully and wait for them, killing stragglers.
+
+    Args:
+        pids (List[int]): Worker process IDs from spawn_workers()
+        timeout (float): Seconds to wait before killing
+    """
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + timeout
+    remaining = set(pids)
+    while remaining:
+        for pid in list(remaining):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                remaining.discard(pid)
+        if remaining:
+            if time.monotonic() > deadline:
+                for pid in remaining:
+                    os.kill(pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(0.05)
+
+
+def serve(host: str, port: int, workers: int = 1, threads: int = API_THREADS) -> None:
+    """
+    Run the API until interrupted.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on
+        workers (int): Worker processes (more than one needs os.fork)
+        threads (int): Thread pool size per worker
+    """
+    sock = bind(host, port)
+    if workers > 1 and not hasattr(os, "fork"):
+        logger.warning("Multiple workers need os.fork; running a single worker")
+        workers = 1
+    logger.info("Listening on http://%s:%d with %d worker(s)", host, sock.getsockname()[1], workers)
+    if workers == 1:
+        _run_worker_process(sock, threads)
+        return
+
+    pids = spawn_workers(sock, workers, threads)
+    sock.close()
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+    while not stopping.is_set():
+        # A worker that dies on its own takes the whole server down rather than leaving it half-sized
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid:
+            logger.error("Worker %d exited; stopping", pid)
+            pids.remove(pid)
+            break
+        stopping.wait(0.5)
+    stop_workers(pids)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve transcripts, summaries and chat answers over HTTP.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"), help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", 8080)), help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", 1)),
+                        help="Worker processes sharing the port")
+    parser.add_argument("--threads", type=int, default=API_THREADS,
+                        help="Threads per worker for transcript and OpenAI calls")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    serve(args.host, args.port, args.workers, args.threads)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,229 @@
 # Main Streamlit application
+import bisect
+import contextlib
+import os
+import time
 import streamlit as st
-from utils import transcript_utils
+from llm import corpus, interactions, memory, retrieval, routing
+from llm.response_cache import get_response_cache
+from llm.retrieval import RETRIEVAL_MIN_TOKENS, RETRIEVAL_TOP_K, WHOLE_VIDEO_PATTERN, build_retrieval_index
+from llm.tokens import count_tokens
+from utils import instrumentation, jobs, transcript_utils, transcript_view
+from utils.resilience import ResilienceError, backend_stats
+from utils.shared_cache import get_shared_cache, shared_cache_stats
+from utils.transcript import format_timestamp, parse_timestamp
+
+# Process-wide caches shared by every session, so concurrent viewers of the same
+# video trigger a single fetch (titles are memoized inside transcript_utils)
+transcript_cache = get_shared_cache("transcripts", max_entries=128, max_bytes=128 * 1024 * 1024)
+retrieval_cache = get_shared_cache("retrieval", max_entries=64, max_bytes=256 * 1024 * 1024)
+search_cache = get_shared_cache("transcript_search", max_entries=64, max_bytes=128 * 1024 * 1024)
+
+# Compute the summary, suggested questions and retrieval index in the background as soon as a video loads
+PRECOMPUTE_ARTIFACTS = os.getenv("PRECOMPUTE_ARTIFACTS", "1").lower() not in ("0", "false", "no")
+# Seconds between reruns while background jobs for the current video are still running
+JOB_POLL_INTERVAL = 1.0
+
+
+def precompute_retrieval_index(video_id, result):
+    """Build the retrieval index the first chat question would need (only long transcripts use one)."""
+    if count_tokens(result.text) <= RETRIEVAL_MIN_TOKENS:
+        return None
+    return retrieval_cache.get_or_compute(video_id, lambda: build_retrieval_index(result))
+
+
+def precompute_jobs(video_id, result):
+    """Background jobs for a video, as {name: (fn, args)}."""
+    return {
+        "retrieval_index": (precompute_retrieval_index, (video_id, result)),
+        "summary": (interactions.summarize_transcript, (result.text, result.transcript)),
+        "questions": (interactions.suggest_questions, (result.text, 5, result.transcript)),
+    }
+
+
+def start_precompute(video_id, result):
+    """
+    Queue the per-video artifacts on the shared scheduler and return this video's jobs.
+
+    Jobs are keyed by video, so reruns and other sessions on the same video reuse them.
+    Failed jobs are left failed; retry_precompute() runs one again.
+    """
+    scheduler = jobs.get_scheduler()
+    for name, (fn, args) in precompute_jobs(video_id, result).items():
+        scheduler.submit(video_id, name, fn, *args)
+    return scheduler.jobs(video_id)
+
+
+def retry_precompute(video_id, result, name):
+    """Run one failed background job for a video again (from its Retry button)."""
+    fn, args = precompute_jobs(video_id, result)[name]
+    jobs.get_scheduler().retry(video_id, name, fn, *args)
+
+
+def show_transcript_viewer(video_id, transcript):
+    """
+    Show one page of the transcript with timestamp links, a search box and a go-to-time box.
+
+    Only the visible page is sent to the browser on each rerun; searches use a
+    per-video index kept in search_cache.
+    """
+    search_column, goto_column = st.columns([3, 1])
+    query = search_column.text_input("Search transcript", key="transcript_query").strip()
+    goto = goto_column.text_input("Go to time", key="transcript_goto", placeholder="12:30").strip()
+
+    if query:
+        index = search_cache.get_or_compute(video_id, lambda: transcript_view.TranscriptSearchIndex(transcript))
+        positions = index.search(query)
+        if not positions:
+            st.caption("No segments match the search.")
+            return
+    else:
+        positions = range(len(transcript))
+        if not positions:
+            st.caption("This transcript has no segments.")
+            return
+
+    # Each video and search has its own page widget, so both start at page 1
+    page_key = f"transcript_page:{video_id}:{query}"
+    highlight = -1
+    if goto:
+        seconds = parse_timestamp(goto)
+        if seconds is None:
+            st.caption("Enter a time as seconds, M:SS or H:MM:SS.")
+        else:
+            # Jump to the first shown segment at or after that time, once per new entry
+            target = min(bisect.bisect_left(positions, transcript.index_at_time(seconds)), len(positions) - 1)
+            highlight = positions[target]
+            if st.session_state.get("transcript_goto_applied") != (page_key, goto):
+                st.session_state.transcript_goto_applied = (page_key, goto)
+                st.session_state[page_key] = target // transcript_view.PAGE_SIZE + 1
+
+    pages = transcript_view.page_count(len(positions))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key) if pages > 1 else 1
+    first, last = transcript_view.page_bounds(page, len(positions))
+    shown = positions[first:last]
+    st.caption(
+        f"{'Matches' if query else 'Segments'} {first + 1}-{last} of {len(positions)} "
+        f"({format_timestamp(transcript.starts[shown[0]])}-{format_timestamp(transcript.starts[shown[-1]])})"
+    )
+    with st.container(height=400):
+        st.markdown(transcript_view.render_segments(transcript, shown, video_id, highlight))
+
 
 # Initialize session state for chat history, current video, and transcript if they don't exist
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+
+# Token-bounded conversation memory sent to the LLM (chat_history is only for display)
+if "memory" not in st.session_state:
+    st.session_state.memory = None
+
+# Figures from the most recent retrieval-backed answer
+if "last_retrieval" not in st.session_state:
+    st.session_state.last_retrieval = None
+
+# Time-to-first-token and total latency of the most recent streamed answer
+if "last_llm_timing" not in st.session_state:
+    st.session_state.last_llm_timing = None
     
+# Spans of the most recent video load or chat turn, and the most recent profile report
+if "last_trace" not in st.session_state:
+    st.session_state.last_trace = None
+if "last_profile" not in st.session_state:
+    st.session_state.last_profile = None
+
 # Track the current video ID to know when it changes
 if "current_video_id" not in st.session_state:
     st.session_state.current_video_id = None
     
-# Store the transcript to avoid fetching it multiple times
+# Store the transcript result (a TranscriptResult) to avoid fetching it multiple times
 if "current_transcript" not in st.session_state:
     st.session_state.current_transcript = None
 
+# Shown once after a chat turn was rejected because a backend is overloaded or down
+if "outbound_notice" not in st.session_state:
+    st.session_state.outbound_notice = None
+
 st.title("YouTube Transcript LLM App")
 
+# Shared cache counters ('coalesced' = duplicate fetches avoided)
+with st.sidebar.expander("Cache statistics"):
+    st.json(shared_cache_stats())
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        st.caption("LLM responses")
+        st.json(response_cache.stats())
+
+if st.session_state.last_llm_timing:
+    with st.sidebar.expander("Response timing"):
+        st.json(st.session_state.last_llm_timing)
+
+if st.session_state.last_retrieval:
+    with st.sidebar.expander("Retrieval statistics"):
+        st.json(st.session_state.last_retrieval)
+
+# Rate limits, adaptive concurrency and circuit state of the OpenAI and YouTube backends
+if backend_stats():
+    with st.sidebar.expander("Outbound calls"):
+        st.json(backend_stats())
+
+# Which model served each kind of request, with its latency and cost
+routing_stats = routing.get_router().stats()
+if routing_stats["routes"]:
+    with st.sidebar.expander("Model routing"):
+        st.json(routing_stats)
+        st.caption("Recent decisions")
+        st.json(routing.get_router().decisions()[-10:])
+
+# Queue depth and per-job timings of background precomputation
+with st.sidebar.expander("Background jobs"):
+    st.json(jobs.get_scheduler().stats())
+    if st.session_state.current_video_id:
+        st.json([job.to_dict() for job in jobs.get_scheduler().jobs(st.session_state.current_video_id).values()])
+
+# Cross-video library: add the current video, search every indexed video
+library = corpus.get_corpus()
+with st.sidebar.expander("Video library"):
+    current = st.session_state.current_transcript
+    if current is not None and current.ok:
+        in_library = current.video_id in library
+        if st.button("Update in library" if in_library else "Add this video to the library", key="library_add"):
+            title = transcript_utils.get_video_title(f"https://www.youtube.com/watch?v={current.video_id}")
+            library.add(current.video_id, current.transcript, title)
+            library.commit()
+    library_stats = library.stats()
+    st.caption(f"{library_stats['videos']:,} videos · {library_stats['passages']:,} passages · {library_stats['disk_mb']} MB")
+    library_query = st.text_input("Search the library", key="library_query").strip()
+    if library_query:
+        hits = library.search(library_query, k=10)
+        if hits:
+            st.caption(f"{len(hits)} passages in {library.stats()['last_query_ms']:.1f} ms")
+            st.markdown(transcript_view.render_hits(hits))
+        else:
+            st.caption("No passages match the search.")
+
+# Per-stage timings, token counts and cache hits, plus an opt-in cProfile of chat turns
+with st.sidebar.expander("Instrumentation"):
+    profile_turns = st.checkbox(
+        "Profile chat turns (cProfile)",
+        value=os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes"),
+        key="profile_turns"
+    )
+    if st.session_state.last_trace:
+        st.caption(f"Last {st.session_state.last_trace['name']}: {st.session_state.last_trace['duration_ms']} ms")
+        st.json(st.session_state.last_trace["spans"])
+    st.caption("All requests")
+    st.json(instrumentation.get_registry().snapshot())
+    st.download_button(
+        "Download Prometheus metrics",
+        instrumentation.get_registry().to_prometheus(),
+        file_name="metrics.prom",
+        mime="text/plain"
+    )
+    if st.session_state.last_profile:
+        st.caption(f"Profile saved to {st.session_state.last_profile['path']}")
+        st.code(st.session_state.last_profile["report"])
+
 st.write("Welcome to the YouTube Transcript LLM App. This application allows you to analyze YouTube video transcripts using LLM technology.")
 
 # Add YouTube URL input
@@ -25,6 +233,7 @@ youtube_url = st.text_input("YouTube URL", "")
 # Add a button to manually clear chat history
 if st.button("Clear Chat History"):
     st.session_state.chat_history = []
+    st.session_state.memory = None
     st.rerun()
 
 if youtube_url:
@@ -35,44 +244,93 @@ if youtube_url:
         # Check if this is a new video - if so, clear the chat history and fetch new transcript
         if st.session_state.current_video_id != video_id:
             st.session_state.chat_history = []
+            st.session_state.memory = None
             st.session_state.current_transcript = None  # Clear stored transcript
             # Update the current video ID
             st.session_state.current_video_id = video_id
             
-        # Try to get video title
-        video_title = transcript_utils.get_video_title(youtube_url)
-        st.subheader(f"Video: {video_title}")
-        
-        # Get transcript if not already stored
-        if st.session_state.current_transcript is None:
-            # Fetch and store the transcript
-            st.session_state.current_transcript = transcript_utils.get_transcript(video_id)
+        # Trace the title and transcript lookups only when a video is first loaded
+        new_video = st.session_state.current_transcript is None
+        load_trace = instrumentation.trace("load_video", video_id=video_id) if new_video else contextlib.nullcontext()
+        with load_trace as video_trace:
+            # Try to get video title
+            with instrumentation.span("app.video_title"):
+                video_title = transcript_utils.get_video_title(youtube_url)
+            st.subheader(f"Video: {video_title}")
+
+            # Get transcript if not already stored
+            if new_video:
+                # Fetch and store the transcript
+                with instrumentation.span("app.transcript"):
+                    st.session_state.current_transcript = transcript_cache.get_or_compute(
+                        video_id,
+                        lambda: transcript_utils.get_transcript_result(video_id),
+                        should_cache=lambda result: result.status != "error"
+                    )
+        if video_trace is not None:
+            # This session's own trace; recent_traces() is shared by every session in the process
+            st.session_state.last_trace = video_trace.to_dict()
             
-        # Use the stored transcript
-        transcript = st.session_state.current_transcript
-        
-        # Check if transcript is an error message
-        transcript_available = not (transcript.startswith("Error fetching transcript") or 
-                                   transcript.startswith("No transcript available") or
-                                   transcript.startswith("Transcripts are disabled"))
+        # Use the stored transcript (or the reason there is none)
+        transcript_result = st.session_state.current_transcript
+        transcript = transcript_result.text
+        transcript_available = transcript_result.ok
         
         # Display transcript or error message
         if transcript_available:
             st.subheader("Transcript")
-            with st.expander("Show Transcript"):
-                # Make transcript scrollable if it's long
-                st.markdown(
-                    f"""
-                    <div style="max-height: 300px; overflow-y: auto; border: 1px solid #e6e6e6; padding: 15px; border-radius: 5px; background-color: auto;">
-                        {transcript}
-                    </div>
-                    """, 
-                    unsafe_allow_html=True
+            language_note = f"Language: {transcript_result.language_code}"
+            if transcript_result.translated_from:
+                language_note += f" (translated from {transcript_result.translated_from})"
+            elif transcript_result.is_generated:
+                language_note += " (auto-generated)"
+            if transcript_result.normalization is not None:
+                # Token counts are computed once per video and kept on the shared result
+                report = transcript_result.normalization.report(count_tokens)
+                language_note += (
+                    f" · Cleaned up: {report['tokens_before']:,} → {report['tokens_after']:,} tokens"
+                    f" ({report['token_reduction']:.0%} fewer)"
                 )
+            st.caption(language_note)
+            with st.expander("Show Transcript"):
+                show_transcript_viewer(video_id, transcript_result.transcript)
+
+            # Summary and suggested questions, filled in as the background jobs finish
+            video_jobs = start_precompute(video_id, transcript_result) if PRECOMPUTE_ARTIFACTS else {}
+            suggested_question = None
+            if video_jobs:
+                st.subheader("Overview")
+                summary_job = video_jobs["summary"]
+                if summary_job.status == jobs.DONE:
+                    st.markdown(summary_job.result)
+                elif summary_job.status == jobs.FAILED:
+                    st.caption(f"Summary unavailable: {summary_job.error}")
+                    if st.button("Retry summary", key="retry_summary"):
+                        retry_precompute(video_id, transcript_result, "summary")
+                        st.rerun()
+                else:
+                    st.caption("Summarizing the video...")
+
+                questions_job = video_jobs["questions"]
+                if questions_job.status == jobs.DONE:
+                    for i, question in enumerate(questions_job.result):
+                        if st.button(question, key=f"suggested_question_{i}"):
+                            suggested_question = question
+                elif questions_job.status == jobs.FAILED:
+                    st.caption(f"Suggested questions unavailable: {questions_job.error}")
+                    if st.button("Retry suggested questions", key="retry_questions"):
+                        retry_precompute(video_id, transcript_result, "questions")
+                        st.rerun()
+                else:
+                    st.caption("Preparing suggested questions...")
             
             # Chat interface section
             st.subheader("Chat with the Transcript")
             st.markdown("Ask questions about the transcript or request analysis. The AI has access to the full transcript content.")
+            ask_library = len(library) > 1 and st.checkbox(
+                "Ask across all videos in the library", key="ask_library",
+                help="Answer from the best-matching passages of every indexed video instead of this transcript"
+            )
             
             # Display chat history
             chat_container = st.container()
@@ -86,57 +344,140 @@ if youtube_url:
                         if role == "assistant":
                             # Make assistant responses scrollable if they're long
                             if len(content) > 500:  # If content is long
-                                st.markdown(
-                                    f"""
-                                    <div style="max-height: 300px; overflow-y: auto;">
-                                        {content}
-                                    </div>
-                                    """, 
-                                    unsafe_allow_html=True
-                                )
+                                with st.container(height=300, border=False):
+                                    st.markdown(content)
                             else:
                                 st.write(content)
                         else:
                             st.write(content)
             
+            if st.session_state.outbound_notice:
+                st.warning(st.session_state.outbound_notice)
+                st.session_state.outbound_notice = None
+
             # Chat input
-            user_input = st.chat_input("Ask a question about the transcript...")
+            user_input = st.chat_input("Ask a question about the transcript...") or suggested_question
             
             if user_input:
                 # Add user message to chat history
                 st.session_state.chat_history.append({"role": "user", "content": user_input})
                 
-                # Process the user input with LLM
-                try:
-                    # Import LLM module here
-                    from llm import interactions
+                # Process the user input with LLM (traced per stage, optionally under cProfile)
+                failed = False
+                with instrumentation.trace("chat_turn", video_id=video_id) as turn_trace, \
+                        instrumentation.profile(profile_turns, name="chat_turn") as profile_result:
+                    try:
+                        with st.spinner("Finding relevant parts of the transcript..."), \
+                                instrumentation.span("app.retrieval") as retrieval_span:
+                            # Long transcripts: send only the excerpts relevant to the question
+                            context_text = transcript
+                            context_label = None
+                            index = None
+                            long_transcript = count_tokens(transcript) > RETRIEVAL_MIN_TOKENS
+                            hits = library.search(user_input, k=corpus.CORPUS_TOP_K) if ask_library else []
+                            if hits:
+                                # Passages from across the library, each labelled with its video and time
+                                retrieval_span["library_hits"] = len(hits)
+                                context_text = corpus.format_hits(hits)
+                                context_label = corpus.CORPUS_CONTEXT_LABEL
+                            elif long_transcript and not WHOLE_VIDEO_PATTERN.search(user_input):
+                                # Built in the background when the video loaded (or joined while still building)
+                                index = retrieval_cache.get_or_compute(
+                                    video_id, lambda: build_retrieval_index(transcript_result)
+                                )
+                                excerpts = index.search(user_input, k=RETRIEVAL_TOP_K)
+                                retrieval_span["excerpts"] = len(excerpts)
+                                if excerpts:
+                                    context_text = retrieval.format_excerpts(excerpts)
+                                    context_label = retrieval.EXCERPTS_LABEL
+                            elif long_transcript and "summary" in video_jobs:
+                                # Whole-video questions build on the background summary instead of
+                                # map-reducing the transcript again
+                                summary_job = video_jobs["summary"]
+                                summary_job.wait()
+                                if summary_job.status == jobs.DONE:
+                                    context_text = summary_job.result
+                                    context_label = "Summary of the whole video"
+                                    retrieval_span["summary_reused"] = True
+
+                        # Excerpts or a summary go with the question; the whole transcript goes in the
+                        # prompt prefix that every turn shares
+                        turn_context = f"{context_label}:\n\n{context_text}" if context_label else None
+
+                        # Earlier turns as chat messages, bounded by a token budget
+                        with instrumentation.span("app.prompt_assembly") as prompt_span:
+                            if st.session_state.memory is None:
+                                st.session_state.memory = memory.ConversationMemory(summarize_fn=interactions.summarize_conversation)
+                            history = st.session_state.memory.messages()
+                            prompt_span["context_tokens"] = count_tokens(context_text)
+                            prompt_span["history_tokens"] = st.session_state.memory.token_count()
+
+                        if index is not None:
+                            st.session_state.last_retrieval = dict(
+                                index.stats(),
+                                excerpt_tokens=count_tokens(context_text),
+                                history_tokens=st.session_state.memory.token_count(),
+                                transcript_tokens=count_tokens(transcript)
+                            )
                     
-                    with st.spinner("Thinking..."):
-                        # Create context for the LLM
-                        context = f"The following is a conversation about a YouTube video transcript. Here's the transcript:\n\n{transcript}\n\nAnswer questions about this content."
-                        
-                        # Create a combined prompt with context, chat history, and new question
-                        chat_history_text = ""
-                        for msg in st.session_state.chat_history[:-1]:  # Exclude the most recent user message
-                            prefix = "User: " if msg["role"] == "user" else "Assistant: "
-                            chat_history_text += f"{prefix}{msg['content']}\n\n"
-                        
-                        # Combine everything into one prompt
-                        full_prompt = f"{context}\n\nPrevious conversation:\n{chat_history_text}\n\nUser: {user_input}\n\nAssistant:"
-                        
-                        # Get response from LLM - pass the stored transcript, not fetching it again
-                        result = interactions.analyze_transcript(transcript, full_prompt)
-                        
+                        # Show the question right away, then stream the answer under it
+                        with chat_container:
+                            with st.chat_message("user"):
+                                st.write(user_input)
+
+                            with st.chat_message("assistant"):
+                                placeholder = st.empty()
+                                result = ""
+                                timing = {}
+                                try:
+                                    # Repeated questions are answered from the LLM response cache
+                                    for delta in interactions.analyze_transcript_stream(
+                                            transcript, user_input, metrics=timing, history=history,
+                                            excerpts=turn_context
+                                    ):
+                                        result += delta
+                                        placeholder.markdown(result + "▌")
+                                except Exception:
+                                    # Keep whatever arrived before the failure alongside the error
+                                    if result:
+                                        st.session_state.chat_history.append({"role": "assistant", "content": result})
+                                    raise
+                                placeholder.markdown(result)
+
                         # Add assistant response to chat history
                         st.session_state.chat_history.append({"role": "assistant", "content": result})
-                        
-                        # Rerun to update the UI with the new message
-                        st.rerun()
-                except Exception as e:
-                    # Add error message to chat history
-                    error_msg = f"I'm sorry, I encountered an error: {str(e)}"
-                    st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+                        with instrumentation.span("app.memory_update"):
+                            st.session_state.memory.add("user", user_input)
+                            st.session_state.memory.add("assistant", result)
+                        if timing:
+                            st.session_state.last_llm_timing = {
+                                "ttft_ms": round(timing.get("ttft_seconds", 0.0) * 1000, 1),
+                                "total_ms": round(timing["total_seconds"] * 1000, 1),
+                                "chunks": timing["chunks"],
+                            }
+                    except ResilienceError as e:
+                        # The service is throttling or down: drop the unanswered question so it
+                        # can be asked again, rather than recording an error as the answer
+                        if st.session_state.chat_history[-1]["role"] == "user":
+                            st.session_state.chat_history.pop()
+                        st.session_state.outbound_notice = f"{e}. Please try again shortly."
+                        failed = True
+                    except Exception as e:
+                        # Add error message to chat history
+                        error_msg = f"I'm sorry, I encountered an error: {str(e)}"
+                        st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+                        failed = True
+
+                st.session_state.last_trace = turn_trace.to_dict()
+                if profile_result.path:
+                    st.session_state.last_profile = {"path": profile_result.path, "report": profile_result.report}
+                if failed:
                     st.rerun()
+
+            # Poll until every background job for this video is done or has failed, so their results appear
+            if any(not job.finished for job in video_jobs.values()):
+                time.sleep(JOB_POLL_INTERVAL)
+                st.rerun()
         else:
             # Display a more helpful error message when transcript isn't available
             st.error(transcript)
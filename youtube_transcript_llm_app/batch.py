@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Headless batch processing for YouTube Transcript LLM App.
+
+Reads video URLs or IDs (one per line) from a file or stdin, fetches each transcript,
+runs the requested LLM tasks and appends one JSON record per video to a JSONL file.
+
+Example:
+    python batch.py videos.txt -o results.jsonl --tasks summary,questions --resume
+    cat videos.txt | python batch.py - -o results.jsonl --stub
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.transcript_utils import extract_video_id
+
+TASKS = ("summary", "questions")
+
+# Record statuses. 'unavailable' is permanent (disabled, missing or removed); 'error' is retried on --resume
+STATUS_OK = "ok"
+STATUS_UNAVAILABLE = "unavailable"
+STATUS_ERROR = "error"
+
+
+class YouTubeTranscriptBackend:
+    """Fetches transcripts from YouTube through transcript_utils."""
+
+    def __init__(self, languages: Optional[List[str]] = None):
+        self.languages = languages
+
+    def fetch(self, video_id: str) -> Tuple[str, str]:
+        """
+        Fetch a transcript.
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            Tuple[str, str]: ('ok', transcript), ('unavailable', message) or ('error', message)
+        """
+        from utils import transcript_utils
+        from utils.transcript_resolver import STATUS_ERROR as RESOLVER_ERROR
+
+        result = transcript_utils.get_transcript_result(video_id, self.languages)
+        if result.ok:
+            return STATUS_OK, result.text
+        # Disabled, not-found and unavailable videos will not change on a retry; errors might
+        return (STATUS_ERROR if result.status == RESOLVER_ERROR else STATUS_UNAVAILABLE), result.message
+
+
+class OpenAILLMBackend:
+    """Runs LLM tasks through llm.interactions."""
+
+    def __init__(self, num_questions: int = 5):
+        self.num_questions = num_questions
+
+    def run(self, task: str, transcript: str) -> str:
+        """
+        Run one LLM task on a transcript.
+
+        Args:
+            task (str): 'summary' or 'questions'
+            transcript (str): Transcript text
+
+        Returns:
+            str: Task output
+
+        Raises:
+            Exception: If the LLM request fails
+        """
+        # Imported lazily so --stub runs never need an API key
+        from llm import interactions
+
+        if task == "questions":
+            questions = interactions.suggest_questions(transcript, self.num_questions)
+            return "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+        return interactions.summarize_transcript(transcript)
+
+
+class StubTranscriptBackend:
+    """Offline transcript backend producing deterministic text, for tests and dry runs."""
+
+    def __init__(self, latency: float = 0.0, words: int = 2000):
+        self.latency = latency
+        self.words = words
+
+    def fetch(self, video_id: str) -> Tuple[str, str]:
+        if self.latency:
+            time.sleep(self.latency)
+        if video_id.startswith("disabled"):
+            return STATUS_UNAVAILABLE, "Transcripts are disabled for this video."
+        if video_id.startswith("error"):
+            return STATUS_ERROR, "Error fetching transcript: simulated failure"
+        seed = hashlib.sha256(video_id.encode("utf-8")).hexdigest()
+        return STATUS_OK, " ".join(f"{seed[i % 60:i % 60 + 4]}" for i in range(self.words))
+
+
+class StubLLMBackend:
+    """Offline LLM backend echoing a deterministic answer, for tests and dry runs."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def run(self, task: str, transcript: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return f"[stub {task}] {len(transcript.split())} words, starts with: {transcript[:40]}"
+
+
+def read_inputs(source: Iterable[str]) -> List[str]:
+    """
+    Parse video URLs or IDs, skipping blank lines, comments and duplicates.
+
+    Args:
+        source (Iterable[str]): Lines of input
+
+    Returns:
+        List[str]: Video IDs in input order
+    """
+    video_ids = []
+    seen = set()
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        video_id = extract_video_id(line)
+        if not video_id:
+            print(f"Skipping unrecognized input: {line}", file=sys.stderr)
+            continue
+        if video_id not in seen:
+            seen.add(video_id)
+            video_ids.append(video_id)
+    return video_ids
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """
+    Collect the video IDs already completed in an existing output file.
+
+    Args:
+        output_path (str): JSONL output path
+
+    Returns:
+        Set[str]: IDs of records with status 'ok' (or a permanent 'unavailable' status)
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") in (STATUS_OK, STATUS_UNAVAILABLE):
+                done.add(record["video_id"])
+    return done
+
+
+class BatchRunner:
+    """
+    Bounded concurrent pipeline: transcript fetches and LLM calls run in separate pools
+    so a slow LLM never starves YouTube fetches and vice versa.
+    """
+
+    def __init__(
+        self,
+        transcript_backend,
+        llm_backend,
+        output,
+        tasks: Iterable[str] = ("summary",),
+        youtube_concurrency: int = 4,
+        llm_concurrency: int = 2,
+        progress_every: int = 25,
+    ):
+        self.transcript_backend = transcript_backend
+        self.llm_backend = llm_backend
+        self.output = output
+        self.tasks = list(tasks)
+        self.youtube_concurrency = youtube_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.progress_every = progress_every
+        self._write_lock = threading.Lock()
+        # Caps queued work so memory stays flat for very large inputs
+        self._slots = threading.BoundedSemaphore(2 * (youtube_concurrency + llm_concurrency))
+        self.stats = {STATUS_OK: 0, STATUS_UNAVAILABLE: 0, STATUS_ERROR: 0}
+        self._started = 0.0
+
+    def _write(self, record: Dict) -> None:
+        with self._write_lock:
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.output.flush()
+            self.stats[record["status"]] += 1
+            completed = sum(self.stats.values())
+            if self.progress_every and completed % self.progress_every == 0:
+                print(f"{completed} videos done, {self.throughput():.1f} videos/min", file=sys.stderr)
+
+    def throughput(self) -> float:
+        """
+        Get completed videos per minute since the run started.
+
+        Returns:
+            float: Videos per minute
+        """
+        elapsed = time.perf_counter() - self._started
+        return sum(self.stats.values()) / elapsed * 60 if elapsed > 0 else 0.0
+
+    def _fetch(self, video_id: str, llm_pool: ThreadPoolExecutor) -> None:
+        started = time.perf_counter()
+        try:
+            status, text = self.transcript_backend.fetch(video_id)
+        except Exception as e:
+            status, text = STATUS_ERROR, f"Error fetching transcript: {str(e)}"
+
+        if status != STATUS_OK:
+            self._write({"video_id": video_id, "status": status, "error": text,
+                         "elapsed_seconds": round(time.perf_counter() - started, 3)})
+            self._slots.release()
+            return
+        llm_pool.submit(self._analyze, video_id, text, started)
+
+    def _analyze(self, video_id: str, transcript: str, started: float) -> None:
+        record = {"video_id": video_id, "status": STATUS_OK, "transcript_chars": len(transcript)}
+        try:
+            for task in self.tasks:
+                record[task] = self.llm_backend.run(task, transcript)
+        except Exception as e:
+            record["status"] = STATUS_ERROR
+            record["error"] = str(e)
+        record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        self._write(record)
+        self._slots.release()
+
+    def run(self, video_ids: Iterable[str]) -> Dict[str, float]:
+        """
+        Process every video and wait for completion.
+
+        Args:
+            video_ids (Iterable[str]): Video IDs to process
+
+        Returns:
+            Dict[str, float]: Status counts plus 'elapsed_seconds' and 'videos_per_minute'
+        """
+        self._started = time.perf_counter()
+        with ThreadPoolExecutor(self.llm_concurrency, thread_name_prefix="llm") as llm_pool:
+            with ThreadPoolExecutor(self.youtube_concurrency, thread_name_prefix="youtube") as yt_pool:
+                for video_id in video_ids:
+                    self._slots.acquire()
+                    yt_pool.submit(self._fetch, video_id, llm_pool)
+        summary = dict(self.stats)
+        summary["elapsed_seconds"] = round(time.perf_counter() - self._started, 3)
+        summary["videos_per_minute"] = round(self.throughput(), 2)
+        return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fetch and analyze YouTube transcripts in bulk.")
+    parser.add_argument("input", help="File with one video URL or ID per line, or '-' for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--tasks", default="summary", help="Comma-separated tasks: summary,questions")
+    parser.add_argument("--languages", default="en", help="Comma-separated preferred transcript languages")
+    parser.add_argument("--num-questions", type=int, default=5, help="Questions per video for the 'questions' task")
+    parser.add_argument("--youtube-concurrency", type=int, default=4, help="Concurrent transcript fetches")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="Concurrent LLM requests")
+    parser.add_argument("--resume", action="store_true", help="Skip videos already completed in the output file")
+    parser.add_argument("--stub", action="store_true", help="Use offline stub backends (no network, no API key)")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Simulated latency per stub call, in seconds")
+    args = parser.parse_args(argv)
+
+    tasks = [task.strip() for task in args.tasks.split(",") if task.strip()]
+    unknown = [task for task in tasks if task not in TASKS]
+    if unknown:
+        parser.error(f"Unknown task(s): {', '.join(unknown)}")
+
+    if args.input == "-":
+        video_ids = read_inputs(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            video_ids = read_inputs(f)
+
+    if args.resume:
+        done = load_checkpoint(args.output)
+        video_ids = [video_id for video_id in video_ids if video_id not in done]
+        print(f"Resuming: {len(done)} already done, {len(video_ids)} to go", file=sys.stderr)
+
+    if args.stub:
+        transcript_backend = StubTranscriptBackend(latency=args.stub_latency)
+        llm_backend = StubLLMBackend(latency=args.stub_latency)
+    else:
+        transcript_backend = YouTubeTranscriptBackend(args.languages.split(","))
+        llm_backend = OpenAILLMBackend(args.num_questions)
+
+    with open(args.output, "a", encoding="utf-8") as output:
+        runner = BatchRunner(
+            transcript_backend,
+            llm_backend,
+            output,
+            tasks=tasks,
+            youtube_concurrency=args.youtube_concurrency,
+            llm_concurrency=args.llm_concurrency,
+        )
+        summary = runner.run(video_ids)
+
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
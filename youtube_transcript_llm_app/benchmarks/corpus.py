@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Offline scale benchmark of the multi-video corpus index (llm.corpus).
+
+Builds a corpus of synthetic transcripts whose words follow a Zipf distribution
+over a large vocabulary (like real speech: a few very common words, a long tail
+of rare ones), then reports ingest throughput, merge time, size on disk, the time
+to open the index in a fresh process state, query latency percentiles and peak
+resident memory.
+
+Usage (from youtube_transcript_llm_app/):
+    python -m benchmarks.corpus --videos 2000
+    python -m benchmarks.corpus --videos 20000 --dir /tmp/corpus-bench
+"""
+import argparse
+import json
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+from .pipeline import percentile
+
+_SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "do", "gu", "he", "ji", "bo", "fe")
+
+
+def make_vocabulary(size: int) -> List[str]:
+    """
+    Generate distinct pronounceable words.
+
+    Args:
+        size (int): Number of words
+
+    Returns:
+        List[str]: Words, most frequent first when sampled with zipf_weights
+    """
+    words = []
+    for i in range(size):
+        word = ""
+        i += len(_SYLLABLES)
+        while i:
+            i, digit = divmod(i, len(_SYLLABLES))
+            word += _SYLLABLES[digit]
+        words.append(word)
+    return words
+
+
+def make_transcript(rng: random.Random, vocabulary: List[str], cum_weights: List[float], segments: int,
+                    words_per_segment: int = 10) -> List[Dict]:
+    """Generate timestamped segments with Zipf-distributed words."""
+    words = rng.choices(vocabulary, cum_weights=cum_weights, k=segments * words_per_segment)
+    return [
+        {"text": " ".join(words[i * words_per_segment:(i + 1) * words_per_segment]), "start": i * 3.0, "duration": 3.0}
+        for i in range(segments)
+    ]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run(directory: str, videos: int, segments: int = 120, vocabulary_size: int = 50000, commit_every: int = 500,
+        queries: int = 200, seed: int = 7) -> Dict[str, float]:
+    """
+    Build a synthetic corpus and measure it.
+
+    Args:
+        directory (str): Index directory (emptied first)
+        videos (int): Number of videos to ingest
+        segments (int): Segments per video
+        vocabulary_size (int): Distinct words
+        commit_every (int): Videos per commit (one segment file each)
+        queries (int): Timed queries
+        seed (int): Random seed
+
+    Returns:
+        Dict[str, float]: Measurements
+    """
+    from llm.corpus import CorpusIndex
+
+    shutil.rmtree(directory, ignore_errors=True)
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size)
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(vocabulary_size)))
+
+    index = CorpusIndex(directory)
+    started = time.perf_counter()
+    for number in range(videos):
+        index.add(f"v{number:010d}", make_transcript(rng, vocabulary, cum_weights, segments), f"Video {number}")
+        if (number + 1) % commit_every == 0:
+            index.commit()
+    index.commit()
+    ingest_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index.compact()
+    compact_seconds = time.perf_counter() - started
+    stats = index.stats()
+    del index
+
+    started = time.perf_counter()
+    index = CorpusIndex(directory)
+    open_ms = (time.perf_counter() - started) * 1000
+
+    # One to three words from across the frequency range, as in real searches
+    samples = []
+    for _ in range(queries):
+        terms = [vocabulary[min(int(rng.paretovariate(0.6)) * 10, vocabulary_size - 1)]
+                 for _ in range(rng.randint(1, 3))]
+        query_started = time.perf_counter()
+        index.search(" ".join(terms), k=10)
+        samples.append((time.perf_counter() - query_started) * 1000)
+
+    return {
+        "videos": stats["videos"],
+        "passages": stats["passages"],
+        "disk_mb": stats["disk_mb"],
+        "ingest_videos_per_s": round(videos / ingest_seconds, 1),
+        "compact_s": round(compact_seconds, 2),
+        "open_ms": round(open_ms, 2),
+        "query_p50_ms": round(percentile(samples, 50), 2),
+        "query_p90_ms": round(percentile(samples, 90), 2),
+        "query_p99_ms": round(percentile(samples, 99), 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the corpus index on synthetic transcripts.")
+    parser.add_argument("--videos", type=int, default=2000, help="Videos to ingest")
+    parser.add_argument("--segments", type=int, default=120, help="Segments per video")
+    parser.add_argument("--vocabulary", type=int, default=50000, help="Distinct words")
+    parser.add_argument("--commit-every", type=int, default=500, help="Videos per commit")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries")
+    parser.add_argument("--dir", help="Index directory (default: a temporary directory, removed afterwards)")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or tempfile.mkdtemp(prefix="corpus-bench-")
+    try:
+        results = run(directory, args.videos, args.segments, args.vocabulary, args.commit_every, args.queries)
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
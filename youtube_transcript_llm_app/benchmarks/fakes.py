@@ -0,0 +1,473 @@
+# Local stand-ins for YouTube and the OpenAI API used by the offline benchmarks
+import hashlib
+import json
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+_WORDS = (
+    "the model reads each segment and answers questions about what the speaker "
+    "said while the transcript is split into chunks that fit the context window"
+).split()
+
+
+def make_segments(count: int, words_per_segment: int = 8, seconds_per_segment: float = 2.5) -> List[Dict]:
+    """
+    Generate deterministic transcript segments.
+
+    Args:
+        count (int): Number of segments
+        words_per_segment (int): Words in each segment
+        seconds_per_segment (float): Duration of each segment
+
+    Returns:
+        List[Dict]: Segments with 'text', 'start' and 'duration'
+    """
+    segments = []
+    for i in range(count):
+        words = [_WORDS[(i * 7 + j) % len(_WORDS)] for j in range(words_per_segment)]
+        words.append(f"item{i}")
+        segments.append({
+            "text": " ".join(words),
+            "start": round(i * seconds_per_segment, 3),
+            "duration": seconds_per_segment,
+        })
+    return segments
+
+
+class FakeTrack:
+    """Caption track with the attributes and methods of youtube_transcript_api's Transcript."""
+
+    def __init__(self, provider: "FakeTranscriptProvider", video_id: str, language_code: str = "en",
+                 is_generated: bool = False, translation_languages: Optional[List[str]] = None):
+        self._provider = provider
+        self.video_id = video_id
+        self.language_code = language_code
+        self.language = language_code
+        self.is_generated = is_generated
+        self.translation_languages = [
+            {"language": code, "language_code": code} for code in (translation_languages or [])
+        ]
+
+    @property
+    def is_translatable(self) -> bool:
+        return bool(self.translation_languages)
+
+    def translate(self, language_code: str) -> "FakeTrack":
+        return FakeTrack(self._provider, self.video_id, language_code, True)
+
+    def fetch(self, preserve_formatting: bool = False) -> List[Dict]:
+        return self._provider.fetch(self.video_id)
+
+
+class FakeTranscriptProvider:
+    """
+    Serves generated transcripts in place of youtube_transcript_api.
+
+    Register a video ID with a segment count, then install() the provider to route
+    YouTubeTranscriptApi.list_transcripts and get_transcript to it for the duration
+    of a with-block. Each listing and each fetch counts as one simulated round trip
+    of `latency` seconds. Unregistered IDs raise TranscriptsDisabled.
+    """
+
+    def __init__(self, latency: float = 0.0, words_per_segment: int = 8):
+        self.latency = latency
+        self.words_per_segment = words_per_segment
+        self.calls = 0
+        self._videos: Dict[str, List[Dict]] = {}
+        self._tracks: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, video_id: str, segments: int, language_code: str = "en", is_generated: bool = False,
+                 translation_languages: Optional[List[str]] = None) -> str:
+        """
+        Make a video with the given number of segments available.
+
+        Args:
+            video_id (str): 11-character video ID
+            segments (int): Number of transcript segments
+            language_code (str): Language of the video's only caption track
+            is_generated (bool): Whether the track is auto-generated
+            translation_languages (List[str], optional): Languages the track can be translated to
+
+        Returns:
+            str: The video ID
+        """
+        self._videos[video_id] = make_segments(segments, self.words_per_segment)
+        self._tracks[video_id] = [{
+            "language_code": language_code,
+            "is_generated": is_generated,
+            "translation_languages": translation_languages,
+        }]
+        return video_id
+
+    def _round_trip(self) -> None:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def fetch(self, video_id: str) -> List[Dict]:
+        from youtube_transcript_api import TranscriptsDisabled
+
+        self._round_trip()
+        segments = self._videos.get(video_id)
+        if segments is None:
+            raise TranscriptsDisabled(video_id)
+        # Callers own the returned list, like the real API
+        return [dict(segment) for segment in segments]
+
+    def list_transcripts(self, video_id: str, **kwargs) -> List[FakeTrack]:
+        from youtube_transcript_api import TranscriptsDisabled
+
+        self._round_trip()
+        if video_id not in self._tracks:
+            raise TranscriptsDisabled(video_id)
+        return [FakeTrack(self, video_id, **track) for track in self._tracks[video_id]]
+
+    def get_transcript(self, video_id: str, languages=("en",), **kwargs) -> List[Dict]:
+        self.list_transcripts(video_id)
+        return self.fetch(video_id)
+
+    @contextmanager
+    def install(self) -> Iterator["FakeTranscriptProvider"]:
+        """Route YouTubeTranscriptApi calls to this provider inside a with-block."""
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        original = (YouTubeTranscriptApi.__dict__["get_transcript"], YouTubeTranscriptApi.__dict__["list_transcripts"])
+        YouTubeTranscriptApi.get_transcript = staticmethod(self.get_transcript)
+        YouTubeTranscriptApi.list_transcripts = staticmethod(self.list_transcripts)
+        try:
+            yield self
+        finally:
+            YouTubeTranscriptApi.get_transcript, YouTubeTranscriptApi.list_transcripts = original
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this Nagle adds ~40 ms per response
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fault(self, kind: str) -> bool:
+        # Apply the next injected fault for this kind of request; True if the request was answered
+        fault = self.server.fake._next_fault(kind)
+        if fault is None:
+            return False
+        if fault["delay"]:
+            time.sleep(fault["delay"])
+        if fault["status"] is None:
+            return False
+        body = json.dumps({"error": {"message": f"Injected {fault['status']}", "type": "injected"}}).encode("utf-8")
+        self.send_response(fault["status"])
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if fault["retry_after"] is not None:
+            self.send_header("Retry-After", f"{fault['retry_after']:g}")
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake._record("youtube")
+        if self._fault("youtube"):
+            return
+        fake._sleep()
+        parsed = urlparse(self.path)
+        if parsed.path == "/oembed":
+            url = parse_qs(parsed.query).get("url", [""])[0]
+            video_id = parse_qs(urlparse(url).query).get("v", ["unknown"])[0]
+            body = {"title": f"Benchmark video {video_id}", "author_name": "Benchmark", "thumbnail_url": ""}
+            self._send(200, json.dumps(body).encode("utf-8"))
+        elif parsed.path == "/watch":
+            padding = "<meta name=\"x\" content=\"padding\">" * (fake.page_padding // 32)
+            page = f"<html><head>{padding}<title>Benchmark video - YouTube</title></head></html>"
+            self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+        if path.endswith("/chat/completions"):
+            fake._record("chat")
+            if self._fault("chat"):
+                return
+            model = request.get("model", "")
+            fake._record_model(model)
+            if model in fake.unavailable_models:
+                body = {"error": {"message": f"The model `{model}` does not exist", "type": "invalid_request_error",
+                                  "code": "model_not_found"}}
+                self._send(404, json.dumps(body).encode("utf-8"))
+                return
+            usage = fake.prompt_usage(request.get("messages", []))
+            fake._sleep(usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"], model)
+            if request.get("stream"):
+                self._stream_completion(request, usage)
+            else:
+                self._send(200, json.dumps(fake.completion(request, usage)).encode("utf-8"))
+        elif path.endswith("/embeddings"):
+            fake._record("embeddings")
+            if self._fault("embeddings"):
+                return
+            fake._sleep()
+            self._send(200, json.dumps(fake.embeddings(request)).encode("utf-8"))
+        else:
+            self._send(404, b'{"error": {"message": "not found"}}')
+
+    def _stream_completion(self, request: Dict, usage: Dict) -> None:
+        fake = self.server.fake
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = fake.answer_words(request)
+        for word in words:
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if fake.token_delay:
+                time.sleep(fake.token_delay)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [],
+                "usage": dict(usage, completion_tokens=len(words), total_tokens=usage["prompt_tokens"] + len(words)),
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeOpenAIServer"
+
+    def handle_error(self, request, client_address):
+        # Clients that time out on an injected delay hang up before the answer is written
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeOpenAIServer:
+    """
+    OpenAI-compatible (and oEmbed/watch-page) HTTP server on localhost.
+
+    Answers /v1/chat/completions (plain and streamed), /v1/embeddings, /oembed and
+    /watch after a fixed latency, so the real client code paths run end to end
+    without network access. Point OPENAI_BASE_URL at `url` and YOUTUBE_BASE_URL at
+    `origin`. inject() scripts error and slow responses for resilience tests.
+
+    Chat requests also mimic provider-side prompt caching: a prompt whose leading
+    messages (at least 1024 tokens of them) were sent before reports those tokens as
+    cached, and only the rest adds `prefill_delay` seconds per 1000 tokens. Models can
+    be made slower (`model_latency`, extra seconds per request) or answer 404
+    model_not_found (`unavailable_models`), for routing tests.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        completion_words: int = 60,
+        token_delay: float = 0.0,
+        embedding_dim: int = 64,
+        page_padding: int = 64 * 1024,
+        prefill_delay: float = 0.0,
+        model_latency: Optional[Dict[str, float]] = None,
+    ):
+        self.latency = latency
+        self.prefill_delay = prefill_delay
+        self.model_latency: Dict[str, float] = dict(model_latency or {})
+        self.unavailable_models = set()
+        self.completion_words = completion_words
+        self.token_delay = token_delay
+        self.embedding_dim = embedding_dim
+        self.page_padding = page_padding
+        self.requests: Dict[str, int] = {"chat": 0, "embeddings": 0, "youtube": 0}
+        self.requests_by_model: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._prefixes: "OrderedDict[bytes, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._faults: deque = deque()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _record(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] += 1
+
+    def _record_model(self, model: str) -> None:
+        with self._lock:
+            self.requests_by_model[model] = self.requests_by_model.get(model, 0) + 1
+
+    def _sleep(self, uncached_tokens: int = 0, model: Optional[str] = None) -> None:
+        delay = self.latency + self.model_latency.get(model, 0.0) + self.prefill_delay * uncached_tokens / 1000
+        if delay:
+            time.sleep(delay)
+
+    def prompt_usage(self, messages: List[Dict]) -> Dict:
+        """
+        Count a prompt's tokens (about four characters each) and how many were cached.
+
+        Args:
+            messages (List[Dict]): Chat messages of the request
+
+        Returns:
+            Dict: 'prompt_tokens' and 'prompt_tokens_details' with 'cached_tokens', as in the API
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        tokens = 0
+        cached = 0
+        with self._lock:
+            for message in messages:
+                content = message.get("content") or ""
+                digest.update(json.dumps([message.get("role"), content]).encode("utf-8"))
+                tokens += len(content) // 4 + 4
+                key = digest.digest()
+                if key in self._prefixes:
+                    self._prefixes.move_to_end(key)
+                    cached = tokens
+                else:
+                    self._prefixes[key] = None
+            while len(self._prefixes) > 4096:
+                self._prefixes.popitem(last=False)
+            # Like the API: nothing below 1024 tokens, then in steps of 128
+            cached = cached // 128 * 128 if cached >= 1024 else 0
+            self.prompt_tokens += tokens
+            self.cached_tokens += cached
+        return {"prompt_tokens": tokens, "prompt_tokens_details": {"cached_tokens": cached}}
+
+    def inject(self, status: Optional[int] = None, retry_after: Optional[float] = None, delay: float = 0.0,
+               count: int = 1, kind: Optional[str] = None) -> "FakeOpenAIServer":
+        """
+        Script faults for the next matching requests, applied in the order injected.
+
+        Args:
+            status (int, optional): Error status to answer with (e.g. 429 or 503); None
+                serves the normal response after the delay
+            retry_after (float, optional): Retry-After header value in seconds
+            delay (float): Seconds to stall before answering
+            count (int): Number of requests the fault applies to
+            kind (str, optional): Only 'chat', 'embeddings' or 'youtube' requests; None matches any
+
+        Returns:
+            FakeOpenAIServer: self, for chaining
+        """
+        with self._lock:
+            for _ in range(count):
+                self._faults.append({"status": status, "retry_after": retry_after, "delay": delay, "kind": kind})
+        return self
+
+    def clear_faults(self) -> None:
+        """Drop faults that have not been applied yet."""
+        with self._lock:
+            self._faults.clear()
+
+    def _next_fault(self, kind: str) -> Optional[Dict]:
+        with self._lock:
+            for fault in self._faults:
+                if fault["kind"] in (None, kind):
+                    self._faults.remove(fault)
+                    return fault
+        return None
+
+    def answer_words(self, request: Dict) -> List[str]:
+        """Words of the canned answer, capped by the request's max_tokens."""
+        limit = request.get("max_tokens") or self.completion_words
+        count = max(1, min(self.completion_words, limit))
+        return [_WORDS[i % len(_WORDS)] for i in range(count)]
+
+    def completion(self, request: Dict, usage: Optional[Dict] = None) -> Dict:
+        words = self.answer_words(request)
+        messages = request.get("messages", [])
+        content = " ".join(words)
+        if messages and "thoughtful questions" in (messages[-1].get("content") or ""):
+            # Question generation gets a numbered list, like a real model's answer
+            content = "\n".join(f"{i + 1}. What does the speaker say about {word}?" for i, word in enumerate(words[:5]))
+        usage = usage or {"prompt_tokens": sum(len(message.get("content") or "") // 4 + 4 for message in messages)}
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": dict(usage, completion_tokens=len(words), total_tokens=usage["prompt_tokens"] + len(words)),
+        }
+
+    def embeddings(self, request: Dict) -> Dict:
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = [0.0] * self.embedding_dim
+            for word in str(text).lower().split():
+                vector[zlib.crc32(word.encode("utf-8")) % self.embedding_dim] += 1.0
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return {"object": "list", "data": data, "model": request.get("model", "fake"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    @property
+    def origin(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"{self.origin}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        """Start serving on a free localhost port in a background thread."""
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Load test for the HTTP API (api.py).
+
+Starts API workers against local stand-ins (FakeOpenAIServer and FakeTranscriptProvider),
+then keeps a fixed number of concurrent clients sending a mix of chat (streamed over
+SSE), transcript, summary and question requests for a set duration. Reports requests
+per second, latency percentiles and, for streamed answers, time to the first event.
+Exits non-zero if the error rate exceeds --max-error-rate.
+
+The fake servers run in this process, next to the load generator; --url points the
+load at an API started elsewhere instead (its videos given with --video-ids).
+
+Usage (from youtube_transcript_llm_app/):
+    python -m benchmarks.loadtest --workers 4 --concurrency 64 --duration 20
+    python -m benchmarks.loadtest --mix chat=1 --token-delay 0.005
+    python -m benchmarks.loadtest --url http://127.0.0.1:8080 --video-ids dQw4w9WgXcQ
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .fakes import FakeOpenAIServer, FakeTranscriptProvider
+from .pipeline import configure_environment, percentile
+
+ENDPOINTS = ("chat", "transcript", "summarize", "questions")
+DEFAULT_MIX = "chat=6,transcript=2,summarize=1,questions=1"
+QUESTIONS = (
+    "Who is the speaker?",
+    "What does the speaker say about the context window?",
+    "Explain the argument the speaker builds in the second half.",
+    "What examples does the speaker give?",
+    "What are the key points of the whole video?",
+)
+
+
+class StreamError(Exception):
+    """A streamed answer ended with an error event or without its 'done' event."""
+
+
+class Connection:
+    """One client's keep-alive HTTP/1.1 connection, reopened after streamed responses."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, Optional[float]]:
+        """
+        Send a request and read the whole response.
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path
+            payload (Dict, optional): JSON body
+
+        Returns:
+            Tuple[int, Optional[float]]: Status, and seconds to the first event for streamed responses
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        started = time.perf_counter()
+        self._writer.write(head.encode("latin-1") + body)
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed before the response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if not headers.get("content-type", "").startswith("text/event-stream"):
+            await self._reader.readexactly(int(headers.get("content-length", 0)))
+            if headers.get("connection", "").lower() == "close":
+                self.close()
+            return status, None
+
+        # Server-sent events until the server closes the connection
+        first_event = None
+        last_event = None
+        async for line in self._reader:
+            if line.startswith(b"event:"):
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+                last_event = line[len(b"event:"):].strip()
+        self.close()
+        if last_event != b"done":
+            raise StreamError(f"stream ended with {last_event!r}")
+        return status, first_event
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """
+    Parse a request mix such as 'chat=6,transcript=2'.
+
+    Args:
+        value (str): Comma-separated endpoint=weight pairs
+
+    Returns:
+        Dict[str, int]: Weight per endpoint
+    """
+    mix = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("the mix has no requests")
+    return mix
+
+
+def _request_for(endpoint: str, video_id: str, rng: random.Random) -> Tuple[str, str, Optional[Dict]]:
+    if endpoint == "chat":
+        return "POST", "/v1/chat", {"video": video_id, "message": rng.choice(QUESTIONS)}
+    if endpoint == "transcript":
+        return "GET", f"/v1/videos/{video_id}/transcript", None
+    if endpoint == "summarize":
+        return "POST", "/v1/summarize", {"video": video_id}
+    return "POST", "/v1/questions", {"video": video_id, "num_questions": 5}
+
+
+async def drive(host: str, port: int, video_ids: List[str], mix: Dict[str, int], concurrency: int,
+                duration: float, warmup: float, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Keep `concurrency` clients busy for warmup + duration seconds and summarize the measured part.
+
+    Args:
+        host (str): API host
+        port (int): API port
+        video_ids (List[str]): Videos to ask about
+        mix (Dict[str, int]): Relative weight of each endpoint
+        concurrency (int): Concurrent clients, each with one request outstanding
+        duration (float): Measured seconds
+        warmup (float): Seconds of load before measuring starts
+        seed (int): Seed for the request sequence
+
+    Returns:
+        Dict[str, Dict[str, float]]: Figures per endpoint, plus 'all'
+    """
+    endpoints = list(mix)
+    weights = [mix[name] for name in endpoints]
+    latencies: Dict[str, List[float]] = {name: [] for name in endpoints}
+    first_events: Dict[str, List[float]] = {name: [] for name in endpoints}
+    errors: Dict[str, int] = {name: 0 for name in endpoints}
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def client(number: int) -> None:
+        rng = random.Random(seed * 100003 + number)
+        connection = Connection(host, port)
+        try:
+            while time.perf_counter() < stop_at:
+                endpoint = rng.choices(endpoints, weights)[0]
+                method, path, payload = _request_for(endpoint, rng.choice(video_ids), rng)
+                started = time.perf_counter()
+                try:
+                    status, first_event = await connection.request(method, path, payload)
+                    failed = status >= 400
+                except (OSError, asyncio.IncompleteReadError, StreamError, ValueError):
+                    connection.close()
+                    status, first_event, failed = 0, None, True
+                if started < measure_from:
+                    continue
+                if failed:
+                    errors[endpoint] += 1
+                else:
+                    latencies[endpoint].append((time.perf_counter() - started) * 1000)
+                    if first_event is not None:
+                        first_events[endpoint].append(first_event * 1000)
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+
+    results = {}
+    for name in endpoints + ["all"]:
+        samples = sum(latencies.values(), []) if name == "all" else latencies[name]
+        streamed = sum(first_events.values(), []) if name == "all" else first_events[name]
+        failed = sum(errors.values()) if name == "all" else errors[name]
+        if not samples and not failed:
+            continue
+        results[name] = {
+            "requests": len(samples) + failed,
+            "errors": failed,
+            "requests_per_s": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+            "p90_ms": round(percentile(samples, 90), 2) if samples else None,
+            "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+            "ttft_p50_ms": round(percentile(streamed, 50), 2) if streamed else None,
+            "ttft_p99_ms": round(percentile(streamed, 99), 2) if streamed else None,
+        }
+    return results
+
+
+async def wait_until_ready(host: str, port: int, timeout: float = 30.0) -> None:
+    """
+    Poll /healthz until the API answers.
+
+    Args:
+        host (str): API host
+        port (int): API port
+        timeout (float): Seconds to wait
+    """
+    deadline = time.perf_counter() + timeout
+    while True:
+        connection = Connection(host, port)
+        try:
+            status, _ = await connection.request("GET", "/healthz")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"API at {host}:{port} not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.1)
+
+
+def run(workers: int, threads: int, concurrency: int, duration: float, warmup: float, mix: Dict[str, int],
+        videos: int, segments: int, latency: float, completion_words: int,
+        token_delay: float) -> Dict[str, Dict[str, float]]:
+    """
+    Start API workers on the fake servers and load them.
+
+    Args:
+        workers (int): API worker processes
+        threads (int): Thread pool size per worker
+        concurrency (int): Concurrent clients
+        duration (float): Measured seconds
+        warmup (float): Seconds of load before measuring starts
+        mix (Dict[str, int]): Relative weight of each endpoint
+        videos (int): Distinct videos requested
+        segments (int): Transcript length of each video, in segments
+        latency (float): Fake OpenAI latency per request, in seconds
+        completion_words (int): Words in each fake completion
+        token_delay (float): Delay between streamed words, in seconds
+
+    Returns:
+        Dict[str, Dict[str, float]]: Figures per endpoint, plus 'all'
+    """
+    server = FakeOpenAIServer(latency=latency, completion_words=completion_words, token_delay=token_delay).start()
+    configure_environment(server)
+    provider = FakeTranscriptProvider(latency=latency)
+    video_ids = [provider.register(f"load{number:07d}", segments) for number in range(videos)]
+    try:
+        # Workers are forked with the fake transcript provider installed
+        with provider.install():
+            import api
+
+            sock = api.bind("127.0.0.1", 0)
+            host, port = sock.getsockname()[:2]
+            pids = api.spawn_workers(sock, workers, threads)
+            sock.close()
+            try:
+                asyncio.run(wait_until_ready(host, port))
+                return asyncio.run(drive(host, port, video_ids, mix, concurrency, duration, warmup))
+            finally:
+                api.stop_workers(pids)
+    finally:
+        server.stop()
+
+
+def _print_table(results: Dict[str, Dict[str, float]]) -> None:
+    def ms(value: Optional[float]) -> str:
+        return f"{value:.1f}" if value is not None else "-"
+
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}"
+          f"{'p99 ms':>10}{'ttft p50':>10}{'ttft p99':>10}")
+    for name, figures in results.items():
+        print(
+            f"{name:<12}{figures['requests']:>10}{figures['errors']:>8}{figures['requests_per_s']:>10.1f}"
+            f"{ms(figures['p50_ms']):>10}{ms(figures['p90_ms']):>10}{ms(figures['p99_ms']):>10}"
+            f"{ms(figures['ttft_p50_ms']):>10}{ms(figures['ttft_p99_ms']):>10}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the HTTP API against local stubs.")
+    parser.add_argument("--workers", type=int, default=2, help="API worker processes")
+    parser.add_argument("--threads", type=int, default=32, help="Threads per worker for blocking calls")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (endpoints: {','.join(ENDPOINTS)})")
+    parser.add_argument("--videos", type=int, default=8, help="Distinct videos")
+    parser.add_argument("--segments", type=int, default=400, help="Transcript length in segments")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake upstream latency per request, in seconds")
+    parser.add_argument("--completion-words", type=int, default=60, help="Words in each fake completion")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Delay between streamed words, in seconds")
+    parser.add_argument("--url", help="Load an API that is already running instead of starting one")
+    parser.add_argument("--video-ids", default="", help="Comma-separated video IDs to request with --url")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Fail above this share of errors")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(f"--mix: {e}")
+    if args.url:
+        target = urlsplit(args.url)
+        video_ids = [video_id.strip() for video_id in args.video_ids.split(",") if video_id.strip()]
+        if not target.hostname or not video_ids:
+            parser.error("--url needs a http://host:port URL and --video-ids")
+        results = asyncio.run(drive(target.hostname, target.port or 80, video_ids, mix, args.concurrency,
+                                    args.duration, args.warmup))
+    else:
+        results = run(args.workers, args.threads, args.concurrency, args.duration, args.warmup, mix, args.videos,
+                      args.segments, args.latency, args.completion_words, args.token_delay)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+
+    overall = results.get("all", {})
+    error_rate = overall.get("errors", 0) / overall["requests"] if overall.get("requests") else 1.0
+    if error_rate > args.max_error_rate:
+        print(f"Error rate {error_rate:.1%} is above {args.max_error_rate:.1%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
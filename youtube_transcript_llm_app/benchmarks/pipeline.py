@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Offline pipeline benchmark for YouTube Transcript LLM App.
+
+Runs get_transcript, get_video_title, analyze_transcript and a full app.py chat turn
+against local stand-ins (FakeTranscriptProvider and FakeOpenAIServer), across
+transcript sizes, and reports latency percentiles, throughput and peak memory.
+Results can be saved as a baseline and later runs checked against it.
+
+Usage (from youtube_transcript_llm_app/):
+    python -m benchmarks.pipeline --sizes 1,100,1000,10000 --iterations 10
+    python -m benchmarks.pipeline --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from .fakes import FakeOpenAIServer, FakeTranscriptProvider
+
+CASES = ("get_transcript", "get_video_title", "analyze_transcript", "chat_turn")
+DEFAULT_SIZES = (1, 100, 1000, 10000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def video_id_for(size: int) -> str:
+    """
+    Get the 11-character benchmark video ID for a transcript size.
+
+    Args:
+        size (int): Number of segments
+
+    Returns:
+        str: Video ID
+    """
+    return f"bench{size:06d}"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Get a percentile of samples by linear interpolation.
+
+    Args:
+        samples (List[float]): Measurements
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value
+    """
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time a callable and record its peak traced memory.
+
+    Timed iterations run without tracemalloc, which would distort latency; one extra
+    traced iteration afterwards measures peak allocation.
+
+    Args:
+        fn (Callable): Operation to benchmark
+        iterations (int): Timed iterations
+        warmup (int): Untimed iterations run first
+
+    Returns:
+        Dict[str, float]: p50/p90/p99/mean in ms, ops per second and peak memory in KB
+    """
+    for _ in range(warmup):
+        fn()
+    gc.collect()
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total_seconds = sum(samples) / 1000
+    return {
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p90_ms": round(percentile(samples, 90), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "mean_ms": round(statistics.mean(samples), 2),
+        "ops_per_s": round(len(samples) / total_seconds, 2) if total_seconds else 0.0,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def configure_environment(server: FakeOpenAIServer) -> None:
+    """
+    Point the app at the fake server and turn off caches that would hide the work.
+
+    Must run before utils or llm are imported, since some settings are read at import.
+
+    Args:
+        server (FakeOpenAIServer): Running fake server
+    """
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ["OPENAI_MAX_RETRIES"] = "0"
+    os.environ["YOUTUBE_BASE_URL"] = server.origin
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+    os.environ["TRANSCRIPT_CACHE_DISABLED"] = "1"
+    # Measure the pipeline, not the pacing of outbound calls
+    os.environ["YOUTUBE_RATE_LIMIT"] = "0"
+
+
+class ChatTurn:
+    """Drives app.py through Streamlit's AppTest: loads a video once, then times chat turns."""
+
+    def __init__(self, video_id: str):
+        from streamlit.testing.v1 import AppTest
+
+        app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+        self.app = AppTest.from_file(app_path, default_timeout=120)
+        self.app.run()
+        self.app.text_input[0].input(f"https://www.youtube.com/watch?v={video_id}").run()
+        self._check()
+        self.turn = 0
+
+    def _check(self) -> None:
+        if self.app.exception:
+            raise RuntimeError(f"app.py raised: {self.app.exception[0].message}")
+        if self.app.error:
+            raise RuntimeError(f"app.py showed an error: {self.app.error[0].value}")
+
+    def __call__(self) -> None:
+        self.turn += 1
+        self.app.chat_input[0].set_value(f"What does the speaker say about item{self.turn * 37}?").run()
+        self._check()
+
+
+def run(
+    sizes: List[int],
+    cases: List[str],
+    iterations: int = 10,
+    latency: float = 0.02,
+    completion_words: int = 60,
+    token_delay: float = 0.0,
+    prefill_delay: float = 0.0,
+    prompt_cache: Optional[Dict[str, int]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Run the benchmark cases against local fakes.
+
+    Args:
+        sizes (List[int]): Transcript sizes in segments
+        cases (List[str]): Case names from CASES
+        iterations (int): Timed iterations per case
+        latency (float): Fake server latency per request, in seconds
+        completion_words (int): Words in each fake completion
+        token_delay (float): Delay between streamed words, in seconds
+        prefill_delay (float): Delay per 1000 uncached prompt tokens, in seconds
+        prompt_cache (Dict[str, int], optional): Filled with the 'prompt_tokens' the fake
+            server received and how many of them were 'cached_tokens'
+
+    Returns:
+        Dict[str, Dict[str, float]]: Measurements keyed by 'case[size]'
+    """
+    server = FakeOpenAIServer(latency=latency, completion_words=completion_words, token_delay=token_delay,
+                              prefill_delay=prefill_delay).start()
+    configure_environment(server)
+    provider = FakeTranscriptProvider()
+    for size in sizes:
+        provider.register(video_id_for(size), size)
+
+    from llm import interactions
+    from utils import transcript_utils
+    from utils.shared_cache import get_shared_cache
+    from utils.transcript_resolver import get_track_listing_cache
+
+    results = {}
+    try:
+        with provider.install():
+            if "get_video_title" in cases:
+                titles = get_shared_cache("titles")
+
+                def title():
+                    # Clear the memo so every iteration makes the oEmbed round trip
+                    titles.clear()
+                    return transcript_utils.get_video_title(f"https://www.youtube.com/watch?v={video_id_for(1)}")
+
+                results["get_video_title"] = measure(title, iterations)
+
+            for size in sizes:
+                video_id = video_id_for(size)
+                if "get_transcript" in cases:
+                    listings = get_track_listing_cache()
+
+                    def transcript():
+                        # Clear cached track listings so every iteration lists and fetches
+                        listings.clear()
+                        return transcript_utils.get_transcript(video_id)
+
+                    results[f"get_transcript[{size}]"] = measure(transcript, iterations)
+                if "analyze_transcript" in cases:
+                    text = transcript_utils.get_transcript(video_id)
+                    results[f"analyze_transcript[{size}]"] = measure(
+                        lambda: interactions.analyze_transcript(text), iterations
+                    )
+                if "chat_turn" in cases:
+                    results[f"chat_turn[{size}]"] = measure(ChatTurn(video_id), iterations)
+    finally:
+        server.stop()
+        if prompt_cache is not None:
+            prompt_cache.update(prompt_tokens=server.prompt_tokens, cached_tokens=server.cached_tokens)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = 0.25,
+    slack_ms: float = 5.0,
+) -> List[str]:
+    """
+    Find cases whose median latency regressed against a baseline.
+
+    A case regresses when its p50 exceeds the baseline p50 by more than `threshold`
+    (a fraction) and by more than `slack_ms`, so sub-millisecond noise is ignored.
+
+    Args:
+        results (Dict): Current measurements
+        baseline (Dict): Stored measurements
+        threshold (float): Allowed relative slowdown
+        slack_ms (float): Allowed absolute slowdown in ms
+
+    Returns:
+        List[str]: One description per regression
+    """
+    regressions = []
+    for name, figures in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        allowed = max(reference["p50_ms"] * (1 + threshold), reference["p50_ms"] + slack_ms)
+        if figures["p50_ms"] > allowed:
+            regressions.append(
+                f"{name}: p50 {figures['p50_ms']:.2f} ms vs baseline {reference['p50_ms']:.2f} ms "
+                f"(allowed {allowed:.2f} ms)"
+            )
+    return regressions
+
+
+def _print_table(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'case':<28}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak KB':>12}")
+    for name, figures in results.items():
+        print(
+            f"{name:<28}{figures['p50_ms']:>10.2f}{figures['p90_ms']:>10.2f}{figures['p99_ms']:>10.2f}"
+            f"{figures['ops_per_s']:>10.2f}{figures['peak_kb']:>12.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the transcript and LLM pipeline offline.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated transcript sizes in segments")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"Comma-separated cases: {','.join(CASES)}")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed iterations per case")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake server latency per request, in seconds")
+    parser.add_argument("--completion-words", type=int, default=60, help="Words in each fake completion")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Delay between streamed words, in seconds")
+    parser.add_argument("--prefill-delay", type=float, default=0.0,
+                        help="Fake prompt processing time per 1000 uncached prompt tokens, in seconds")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE,
+                        help="Fail if results regress against this baseline file")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Write results as a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative p50 slowdown")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="Allowed absolute p50 slowdown in ms")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    prompt_cache = {}
+    results = run(sizes, cases, args.iterations, args.latency, args.completion_words, args.token_delay,
+                  args.prefill_delay, prompt_cache)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+        if prompt_cache["prompt_tokens"]:
+            print(f"Prompt cache: {prompt_cache['cached_tokens']} of {prompt_cache['prompt_tokens']} prompt tokens "
+                  f"cached ({prompt_cache['cached_tokens'] / prompt_cache['prompt_tokens']:.0%})")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.slack_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
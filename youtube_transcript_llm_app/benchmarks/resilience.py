@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the resilience layer (utils.resilience) against FakeOpenAIServer.
+
+Each scenario installs a fresh backend policy, injects 429s, 5xx errors or slow
+responses into the fake server, drives the real OpenAI and YouTube call paths and
+checks retries, Retry-After handling, deadlines, circuit breaking, the adaptive
+concurrency limit and rate limiting. Exits non-zero if any scenario fails.
+
+Usage (from youtube_transcript_llm_app/):
+    python -m benchmarks.resilience
+    python -m benchmarks.resilience --scenarios circuit_breaker,deadline
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from .fakes import FakeOpenAIServer
+from .pipeline import configure_environment
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def _timed(fn: Callable[[], object]):
+    started = time.perf_counter()
+    try:
+        return fn(), None, time.perf_counter() - started
+    except Exception as e:
+        return None, e, time.perf_counter() - started
+
+
+def throttled_retry(server: FakeOpenAIServer) -> List[str]:
+    """Two 429s with Retry-After: 0.3 are retried after at least that long, then succeed."""
+    from llm import interactions
+    from utils.resilience import Backend, set_backend
+
+    backend = Backend("openai", base_delay=0.01)
+    set_backend(backend)
+    server.inject(429, retry_after=0.3, count=2, kind="chat")
+    before = server.requests["chat"]
+    result, error, elapsed = _timed(lambda: interactions._complete(MESSAGES, max_tokens=5))
+    problems = []
+    if error is not None:
+        problems.append(f"call failed: {error!r}")
+    if elapsed < 0.6:
+        problems.append(f"Retry-After not honored: finished in {elapsed:.2f}s")
+    if server.requests["chat"] - before != 3:
+        problems.append(f"expected 3 requests, server saw {server.requests['chat'] - before}")
+    if backend.stats()["throttled"] != 2:
+        problems.append(f"expected 2 throttled attempts, got {backend.stats()['throttled']}")
+    return problems
+
+
+def youtube_retry(server: FakeOpenAIServer) -> List[str]:
+    """A 503 and a 429 from oEmbed are retried through the shared requests session."""
+    from utils import transcript_utils
+    from utils.resilience import Backend, set_backend
+
+    set_backend(Backend("youtube", base_delay=0.01))
+    server.inject(503, count=1, kind="youtube").inject(429, retry_after=0.1, count=1, kind="youtube")
+    metadata, error, _ = _timed(lambda: transcript_utils._request_video_metadata("resilience1"))
+    if error is not None:
+        return [f"call failed: {error!r}"]
+    if metadata.get("title") != "Benchmark video resilience1":
+        return [f"unexpected metadata: {metadata}"]
+    return []
+
+
+def deadline(server: FakeOpenAIServer) -> List[str]:
+    """A response slower than the call's deadline fails with DeadlineExceeded at the deadline."""
+    from llm import interactions
+    from utils.resilience import Backend, DeadlineExceeded, set_backend
+
+    set_backend(Backend("openai", deadline=0.5, base_delay=0.05))
+    server.inject(delay=2.0, count=4, kind="chat")
+    _, error, elapsed = _timed(lambda: interactions._complete(MESSAGES, max_tokens=5))
+    server.clear_faults()
+    problems = []
+    if not isinstance(error, DeadlineExceeded):
+        problems.append(f"expected DeadlineExceeded, got {error!r}")
+    if elapsed > 1.0:
+        problems.append(f"did not fail fast: took {elapsed:.2f}s against a 0.5s deadline")
+    return problems
+
+
+def circuit_breaker(server: FakeOpenAIServer) -> List[str]:
+    """Consecutive 503s open the circuit, calls are then rejected without a request, and a probe closes it."""
+    from llm import interactions
+    from utils.resilience import Backend, CircuitOpenError, set_backend
+
+    backend = Backend("openai", max_attempts=1, failure_threshold=3, reset_timeout=0.5)
+    set_backend(backend)
+    server.inject(503, count=3, kind="chat")
+    problems = []
+    for _ in range(3):
+        _, error, _ = _timed(lambda: interactions._complete(MESSAGES, max_tokens=5))
+        if error is None:
+            problems.append("an injected 503 did not fail the call")
+    if backend.breaker.state != backend.breaker.OPEN:
+        problems.append(f"circuit is {backend.breaker.state} after 3 failures")
+
+    before = server.requests["chat"]
+    _, error, elapsed = _timed(lambda: interactions._complete(MESSAGES, max_tokens=5))
+    if not isinstance(error, CircuitOpenError):
+        problems.append(f"expected CircuitOpenError while open, got {error!r}")
+    if server.requests["chat"] != before or elapsed > 0.05:
+        problems.append(f"open circuit still reached the server ({elapsed * 1000:.1f} ms)")
+
+    time.sleep(0.55)
+    _, error, _ = _timed(lambda: interactions._complete(MESSAGES, max_tokens=5))
+    if error is not None:
+        problems.append(f"half-open probe failed: {error!r}")
+    if backend.breaker.state != backend.breaker.CLOSED:
+        problems.append(f"circuit is {backend.breaker.state} after a successful probe")
+    return problems
+
+
+def adaptive_limit(server: FakeOpenAIServer) -> List[str]:
+    """Throttling halves the concurrency limit; successes grow it back additively."""
+    from llm import interactions
+    from utils.resilience import Backend, set_backend
+
+    backend = Backend("openai", concurrency=8, base_delay=0.01)
+    set_backend(backend)
+    server.inject(429, retry_after=0, count=1, kind="chat")
+    interactions._complete(MESSAGES, max_tokens=5)
+    shrunk = backend.limiter.limit
+    for _ in range(20):
+        interactions._complete(MESSAGES, max_tokens=5)
+    grown = backend.limiter.limit
+    problems = []
+    if shrunk > 4.5:
+        problems.append(f"limit did not shrink on 429: {shrunk:.2f}")
+    if grown < shrunk + 2:
+        problems.append(f"limit did not recover: {shrunk:.2f} -> {grown:.2f}")
+    return problems
+
+
+def rate_limit(server: FakeOpenAIServer) -> List[str]:
+    """A 20/s token bucket with a burst of 1 spaces 11 oEmbed requests over at least 0.5s."""
+    from utils import transcript_utils
+    from utils.resilience import Backend, set_backend
+
+    set_backend(Backend("youtube", rate=20, burst=1))
+    url = f"{server.origin}/oembed"
+    _, error, elapsed = _timed(lambda: [transcript_utils._youtube_get(url).close() for _ in range(11)])
+    if error is not None:
+        return [f"call failed: {error!r}"]
+    if elapsed < 0.48:
+        return [f"11 requests at 20/s took only {elapsed:.2f}s"]
+    return []
+
+
+SCENARIOS: Dict[str, Callable[[FakeOpenAIServer], List[str]]] = {
+    "throttled_retry": throttled_retry,
+    "youtube_retry": youtube_retry,
+    "deadline": deadline,
+    "circuit_breaker": circuit_breaker,
+    "adaptive_limit": adaptive_limit,
+    "rate_limit": rate_limit,
+}
+
+
+def run(scenarios: List[str], latency: float = 0.005) -> Dict[str, List[str]]:
+    """
+    Run resilience scenarios against a fake server.
+
+    Args:
+        scenarios (List[str]): Scenario names from SCENARIOS
+        latency (float): Fake server latency per request, in seconds
+
+    Returns:
+        Dict[str, List[str]]: Problems found, keyed by scenario (empty list = pass)
+    """
+    server = FakeOpenAIServer(latency=latency, completion_words=5).start()
+    configure_environment(server)
+    # A single model, so failures surface here instead of falling back to another model
+    from llm.routing import Router, load_model_table, set_router
+
+    set_router(Router(load_model_table(), pinned="gpt-4o-mini"))
+    results = {}
+    try:
+        for name in scenarios:
+            server.clear_faults()
+            try:
+                results[name] = SCENARIOS[name](server)
+            except Exception as e:
+                results[name] = [f"raised {e!r}"]
+    finally:
+        server.stop()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check retries, deadlines and circuit breaking offline.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios: {','.join(SCENARIOS)}")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+
+    results = run(scenarios)
+    for name, problems in results.items():
+        print(f"{'PASS' if not problems else 'FAIL'} {name}")
+        for problem in problems:
+            print(f"     {problem}")
+    return 1 if any(results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
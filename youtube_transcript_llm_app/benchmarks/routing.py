@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline checks of model routing (llm.routing) against FakeOpenAIServer.
+
+Each scenario installs a fresh router and backend policy, makes models slow or
+unavailable on the fake server, drives the real analyze/question/stream call paths
+and checks which model served each request, the completion budgets, fallbacks and
+the recorded latency and cost. Exits non-zero if any scenario fails.
+
+Usage (from youtube_transcript_llm_app/):
+    python -m benchmarks.routing
+    python -m benchmarks.routing --scenarios fallback_unavailable,latency_shift
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from .fakes import FakeOpenAIServer, make_segments
+from .pipeline import configure_environment
+
+
+def _fresh_router(**kwargs):
+    from llm.routing import Router, load_model_table, set_router
+    from utils.resilience import Backend, set_backend
+
+    set_backend(Backend("openai", base_delay=0.01, **kwargs.pop("backend", {})))
+    router = Router(load_model_table(), **dict({"probe_every": 0, "log_path": None}, **kwargs))
+    set_router(router)
+    return router
+
+
+def _transcript(segments: int) -> str:
+    return " ".join(segment["text"] for segment in make_segments(segments))
+
+
+def task_routing(server: FakeOpenAIServer) -> List[str]:
+    """Lookups get a small budget, summaries a budget that grows with the talk, both in one request."""
+    from llm import interactions
+    from llm.tokens import count_tokens
+
+    router = _fresh_router()
+    problems = []
+    short = _transcript(200)
+    interactions.analyze_transcript(short, "Who is the speaker?")
+    interactions.analyze_transcript(short, "Explain the argument the speaker builds in the second half.")
+    # Roughly a two-hour talk: too long for a 16k-token model, so it goes to a long-context one
+    talk = _transcript(3000)
+    before = server.requests["chat"]
+    interactions.analyze_transcript(talk, interactions.SUMMARY_REQUEST)
+    if server.requests["chat"] - before != 1:
+        problems.append(f"summary took {server.requests['chat'] - before} requests instead of 1")
+
+    lookup, answer, summary = router.decisions()[-3:]
+    if lookup["task"] != "lookup" or lookup["max_tokens"] >= answer["max_tokens"]:
+        problems.append(f"lookup not routed as one: {lookup}")
+    if answer["task"] != "answer" or router.models[answer["served_by"]].quality < 2:
+        problems.append(f"answer went to a weaker model than allowed: {answer}")
+    if summary["task"] != "summary" or summary["max_tokens"] <= 400:
+        problems.append(f"summary budget did not grow with the transcript: {summary}")
+    if router.models[summary["served_by"]].context_window < count_tokens(talk):
+        problems.append(f"summary went to a model whose window is too small: {summary['served_by']}")
+    return problems
+
+
+def latency_shift(server: FakeOpenAIServer) -> List[str]:
+    """When the preferred model turns slow, probes find the faster one and lookups move to it."""
+    from llm import interactions
+
+    router = _fresh_router(probe_every=4)
+    first = router.route("lookup", 500).model
+    server.model_latency[first] = 0.25
+    transcript = _transcript(100)
+    for _ in range(12):
+        interactions.analyze_transcript(transcript, "When does the talk start?")
+    served = [decision["served_by"] for decision in router.decisions()[-4:]]
+    if served.count(first) > 1:
+        return [f"still sending lookups to the slow model {first}: {served}, "
+                f"corrections {router.stats()['latency_correction']}"]
+    return []
+
+
+def fallback_unavailable(server: FakeOpenAIServer) -> List[str]:
+    """A 404 model_not_found falls back to the next model, which then serves directly during the cooldown."""
+    from llm import interactions
+
+    router = _fresh_router()
+    primary = router.route("answer", 500).model
+    server.unavailable_models.add(primary)
+    transcript = _transcript(100)
+    before = server.requests_by_model.get(primary, 0)
+    answer = interactions.analyze_transcript(transcript, "What is the main point of the talk?")
+    answer_again = interactions.analyze_transcript(transcript, "What examples does the speaker give?")
+    problems = []
+    for text in (answer, answer_again):
+        if text.startswith("Error"):
+            problems.append(f"request failed: {text}")
+    if server.requests_by_model.get(primary, 0) - before != 1:
+        problems.append(f"unavailable model tried {server.requests_by_model.get(primary, 0) - before} times, expected 1")
+    routes = router.stats()["routes"]
+    if routes.get(f"answer/{primary}", {}).get("failures") != 1:
+        problems.append(f"failure not recorded: {routes}")
+    if not any(stats["fallbacks"] == 1 for stats in routes.values()):
+        problems.append(f"fallback not recorded: {routes}")
+    return problems
+
+
+def fallback_timeout(server: FakeOpenAIServer) -> List[str]:
+    """A model slower than the deadline times out and the request is answered by the next model."""
+    from llm import interactions
+
+    router = _fresh_router(backend={"deadline": 0.5, "max_attempts": 1})
+    primary = router.route("questions", 500).model
+    server.model_latency[primary] = 2.0
+    started = time.perf_counter()
+    questions = interactions.suggest_questions(_transcript(100))
+    elapsed = time.perf_counter() - started
+    problems = []
+    if len(questions) != 5:
+        problems.append(f"expected 5 questions, got {questions}")
+    if elapsed > 1.5:
+        problems.append(f"fallback took {elapsed:.2f}s")
+    last = router.decisions()[-1]
+    if last["served_by"] == primary:
+        problems.append(f"answered by the slow model: {last}")
+    return problems
+
+
+def streaming_fallback(server: FakeOpenAIServer) -> List[str]:
+    """Opening a stream falls back to the next model; the served model's latency and cost are recorded."""
+    from llm import interactions
+
+    router = _fresh_router()
+    primary = router.route("answer", 500).model
+    server.unavailable_models.add(primary)
+    text = "".join(interactions.analyze_transcript_stream(_transcript(100), "Describe the speaker's main argument."))
+    last = router.decisions()[-1]
+    problems = []
+    if not text.strip():
+        problems.append("empty answer")
+    if last["served_by"] == primary or not last.get("cost_usd"):
+        problems.append(f"unexpected decision: {last}")
+    return problems
+
+
+def cost_audit(server: FakeOpenAIServer) -> List[str]:
+    """Every decision reaches the JSON-lines log, and logged costs add up to the totals in stats and metrics."""
+    from llm import interactions
+    from utils.instrumentation import get_registry
+
+    path = os.path.join(tempfile.mkdtemp(prefix="routing-"), "routes.jsonl")
+    router = _fresh_router(log_path=path)
+    transcript = _transcript(300)
+    interactions.analyze_transcript(transcript, interactions.SUMMARY_REQUEST)
+    interactions.analyze_transcript(transcript, "Who is the speaker?")
+    interactions.generate_questions(transcript)
+    with open(path, "r", encoding="utf-8") as f:
+        logged = [json.loads(line) for line in f]
+    problems = []
+    if len(logged) != 3:
+        problems.append(f"expected 3 logged decisions, got {len(logged)}")
+    total = router.stats()["total_cost_usd"]
+    if not total or abs(sum(entry.get("cost_usd", 0) for entry in logged) - total) > 1e-6:
+        problems.append(f"logged costs do not add up to {total}")
+    if "cost_usd_total" not in get_registry().to_prometheus():
+        problems.append("no cost_usd_total metric")
+    return problems
+
+
+SCENARIOS: Dict[str, Callable[[FakeOpenAIServer], List[str]]] = {
+    "task_routing": task_routing,
+    "latency_shift": latency_shift,
+    "fallback_unavailable": fallback_unavailable,
+    "fallback_timeout": fallback_timeout,
+    "streaming_fallback": streaming_fallback,
+    "cost_audit": cost_audit,
+}
+
+
+def run(scenarios: List[str], latency: float = 0.005) -> Dict[str, List[str]]:
+    """
+    Run routing scenarios against a fake server.
+
+    Args:
+        scenarios (List[str]): Scenario names from SCENARIOS
+        latency (float): Fake server latency per request, in seconds
+
+    Returns:
+        Dict[str, List[str]]: Problems found, keyed by scenario (empty list = pass)
+    """
+    server = FakeOpenAIServer(latency=latency, completion_words=20).start()
+    configure_environment(server)
+    results = {}
+    try:
+        for name in scenarios:
+            server.clear_faults()
+            server.model_latency.clear()
+            server.unavailable_models.clear()
+            try:
+                results[name] = SCENARIOS[name](server)
+            except Exception as e:
+                results[name] = [f"raised {e!r}"]
+    finally:
+        server.stop()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check model routing, fallbacks and cost records offline.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios: {','.join(SCENARIOS)}")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+
+    results = run(scenarios)
+    for name, problems in results.items():
+        print(f"{'PASS' if not problems else 'FAIL'} {name}")
+        for problem in problems:
+            print(f"     {problem}")
+    return 1 if any(results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
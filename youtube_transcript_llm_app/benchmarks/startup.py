@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for YouTube Transcript LLM App.
+
+Measures, in fresh interpreter processes, how long the app's modules take to import
+and how long Streamlit takes to produce the first render of app.py.
+
+Usage (from youtube_transcript_llm_app/):
+    python -m benchmarks.startup --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["utils.transcript_utils", "llm", "batch"]
+
+_IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+_RENDER_SNIPPET = """
+import time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=60)
+app.run()
+assert not app.exception, app.exception
+print(time.perf_counter() - started)
+"""
+
+
+def _run(snippet: str) -> float:
+    env = dict(os.environ)
+    # No real key is needed: nothing in the measured path may call OpenAI
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(repeat: int = 3) -> dict:
+    """
+    Measure import and first-render times.
+
+    Args:
+        repeat (int): Number of fresh processes per measurement
+
+    Returns:
+        dict: Median and max milliseconds keyed by measurement name
+    """
+    results = {}
+    targets = [(f"import {module}", _IMPORT_SNIPPET.format(module=module)) for module in MODULES]
+    targets.append(("first render (app.py)", _RENDER_SNIPPET))
+    for name, snippet in targets:
+        samples = [_run(snippet) * 1000 for _ in range(repeat)]
+        results[name] = {"median_ms": round(statistics.median(samples), 1), "max_ms": round(max(samples), 1)}
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure import time and time to first render.")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh processes per measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = measure(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, figures in results.items():
+            print(f"{name:<32} median {figures['median_ms']:>8.1f} ms   max {figures['max_ms']:>8.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
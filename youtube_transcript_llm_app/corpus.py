@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Build and query the multi-video corpus index used for cross-video search and Q&A.
+
+Reads video URLs or IDs (one per line, as for batch.py) and adds their transcripts
+to the index in CORPUS_DIR (or --dir); then searches it or answers questions from
+the best passages across every indexed video.
+
+Example:
+    python corpus.py add playlist.txt --concurrency 4
+    python corpus.py search "gradient descent learning rate"
+    python corpus.py ask "How do the speakers choose a learning rate?"
+    python corpus.py remove dQw4w9WgXcQ
+    python corpus.py compact
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from batch import read_inputs
+from llm.corpus import CORPUS_TOP_K, DEFAULT_CORPUS_DIR, CorpusIndex, ask
+
+
+def fetch(video_id: str, languages: List[str], titles: bool) -> Tuple[str, Optional[object], str, Optional[str]]:
+    """
+    Fetch one video's timestamped transcript and title.
+
+    Args:
+        video_id (str): YouTube video ID
+        languages (List[str]): Preferred transcript languages
+        titles (bool): Look up the video title as well
+
+    Returns:
+        Tuple: (video_id, transcript or None, title, error message or None)
+    """
+    from utils import transcript_utils
+
+    try:
+        result = transcript_utils.get_transcript_result(video_id, languages)
+        if not result.ok:
+            return video_id, None, "", result.message
+        title = transcript_utils.get_video_metadata(video_id).get("title", "") if titles else ""
+        return video_id, result.transcript, title, None
+    except Exception as e:
+        return video_id, None, "", f"Error fetching transcript: {str(e)}"
+
+
+def ingest(index: CorpusIndex, video_ids: List[str], languages: List[str], concurrency: int = 4,
+           commit_every: int = 200, titles: bool = True) -> dict:
+    """
+    Fetch transcripts concurrently and add them to the index, committing in batches.
+
+    At most commit_every transcripts are held in memory at a time.
+
+    Args:
+        index (CorpusIndex): Index to add to
+        video_ids (List[str]): Videos to add
+        languages (List[str]): Preferred transcript languages
+        concurrency (int): Concurrent transcript fetches
+        commit_every (int): Videos per commit
+        titles (bool): Look up video titles
+
+    Returns:
+        dict: Counts of 'added', 'passages' and 'failed' videos plus 'elapsed_seconds'
+    """
+    started = time.perf_counter()
+    summary = {"added": 0, "passages": 0, "failed": 0}
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="youtube") as pool:
+        for first in range(0, len(video_ids), commit_every):
+            batch = video_ids[first:first + commit_every]
+            for video_id, transcript, title, error in pool.map(lambda v: fetch(v, languages, titles), batch):
+                if transcript is None:
+                    print(f"Skipping {video_id}: {error}", file=sys.stderr)
+                    summary["failed"] += 1
+                    continue
+                summary["passages"] += index.add(video_id, transcript, title)
+                summary["added"] += 1
+            index.commit()
+            print(f"{first + len(batch)} of {len(video_ids)} videos processed", file=sys.stderr)
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and query the cross-video corpus index.")
+    parser.add_argument("--dir", default=DEFAULT_CORPUS_DIR, help="Index directory (default: CORPUS_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add videos from a file of URLs or IDs ('-' for stdin)")
+    add.add_argument("input")
+    add.add_argument("--languages", default="en", help="Comma-separated preferred transcript languages")
+    add.add_argument("--concurrency", type=int, default=4, help="Concurrent transcript fetches")
+    add.add_argument("--commit-every", type=int, default=200, help="Videos per commit")
+    add.add_argument("--skip-existing", action="store_true", help="Skip videos already in the index")
+    add.add_argument("--no-titles", action="store_true", help="Do not look up video titles")
+
+    remove = commands.add_parser("remove", help="Remove videos by URL or ID")
+    remove.add_argument("videos", nargs="+")
+
+    search = commands.add_parser("search", help="Find matching passages across all videos")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=10, help="Number of hits")
+    search.add_argument("--json", action="store_true", help="Print hits as JSON lines")
+
+    question = commands.add_parser("ask", help="Answer a question from the best passages across all videos")
+    question.add_argument("question")
+    question.add_argument("-k", type=int, default=CORPUS_TOP_K, help="Passages sent to the LLM")
+
+    commands.add_parser("compact", help="Merge all segments and drop removed videos")
+    commands.add_parser("stats", help="Show index size")
+    args = parser.parse_args(argv)
+
+    index = CorpusIndex(args.dir)
+
+    if args.command == "add":
+        if args.input == "-":
+            video_ids = read_inputs(sys.stdin)
+        else:
+            with open(args.input, "r", encoding="utf-8") as f:
+                video_ids = read_inputs(f)
+        if args.skip_existing:
+            video_ids = [video_id for video_id in video_ids if video_id not in index]
+        summary = ingest(index, video_ids, args.languages.split(","), args.concurrency, args.commit_every,
+                         titles=not args.no_titles)
+        print(json.dumps(dict(summary, **index.stats())), file=sys.stderr)
+        return 0 if summary["failed"] == 0 else 1
+
+    if args.command == "remove":
+        missing = [video_id for video_id in read_inputs(args.videos) if not index.remove(video_id)]
+        index.commit()
+        for video_id in missing:
+            print(f"Not in the index: {video_id}", file=sys.stderr)
+        return 0 if not missing else 1
+
+    if args.command == "search":
+        hits = index.search(args.query, args.k)
+        for hit in hits:
+            print(json.dumps(hit.to_dict(), ensure_ascii=False) if args.json else f"{hit.format()}\n  {hit.url}")
+        print(f"{len(hits)} hits in {index.stats()['last_query_ms']:.1f} ms", file=sys.stderr)
+        return 0
+
+    if args.command == "ask":
+        answer, hits = ask(index, args.question, args.k)
+        print(answer)
+        if hits:
+            print("\nSources:")
+            for hit in hits:
+                print(f"- {hit.title or hit.video_id}: {hit.url}")
+        return 0
+
+    if args.command == "compact":
+        index.compact()
+
+    print(json.dumps(index.stats()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
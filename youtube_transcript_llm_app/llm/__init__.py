@@ -1 +1,9 @@
-from .interactions import analyze_transcript, generate_questions
+from .interactions import (
+    analyze_transcript,
+    analyze_transcript_stream,
+    generate_questions,
+    map_reduce_transcript,
+    summarize_conversation,
+)
+from .memory import ConversationMemory
+from .response_cache import ResponseCache, get_response_cache
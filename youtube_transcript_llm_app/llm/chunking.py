@@ -0,0 +1,190 @@
+# Token-aware chunking and map-reduce helpers for long transcripts
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+from utils.transcript import format_timestamp
+
+from .tokens import count_tokens
+
+# Tokens of transcript text per "map" request, and how many map requests run at once
+DEFAULT_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", 6000))
+DEFAULT_MAP_CONCURRENCY = int(os.getenv("LLM_MAP_CONCURRENCY", 4))
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+class Chunk:
+    """
+    A contiguous piece of transcript that fits within a token budget.
+
+    Attributes:
+        text (str): Chunk text
+        tokens (int): Token count of the text
+        start (float, optional): Start time in seconds, if known
+        end (float, optional): End time in seconds, if known
+    """
+
+    __slots__ = ("text", "tokens", "start", "end")
+
+    def __init__(self, text: str, tokens: int, start: Optional[float] = None, end: Optional[float] = None):
+        self.text = text
+        self.tokens = tokens
+        self.start = start
+        self.end = end
+
+    def label(self) -> str:
+        """
+        Get a human-readable time range for the chunk.
+
+        Returns:
+            str: e.g. '12:30-25:10', or an empty string if timing is unknown
+        """
+        if self.start is None or self.end is None:
+            return ""
+        return f"{format_timestamp(self.start)}-{format_timestamp(self.end)}"
+
+
+def _split_oversized(text: str, max_tokens: int, model: str) -> List[str]:
+    # Break text that is too large for one chunk on sentence, then word, boundaries
+    pieces = []
+    current = []
+    current_tokens = 0
+    for sentence in _SENTENCE_SPLIT.split(text):
+        units = [sentence] if count_tokens(sentence, model) <= max_tokens else sentence.split()
+        for unit in units:
+            unit_tokens = count_tokens(unit, model) + 1
+            if current and current_tokens + unit_tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(unit)
+            current_tokens += unit_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS, model: str = "gpt-3.5-turbo") -> List[Chunk]:
+    """
+    Split plain transcript text into chunks, preferring sentence boundaries.
+
+    Args:
+        text (str): Transcript text
+        max_tokens (int): Token budget per chunk
+        model (str): Model whose tokenizer is used for counting
+
+    Returns:
+        List[Chunk]: Chunks in transcript order
+    """
+    return [Chunk(piece, count_tokens(piece, model)) for piece in _split_oversized(text, max_tokens, model)]
+
+
+def chunk_segments(
+    segments: List[Dict],
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    model: str = "gpt-3.5-turbo",
+) -> List[Chunk]:
+    """
+    Split timestamped segments into chunks without cutting through a segment.
+
+    A single segment larger than the budget is split on sentence boundaries and
+    its pieces share the segment's time range.
+
+    Args:
+        segments (List[Dict]): Segments with 'text', 'start' and 'duration' (or a Transcript)
+        max_tokens (int): Token budget per chunk
+        model (str): Model whose tokenizer is used for counting
+
+    Returns:
+        List[Chunk]: Chunks in transcript order, with start/end times
+    """
+    chunks = []
+    texts = []
+    tokens = 0
+    start = end = None
+
+    def flush():
+        if texts:
+            text = " ".join(texts)
+            chunks.append(Chunk(text, tokens, start, end))
+
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        seg_start = float(segment.get("start", 0.0))
+        seg_end = seg_start + float(segment.get("duration", 0.0))
+        seg_tokens = count_tokens(text, model) + 1
+
+        if seg_tokens > max_tokens:
+            flush()
+            texts, tokens, start = [], 0, None
+            for piece in _split_oversized(text, max_tokens, model):
+                chunks.append(Chunk(piece, count_tokens(piece, model), seg_start, seg_end))
+            continue
+
+        if texts and tokens + seg_tokens > max_tokens:
+            flush()
+            texts, tokens, start = [], 0, None
+
+        if start is None:
+            start = seg_start
+        texts.append(text)
+        tokens += seg_tokens
+        end = seg_end
+
+    flush()
+    return chunks
+
+
+def chunk_transcript(
+    transcript: Union[str, List[Dict]],
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    model: str = "gpt-3.5-turbo",
+) -> List[Chunk]:
+    """
+    Split a transcript given either as text or as timestamped segments.
+
+    Args:
+        transcript (Union[str, List[Dict], Transcript]): Transcript text, segment list or Transcript
+        max_tokens (int): Token budget per chunk
+        model (str): Model whose tokenizer is used for counting
+
+    Returns:
+        List[Chunk]: Chunks in transcript order
+    """
+    if isinstance(transcript, str):
+        return chunk_text(transcript, max_tokens, model)
+    return chunk_segments(transcript, max_tokens, model)
+
+
+def map_reduce(
+    chunks: List[Chunk],
+    map_fn: Callable[[Chunk, int, int], str],
+    reduce_fn: Callable[[List[str]], str],
+    max_workers: int = DEFAULT_MAP_CONCURRENCY,
+) -> str:
+    """
+    Run map_fn over every chunk concurrently, then combine the results with reduce_fn.
+
+    Args:
+        chunks (List[Chunk]): Chunks to process
+        map_fn (Callable): Called as map_fn(chunk, index, total); returns partial result text
+        reduce_fn (Callable): Called once with the partial results in chunk order
+        max_workers (int): Maximum number of concurrent map calls
+
+    Returns:
+        str: Reduced result
+    """
+    total = len(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+        # Each call runs in a copy of the caller's context so tracing spans reach the caller's trace
+        futures = [
+            pool.submit(contextvars.copy_context().run, map_fn, chunk, index, total)
+            for index, chunk in enumerate(chunks)
+        ]
+        partials = [future.result() for future in futures]
+    return reduce_fn(partials)
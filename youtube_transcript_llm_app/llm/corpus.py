@@ -0,0 +1,721 @@
+# Multi-video corpus index: an on-disk inverted index with memory-mapped postings
+import json
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import merge, nlargest
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.instrumentation import span
+from utils.transcript import format_timestamp
+from .retrieval import DEFAULT_WINDOW_TOKENS, build_windows, tokenize
+
+# Default settings, overridable through environment variables
+DEFAULT_CORPUS_DIR = os.path.expanduser(os.getenv("CORPUS_DIR", "~/.cache/youtube_transcript_llm/corpus"))
+# Passages handed to the LLM for a question about the whole corpus
+CORPUS_TOP_K = 8
+CORPUS_CONTEXT_LABEL = "Excerpts from videos in the library, with titles and timestamps"
+
+# Segment files allowed before a commit merges the smallest ones
+MAX_SEGMENTS = 8
+# Terms with more postings than this in a segment are never scanned in full. They also
+# store a champion list: the CHAMPION_POSTINGS passages where they weigh most. Such a term
+# rescores the passages rarer query terms found or, if the query has none, starts from
+# its champions
+MAX_SCANNED_POSTINGS = 4000
+CHAMPION_POSTINGS = 1000
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_MAGIC = b"YTCORP01"
+_MANIFEST = "manifest.json"
+# Sections of a segment file after its JSON metadata, with their array typecodes ('B': raw bytes)
+_SECTIONS = (
+    ("passage_video", "I"), ("passage_start", "d"), ("passage_end", "d"), ("passage_length", "I"),
+    ("text_offsets", "Q"), ("text", "B"),
+    ("term_offsets", "Q"), ("terms", "B"),
+    ("posting_offsets", "Q"), ("posting_ids", "I"), ("posting_tfs", "H"),
+    ("champion_offsets", "Q"), ("champion_ids", "I"),
+)
+# Magic, byte order, then (offset, length) of the metadata and of each section
+_HEADER = struct.Struct("<8s8s" + "QQ" * (len(_SECTIONS) + 1))
+_MAX_TF = 65535
+
+
+class CorpusHit:
+    """
+    A passage of one video that matched a corpus query.
+
+    Attributes:
+        video_id (str): YouTube video ID
+        title (str): Video title ('' if unknown)
+        start (float, optional): Start time in seconds
+        end (float, optional): End time in seconds
+        text (str): Passage text
+        score (float): BM25 score
+    """
+
+    __slots__ = ("video_id", "title", "start", "end", "text", "score")
+
+    def __init__(self, video_id: str, title: str, start: Optional[float], end: Optional[float], text: str,
+                 score: float):
+        self.video_id = video_id
+        self.title = title
+        self.start = start
+        self.end = end
+        self.text = text
+        self.score = score
+
+    @property
+    def url(self) -> str:
+        """Watch URL starting at the passage."""
+        from utils.transcript_view import timestamp_url
+
+        return timestamp_url(self.video_id, self.start or 0.0)
+
+    def format(self) -> str:
+        """
+        Render the passage with its video and time range for inclusion in a prompt.
+
+        Returns:
+            str: e.g. '[Title (video_id) 12:30-13:10] text'
+        """
+        source = f"{self.title} ({self.video_id})" if self.title else self.video_id
+        if self.start is None:
+            return f"[{source}] {self.text}"
+        return f"[{source} {format_timestamp(self.start)}-{format_timestamp(self.end)}] {self.text}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "video_id": self.video_id,
+            "title": self.title,
+            "start": self.start,
+            "end": self.end,
+            "url": self.url,
+            "score": round(self.score, 4),
+            "text": self.text,
+        }
+
+
+def format_hits(hits: List[CorpusHit]) -> str:
+    """
+    Join corpus hits into a prompt-ready block.
+
+    Args:
+        hits (List[CorpusHit]): Hits to include
+
+    Returns:
+        str: Hits separated by blank lines
+    """
+    return "\n\n".join(hit.format() for hit in hits)
+
+
+class _Segment:
+    """
+    Read-only view of one segment file through mmap.
+
+    Only the JSON metadata (the segment's video IDs and titles) is parsed up front;
+    every other section is a zero-copy memoryview, so the operating system pages in
+    just the term dictionary entries and postings that queries touch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._mmap, 0)
+        if header[0] != _MAGIC:
+            raise ValueError(f"{path} is not a corpus segment")
+        if header[1].rstrip(b"\0").decode("ascii") != sys.byteorder:
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+
+        view = memoryview(self._mmap)
+        offset, length = header[2], header[3]
+        meta = json.loads(bytes(view[offset:offset + length]))
+        self.videos: List[List[str]] = meta["videos"]
+        self.total_length: int = meta["total_length"]
+        sections = {}
+        for i, (name, code) in enumerate(_SECTIONS):
+            offset, length = header[4 + 2 * i], header[5 + 2 * i]
+            part = view[offset:offset + length]
+            sections[name] = part if code == "B" else part.cast(code)
+        self.passage_video = sections["passage_video"]
+        self.passage_start = sections["passage_start"]
+        self.passage_end = sections["passage_end"]
+        self.passage_length = sections["passage_length"]
+        self._text_offsets = sections["text_offsets"]
+        self._text = sections["text"]
+        self._term_offsets = sections["term_offsets"]
+        self._terms = sections["terms"]
+        self._posting_offsets = sections["posting_offsets"]
+        self._posting_ids = sections["posting_ids"]
+        self._posting_tfs = sections["posting_tfs"]
+        self._champion_offsets = sections["champion_offsets"]
+        self._champion_ids = sections["champion_ids"]
+        self.passages = len(self.passage_video)
+        self.terms = len(self._term_offsets) - 1
+        self.nbytes = len(self._mmap)
+
+    def term(self, index: int) -> bytes:
+        return bytes(self._terms[self._term_offsets[index]:self._term_offsets[index + 1]])
+
+    def find(self, term: bytes) -> int:
+        # Binary search of the sorted term dictionary, reading entries straight from the mapping
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.terms and self.term(low) == term else -1
+
+    def postings_at(self, index: int) -> Tuple[memoryview, memoryview]:
+        first, last = self._posting_offsets[index], self._posting_offsets[index + 1]
+        return self._posting_ids[first:last], self._posting_tfs[first:last]
+
+    def postings(self, term: bytes) -> Tuple[int, memoryview, memoryview]:
+        """Term index, passage IDs (ascending) and term frequencies of a term; -1 and empty if absent."""
+        index = self.find(term)
+        if index < 0:
+            return index, self._posting_ids[0:0], self._posting_tfs[0:0]
+        return (index,) + self.postings_at(index)
+
+    def champions(self, index: int) -> memoryview:
+        """Passage IDs (ascending) where a common term weighs most; empty for other terms."""
+        return self._champion_ids[self._champion_offsets[index]:self._champion_offsets[index + 1]]
+
+    def iter_terms(self, tag: int) -> Iterator[Tuple[bytes, int, int]]:
+        for index in range(self.terms):
+            yield self.term(index), tag, index
+
+    def text(self, passage: int) -> bytes:
+        return bytes(self._text[self._text_offsets[passage]:self._text_offsets[passage + 1]])
+
+
+class _SegmentWriter:
+    """
+    Assembles one segment file.
+
+    Passage text and postings are spooled to temporary files as they arrive, so
+    merging large segments does not hold them in memory. Terms must be added in
+    ascending byte order.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.videos: List[List[str]] = []
+        self.total_length = 0
+        self.passage_video = array("I")
+        self.passage_start = array("d")
+        self.passage_end = array("d")
+        self.passage_length = array("I")
+        self.text_offsets = array("Q", [0])
+        self.term_offsets = array("Q", [0])
+        self.terms = bytearray()
+        self.posting_offsets = array("Q", [0])
+        self.champion_offsets = array("Q", [0])
+        self.champion_ids = array("I")
+        self._text = tempfile.TemporaryFile(dir=directory)
+        self._ids = tempfile.TemporaryFile(dir=directory)
+        self._tfs = tempfile.TemporaryFile(dir=directory)
+
+    @property
+    def passages(self) -> int:
+        return len(self.passage_video)
+
+    def add_video(self, video_id: str, title: str) -> int:
+        self.videos.append([video_id, title])
+        return len(self.videos) - 1
+
+    def add_passage(self, video: int, start: float, end: float, length: int, text: bytes) -> int:
+        self.passage_video.append(video)
+        self.passage_start.append(start)
+        self.passage_end.append(end)
+        self.passage_length.append(length)
+        self.total_length += length
+        self._text.write(text)
+        self.text_offsets.append(self.text_offsets[-1] + len(text))
+        return len(self.passage_video) - 1
+
+    def add_term(self, term: bytes, ids: array, tfs: array) -> None:
+        self.terms += term
+        self.term_offsets.append(len(self.terms))
+        ids.tofile(self._ids)
+        tfs.tofile(self._tfs)
+        self.posting_offsets.append(self.posting_offsets[-1] + len(ids))
+        if len(ids) > MAX_SCANNED_POSTINGS:
+            # Passages are all added before any term, so the length statistics are final
+            lengths = self.passage_length
+            average_length = self.total_length / len(lengths)
+            weights = [tf / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[passage] / average_length))
+                       for passage, tf in zip(ids, tfs)]
+            best = nlargest(CHAMPION_POSTINGS, range(len(ids)), key=weights.__getitem__)
+            self.champion_ids.extend(sorted(ids[position] for position in best))
+        self.champion_offsets.append(len(self.champion_ids))
+
+    def finish(self, path: str) -> None:
+        """Write the segment to path atomically and release the spool files."""
+        meta = json.dumps({"videos": self.videos, "total_length": self.total_length}).encode("utf-8")
+        sources = {
+            "text": self._text, "terms": bytes(self.terms), "posting_ids": self._ids, "posting_tfs": self._tfs,
+            "passage_video": self.passage_video, "passage_start": self.passage_start,
+            "passage_end": self.passage_end, "passage_length": self.passage_length,
+            "text_offsets": self.text_offsets, "term_offsets": self.term_offsets,
+            "posting_offsets": self.posting_offsets, "champion_offsets": self.champion_offsets,
+            "champion_ids": self.champion_ids,
+        }
+        spans = []
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as out:
+                out.write(b"\0" * _HEADER.size)
+                for source in [meta] + [sources[name] for name, _ in _SECTIONS]:
+                    # Sections start 8-byte aligned so their memoryview casts are aligned too
+                    out.write(b"\0" * (-out.tell() % 8))
+                    offset = out.tell()
+                    if isinstance(source, array):
+                        source.tofile(out)
+                    elif isinstance(source, bytes):
+                        out.write(source)
+                    else:
+                        source.seek(0)
+                        shutil.copyfileobj(source, out)
+                    spans.extend((offset, out.tell() - offset))
+                out.seek(0)
+                out.write(_HEADER.pack(_MAGIC, sys.byteorder.encode("ascii"), *spans))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, path)
+        finally:
+            self.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def close(self) -> None:
+        for spool in (self._text, self._ids, self._tfs):
+            spool.close()
+
+
+class CorpusIndex:
+    """
+    Inverted index over the transcripts of many videos, kept in a directory.
+
+    Videos are split into passages of about window_tokens tokens (the same windows
+    as the per-video retrieval index) and searched with BM25 across the whole
+    corpus. Each commit writes the videos added since the previous one as a new
+    immutable segment file and records it in a JSON manifest; removing or re-adding
+    a video marks its old passages deleted there. When more than max_segments
+    segments exist, the smallest are merged, dropping deleted videos. Postings
+    are fixed-width arrays read through mmap, so memory use does not grow with the
+    corpus beyond the list of video IDs.
+
+    One process should write to a directory at a time. Readers in other processes
+    see new commits on their next search.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CORPUS_DIR, window_tokens: int = DEFAULT_WINDOW_TOKENS,
+                 max_segments: int = MAX_SEGMENTS):
+        self.directory = directory
+        self.window_tokens = window_tokens
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Tuple[str, list]] = {}
+        self._removed = set()
+        self._segments: List[_Segment] = []
+        self._deleted: Dict[str, set] = {}
+        self._deleted_videos: Dict[str, set] = {}
+        self._locations: Dict[str, str] = {}
+        self._next_segment = 1
+        self._manifest_mtime = None
+        self.last_query_seconds = 0.0
+        self._load()
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, _MANIFEST)
+
+    def _load(self) -> None:
+        # (Re)read the manifest, reusing segments that are already open
+        with self._lock:
+            for attempt in range(3):
+                try:
+                    mtime = os.stat(self._manifest_path).st_mtime_ns
+                    with open(self._manifest_path, "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except FileNotFoundError:
+                    mtime, manifest = None, {"next_segment": 1, "segments": []}
+                opened = {segment.name: segment for segment in self._segments}
+                try:
+                    segments = [
+                        opened.get(entry["name"]) or _Segment(os.path.join(self.directory, entry["name"]))
+                        for entry in manifest["segments"]
+                    ]
+                    break
+                except FileNotFoundError:
+                    # A merge in another process replaced a segment between reads
+                    if attempt == 2:
+                        raise
+                    time.sleep(0.05)
+
+            self._segments = segments
+            self._next_segment = manifest["next_segment"]
+            self._deleted_videos = {entry["name"]: set(entry["deleted"]) for entry in manifest["segments"]}
+            self._deleted = {}
+            self._locations = {}
+            for segment in segments:
+                deleted_videos = self._deleted_videos[segment.name]
+                self._deleted[segment.name] = {
+                    ordinal for ordinal, (video_id, _) in enumerate(segment.videos) if video_id in deleted_videos
+                }
+                for video_id, _ in segment.videos:
+                    if video_id not in deleted_videos:
+                        self._locations[video_id] = segment.name
+            self._manifest_mtime = mtime
+
+    def _refresh(self) -> None:
+        # Pick up commits made by other processes
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self._load()
+
+    def _write_manifest(self, segments: List[str]) -> None:
+        manifest = {
+            "version": 1,
+            "next_segment": self._next_segment,
+            "segments": [{"name": name, "deleted": sorted(self._deleted_videos.get(name, ()))} for name in segments],
+        }
+        temp_path = f"{self._manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._manifest_path)
+
+    def _new_segment_path(self) -> str:
+        name = f"seg_{self._next_segment:06d}.idx"
+        self._next_segment += 1
+        return os.path.join(self.directory, name)
+
+    def __contains__(self, video_id: str) -> bool:
+        with self._lock:
+            return video_id in self._pending or (video_id in self._locations and video_id not in self._removed)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(set(self._locations) - self._removed | set(self._pending))
+
+    def add(self, video_id: str, transcript, title: str = "") -> int:
+        """
+        Stage a video's transcript for the next commit, replacing any earlier version.
+
+        Args:
+            video_id (str): YouTube video ID
+            transcript (Union[str, Transcript, List[Dict]]): Transcript text or timestamped segments
+            title (str): Video title shown with its hits
+
+        Returns:
+            int: Number of passages the video was split into
+        """
+        passages = []
+        for window in build_windows(transcript, self.window_tokens):
+            terms = Counter(tokenize(window.text))
+            if terms:
+                start = -1.0 if window.start is None else window.start
+                end = -1.0 if window.end is None else window.end
+                passages.append((start, end, terms, window.text.encode("utf-8")))
+        with self._lock:
+            self._pending[video_id] = (title, passages)
+            self._removed.discard(video_id)
+        return len(passages)
+
+    def remove(self, video_id: str) -> bool:
+        """
+        Stage the removal of a video for the next commit.
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            bool: True if the video was in the index or staged
+        """
+        with self._lock:
+            staged = self._pending.pop(video_id, None) is not None
+            if video_id in self._locations:
+                self._removed.add(video_id)
+                return True
+            return staged
+
+    def commit(self) -> None:
+        """Write staged additions as a new segment and apply staged removals."""
+        with self._lock, span("corpus.commit") as attrs:
+            self._refresh()
+            if not self._pending and not self._removed:
+                return
+            names = [segment.name for segment in self._segments]
+            if self._pending:
+                path = self._new_segment_path()
+                self._write_pending(path)
+                names.append(os.path.basename(path))
+            attrs["videos_added"] = len(self._pending)
+            attrs["videos_removed"] = len(self._removed)
+            # Earlier versions of re-added videos are deleted along with removed ones
+            for video_id in set(self._pending) | self._removed:
+                location = self._locations.get(video_id)
+                if location is not None:
+                    self._deleted_videos[location].add(video_id)
+            self._pending = {}
+            self._removed = set()
+            self._write_manifest(names)
+            self._load()
+            if len(self._segments) > self.max_segments:
+                # Tiered merging: the small segments are merged, large ones are rarely rewritten
+                by_size = sorted(self._segments, key=lambda segment: segment.passages)
+                self._merge(by_size[:len(by_size) - self.max_segments // 2])
+
+    def _write_pending(self, path: str) -> None:
+        writer = _SegmentWriter(self.directory)
+        try:
+            postings: Dict[bytes, Tuple[array, array]] = {}
+            for video_id, (title, passages) in self._pending.items():
+                video = writer.add_video(video_id, title)
+                for start, end, terms, text in passages:
+                    passage = writer.add_passage(video, start, end, sum(terms.values()), text)
+                    for term, count in terms.items():
+                        entry = postings.get(term)
+                        if entry is None:
+                            entry = postings[term] = (array("I"), array("H"))
+                        entry[0].append(passage)
+                        entry[1].append(min(count, _MAX_TF))
+            for term in sorted(postings, key=lambda term: term.encode("utf-8")):
+                writer.add_term(term.encode("utf-8"), *postings[term])
+            writer.finish(path)
+        except BaseException:
+            writer.close()
+            raise
+
+    def compact(self) -> None:
+        """Commit staged changes, then merge every segment into one without deleted videos."""
+        with self._lock:
+            self.commit()
+            if len(self._segments) > 1 or any(self._deleted.values()):
+                self._merge(list(self._segments))
+
+    def _merge(self, segments: List[_Segment]) -> None:
+        # Called with the lock held
+        with span("corpus.merge", segments=len(segments)) as attrs:
+            path = self._new_segment_path()
+            writer = _SegmentWriter(self.directory)
+            try:
+                # New passage IDs: segments in order, skipping deleted videos
+                mappings = []
+                for segment in segments:
+                    deleted = self._deleted[segment.name]
+                    base = writer.passages
+                    videos = {}
+                    for ordinal, (video_id, title) in enumerate(segment.videos):
+                        if ordinal not in deleted:
+                            videos[ordinal] = writer.add_video(video_id, title)
+                    mapping = None if not deleted else array("i", [-1]) * segment.passages
+                    for passage in range(segment.passages):
+                        video = videos.get(segment.passage_video[passage])
+                        if video is None:
+                            continue
+                        new = writer.add_passage(video, segment.passage_start[passage], segment.passage_end[passage],
+                                                 segment.passage_length[passage], segment.text(passage))
+                        if mapping is not None:
+                            mapping[passage] = new
+                    # Segments without deletions keep their order, so their IDs only shift by base
+                    mappings.append(base if mapping is None else mapping)
+
+                terms = merge(*(segment.iter_terms(tag) for tag, segment in enumerate(segments)))
+                for term, group in groupby(terms, key=lambda entry: entry[0]):
+                    ids = array("I")
+                    tfs = array("H")
+                    for _, tag, index in group:
+                        segment_ids, segment_tfs = segments[tag].postings_at(index)
+                        mapping = mappings[tag]
+                        if isinstance(mapping, int):
+                            if mapping:
+                                ids.extend(map(mapping.__add__, segment_ids))
+                            else:
+                                ids.frombytes(segment_ids.tobytes())
+                            tfs.frombytes(segment_tfs.tobytes())
+                        else:
+                            for passage, tf in zip(segment_ids, segment_tfs):
+                                new = mapping[passage]
+                                if new >= 0:
+                                    ids.append(new)
+                                    tfs.append(tf)
+                    if ids:
+                        writer.add_term(term, ids, tfs)
+                attrs["passages"] = writer.passages
+                writer.finish(path)
+            except BaseException:
+                writer.close()
+                raise
+
+            merged = {segment.name for segment in segments}
+            names = [segment.name for segment in self._segments if segment.name not in merged]
+            names.append(os.path.basename(path))
+            for name in merged:
+                self._deleted_videos.pop(name, None)
+            self._write_manifest(names)
+            self._load()
+            # Open mappings (here or in other processes) stay valid after the files are unlinked
+            for name in merged:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def search(self, query: str, k: int = 10) -> List[CorpusHit]:
+        """
+        Find the passages across all committed videos that best match a query.
+
+        Args:
+            query (str): Search text or question
+            k (int): Maximum number of hits
+
+        Returns:
+            List[CorpusHit]: Hits, best first
+        """
+        started = time.perf_counter()
+        with span("corpus.search") as attrs:
+            self._refresh()
+            with self._lock:
+                segments = list(self._segments)
+                deleted = dict(self._deleted)
+            terms = sorted({term.encode("utf-8") for term in tokenize(query)})
+            passages = sum(segment.passages for segment in segments)
+            if not terms or not passages:
+                return []
+            average_length = sum(segment.total_length for segment in segments) / passages
+
+            # Document frequencies are summed over segments (deleted passages included until merged)
+            lookups = [[segment.postings(term) for term in terms] for segment in segments]
+            frequencies = [sum(len(lookup[i][1]) for lookup in lookups) for i in range(len(terms))]
+            idf = [math.log(1 + (passages - df + 0.5) / (df + 0.5)) for df in frequencies]
+
+            candidates = []
+            for tag, segment in enumerate(segments):
+                scores = self._score(segment, lookups[tag], idf, average_length)
+                dropped = deleted.get(segment.name)
+                if dropped:
+                    videos = segment.passage_video
+                    scores = {passage: score for passage, score in scores.items() if videos[passage] not in dropped}
+                candidates.extend((score, tag, passage) for passage, score in nlargest(k, scores.items(),
+                                                                                     key=lambda item: item[1]))
+
+            hits = []
+            for score, tag, passage in nlargest(k, candidates):
+                segment = segments[tag]
+                video_id, title = segment.videos[segment.passage_video[passage]]
+                start, end = segment.passage_start[passage], segment.passage_end[passage]
+                hits.append(CorpusHit(video_id, title, start if start >= 0 else None, end if end >= 0 else None,
+                                      segment.text(passage).decode("utf-8"), score))
+            attrs["hits"] = len(hits)
+            self.last_query_seconds = time.perf_counter() - started
+            return hits
+
+    @staticmethod
+    def _score(segment: _Segment, postings: List[Tuple[int, memoryview, memoryview]], idf: List[float],
+               average_length: float) -> Dict[int, float]:
+        # BM25 over one segment, rarest terms first
+        lengths = segment.passage_length
+        scores: Dict[int, float] = {}
+        order = [i for i in sorted(range(len(postings)), key=lambda i: len(postings[i][1])) if len(postings[i][1])]
+        if all(len(postings[i][1]) > MAX_SCANNED_POSTINGS for i in order):
+            # Only common terms: the passages where any of them weighs most are the candidates
+            for i in order:
+                scores.update(dict.fromkeys(segment.champions(postings[i][0]), 0.0))
+        for position in order:
+            _, ids, tfs = postings[position]
+            weight = idf[position] * (BM25_K1 + 1)
+            if len(ids) > MAX_SCANNED_POSTINGS:
+                # Look up just the candidate passages in the term's postings
+                for passage in list(scores):
+                    found = bisect_left(ids, passage)
+                    if found < len(ids) and ids[found] == passage:
+                        tf = tfs[found]
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[passage] / average_length)
+                        scores[passage] += weight * tf / (tf + norm)
+                continue
+            for passage, tf in zip(ids, tfs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[passage] / average_length)
+                scores[passage] = scores.get(passage, 0.0) + weight * tf / (tf + norm)
+        return scores
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get index size and timing figures.
+
+        Returns:
+            Dict[str, float]: Committed 'videos' and 'passages', 'segments', 'disk_mb',
+                'pending' videos and 'last_query_ms'
+        """
+        with self._lock:
+            self._refresh()
+            return {
+                "videos": len(self._locations),
+                "passages": sum(segment.passages for segment in self._segments),
+                "segments": len(self._segments),
+                "disk_mb": round(sum(segment.nbytes for segment in self._segments) / (1024 * 1024), 2),
+                "pending": len(self._pending) + len(self._removed),
+                "last_query_ms": round(self.last_query_seconds * 1000, 2),
+            }
+
+
+def ask(index: CorpusIndex, question: str, k: int = CORPUS_TOP_K) -> Tuple[str, List[CorpusHit]]:
+    """
+    Answer a question from the passages across the corpus that match it best.
+
+    Args:
+        index (CorpusIndex): Corpus to search
+        question (str): Question about the videos
+        k (int): Passages to send to the LLM
+
+    Returns:
+        Tuple[str, List[CorpusHit]]: Answer (or an error message) and the hits it was based on
+    """
+    from . import interactions
+
+    hits = index.search(question, k)
+    if not hits:
+        return "No passages in the library match the question.", []
+    excerpts = f"{CORPUS_CONTEXT_LABEL}:\n\n{format_hits(hits)}"
+    return interactions.analyze_transcript(None, question, excerpts=excerpts), hits
+
+
+_corpus: Optional[CorpusIndex] = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus() -> CorpusIndex:
+    """
+    Get the process-wide corpus index in CORPUS_DIR.
+
+    Returns:
+        CorpusIndex: Shared index
+    """
+    global _corpus
+    if _corpus is None:
+        with _corpus_lock:
+            if _corpus is None:
+                _corpus = CorpusIndex()
+    return _corpus
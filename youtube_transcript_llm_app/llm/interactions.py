@@ -1,13 +1,54 @@
 # Functions for LLM interactions
+import logging
 import os
-from openai import OpenAI
-import streamlit as st
+import re
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.instrumentation import span
+from utils.resilience import get_backend
+from .chunking import chunk_transcript, map_reduce
+from .prompts import Prompt, build_prompt
+from .response_cache import get_response_cache
+from .routing import Route, classify_question, get_router
+from .tokens import count_tokens, message_tokens
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+ANALYZE_SYSTEM_PROMPT = "You are a helpful assistant that analyzes YouTube video transcripts and answers questions about the content."
+MEMORY_SYSTEM_PROMPT = "You maintain a short running summary of a conversation about a YouTube video."
+SUMMARY_REQUEST = "Summarize this YouTube transcript."
+QUESTIONS_REQUEST = "Generate {num_questions} thoughtful questions about the content of this YouTube transcript, as a numbered list."
+
+# Seconds allowed per OpenAI request, and retries the SDK makes on its own. Retries are
+# normally left to utils.resilience, which also rate-limits and circuit-breaks them
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 0))
+
+# A numbered or bulleted line of generated questions
+_QUESTION_LINE = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s+(.+)$")
 
 def get_api_key():
     """
     Get the OpenAI API key from Streamlit secrets (for cloud deployment)
     or fallback to environment variable (for local development).
+
+    Streamlit is only consulted when the app has loaded it. The HTTP API and the batch
+    and corpus tools never do, so they read OPENAI_API_KEY alone.
+
+    Raises:
+        RuntimeError: Outside Streamlit, if OPENAI_API_KEY is not set
     """
+    if "streamlit" not in sys.modules:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OpenAI API key not found. Set the OPENAI_API_KEY environment variable.")
+        return api_key
+
+    import streamlit as st
+
     try:
         if hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
             return st.secrets["OPENAI_API_KEY"]
@@ -20,46 +61,428 @@ def get_api_key():
         st.stop()
     return api_key
 
-# Ensure API key is loaded before creating client
-os.environ["OPENAI_API_KEY"] = get_api_key()
+_client = None
+_client_lock = threading.Lock()
 
-# Create client without passing api_key explicitly (new SDK style)
-client = OpenAI()
+def get_client():
+    """
+    Get the shared OpenAI client, creating it on first use.
 
-def analyze_transcript(transcript, prompt_template="Summarize the following YouTube transcript:"):
-    try:
-        is_conversational = "\n\n" in prompt_template and ("User:" in prompt_template or "Assistant:" in prompt_template)
-        full_prompt = prompt_template if is_conversational else f"{prompt_template}\n\n{transcript}"
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that analyzes YouTube video transcripts and answers questions about the content."},
-                {"role": "user", "content": full_prompt}
-            ],
-            max_tokens=800,
-            temperature=0.7
+    The client is built once per process with explicit timeouts and reused by every
+    request, so its pooled keep-alive HTTP connections are shared across sessions.
+
+    Returns:
+        OpenAI: Shared client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI(
+                    api_key=get_api_key(),
+                    base_url=os.getenv("OPENAI_BASE_URL") or None,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=OPENAI_MAX_RETRIES,
+                )
+    return _client
+
+def _openai_call(method, **params):
+    # One OpenAI request through the shared rate limit, retry and circuit-breaker policy;
+    # each attempt's timeout is capped by what is left of the call's deadline
+    return get_backend("openai").call(lambda remaining: method(timeout=min(OPENAI_TIMEOUT, remaining), **params))
+
+def _openai_stream(method, **params):
+    # Like _openai_call for a streamed request; the backend's concurrency slot stays taken
+    # until the stream is read to the end or closed
+    return get_backend("openai").stream(
+        lambda remaining: method(timeout=min(OPENAI_TIMEOUT, remaining), stream=True, **params))
+
+def _messages(system_prompt: str, prompt: str) -> List[Dict]:
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}]
+
+def _usage(usage) -> Dict[str, int]:
+    # Token counts reported by the API, including prompt tokens served from its prompt cache
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+def _request_params(messages: List[Dict], max_tokens: int, temperature: Optional[float], model: str) -> Dict:
+    params = {"model": model, "messages": messages, "max_tokens": max_tokens}
+    if temperature is not None:
+        params["temperature"] = temperature
+    return params
+
+def _route(task: str, system_prompt: str, request: str, document: Optional[str] = None,
+           turn_context: Optional[str] = None, history: Optional[List[Dict]] = None,
+           max_tokens: Optional[int] = None) -> Tuple[Route, Prompt]:
+    # The size of the whole request decides which models can take it in one piece
+    size = sum(count_tokens(text) for text in (system_prompt, document, turn_context, request) if text) \
+        + sum(count_tokens(message["content"]) for message in history or [])
+    route = get_router().route(task, size, max_tokens)
+    prompt = build_prompt(system_prompt, request, document=document, turn_context=turn_context, history=history,
+                          max_tokens=route.max_tokens, model=route.model)
+    return route, prompt
+
+def _fallback_params(params: Dict, route: Route, model: str, prompt_tokens: int) -> Dict:
+    # A fallback model may have a smaller context window; its budget shrinks to fit
+    if model == route.model:
+        return params
+    return dict(params, model=model, max_tokens=min(params["max_tokens"], route.max_tokens_for(model, prompt_tokens)))
+
+def _complete(messages: List[Dict], max_tokens: int, temperature: Optional[float] = None,
+              route: Optional[Route] = None) -> str:
+    router = get_router()
+    prompt_tokens = message_tokens(messages)
+    if route is None:
+        route = router.route("answer", prompt_tokens, max_tokens)
+    params = _request_params(messages, max_tokens, temperature, route.model)
+    called = []
+
+    def request(model):
+        # The client is created before timing starts, so its first-use setup is not counted as latency
+        create = get_client().chat.completions.create
+        started = time.perf_counter()
+        response = _openai_call(create, **_fallback_params(params, route, model, prompt_tokens))
+        usage = _usage(getattr(response, "usage", None))
+        cost = router.record(route, model, time.perf_counter() - started, **usage)
+        return dict(usage, content=response.choices[0].message.content, model=model, cost_usd=cost)
+
+    def call():
+        called.append(True)
+        # Falls back to the route's other models on errors and timeouts
+        return router.call(route, request)[1]
+
+    with span("llm.complete", model=route.model, task=route.task) as attrs:
+        cache = get_response_cache()
+        if cache is None:
+            value = call()
+        else:
+            # Identical requests (same model, messages and sampling params) are served from the cache
+            value = cache.get_or_call(params, call)
+            attrs["cache_hit"] = not called
+        attrs["model"] = value.get("model", route.model)
+        attrs["prompt_tokens"] = value.get("prompt_tokens", 0)
+        attrs["completion_tokens"] = value.get("completion_tokens", 0)
+        attrs["cached_tokens"] = 0 if attrs.get("cache_hit") else value.get("cached_tokens", 0)
+        attrs["cost_usd"] = 0.0 if attrs.get("cache_hit") else value.get("cost_usd", 0.0)
+    return value["content"]
+
+def _complete_prompt(route: Route, prompt: Prompt, temperature: Optional[float] = None) -> str:
+    return _complete(prompt.messages, prompt.max_tokens, temperature, route)
+
+def _complete_stream(messages: List[Dict], max_tokens: int, temperature: Optional[float] = None,
+                     route: Optional[Route] = None) -> Iterator[str]:
+    router = get_router()
+    prompt_tokens = message_tokens(messages)
+    if route is None:
+        route = router.route("answer", prompt_tokens, max_tokens)
+    params = _request_params(messages, max_tokens, temperature, route.model)
+    started = time.perf_counter()
+
+    def produce():
+        # Only opening the stream is retried (or falls back to another model); a failure
+        # mid-answer is reported to the caller. The last event carries the usage, including
+        # prompt-cache hits
+        create = get_client().chat.completions.create
+
+        def open_stream(model):
+            return _openai_stream(create, stream_options={"include_usage": True},
+                                  **_fallback_params(params, route, model, prompt_tokens))
+
+        opened = time.perf_counter()
+        model, stream = router.call(route, open_stream)
+        parts = []
+        usage = None
+        try:
+            for event in stream:
+                usage = getattr(event, "usage", None) or usage
+                if event.choices and event.choices[0].delta.content:
+                    parts.append(event.choices[0].delta.content)
+                    yield event.choices[0].delta.content
+        finally:
+            # Release the HTTP connection and the concurrency slot even if every reader stops early
+            stream.close()
+
+        content = "".join(parts)
+        if usage is not None:
+            value = _usage(usage)
+        else:
+            # Estimated for servers that do not report usage on streams
+            value = {"prompt_tokens": message_tokens(messages, model),
+                     "completion_tokens": count_tokens(content, model)}
+        value["cost_usd"] = router.record(route, model, time.perf_counter() - opened, value["prompt_tokens"],
+                                          value["completion_tokens"], value.get("cached_tokens", 0))
+        return dict(value, content=content, model=model)
+
+    with span("llm.stream", model=route.model, task=route.task) as attrs:
+        cache = get_response_cache()
+        shared = None
+        if cache is None:
+            chunks = produce()
+        else:
+            # Served from the cache, or shared with an identical request that is already streaming
+            shared = cache.stream(params, produce)
+            attrs["cache_hit"] = shared.source != "leader"
+            chunks = iter(shared)
+        try:
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    value = stop.value if shared is None else shared.value
+                    break
+                if "ttft_ms" not in attrs and (shared is None or shared.source != "cache"):
+                    attrs["ttft_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                yield chunk
+        finally:
+            chunks.close()
+
+        attrs["model"] = value.get("model", route.model)
+        attrs["prompt_tokens"] = value.get("prompt_tokens", 0)
+        attrs["completion_tokens"] = value.get("completion_tokens", 0)
+        if not attrs.get("cache_hit"):
+            attrs["cached_tokens"] = value.get("cached_tokens", 0)
+            attrs["cost_usd"] = value.get("cost_usd", 0.0)
+
+def map_reduce_transcript(transcript, task: str, system_prompt: str = ANALYZE_SYSTEM_PROMPT,
+                          max_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                          history: Optional[List[Dict]] = None, task_type: str = "answer") -> str:
+    """
+    Run a task over a transcript that is too long for a single request.
+
+    The transcript is split on token budgets (at segment boundaries when segments are given),
+    each chunk is summarized with respect to the task concurrently, and the notes are then
+    combined in a final request.
+
+    Args:
+        transcript (Union[str, List[Dict]]): Transcript text or timestamped segments
+        task (str): Instruction to carry out, e.g. a summary request or a user question
+        system_prompt (str): System message for every request
+        max_tokens (int, optional): Completion budget for the final answer; defaults to the task type's
+        temperature (float, optional): Sampling temperature for the final answer
+        history (List[Dict], optional): Earlier conversation messages, sent with the final request
+        task_type (str): Routing task of the final request (e.g. 'summary'); each chunk is
+            routed as a 'map' request
+
+    Returns:
+        str: Final answer
+    """
+    def map_chunk(chunk, index, total):
+        # The chunk goes first, so the calls of different tasks over the same video share a prefix
+        label = f" ({chunk.label()})" if chunk.label() else ""
+        request = (
+            f"The transcript is too long to read at once; the text above is part {index + 1} of {total}{label}. "
+            f"Write concise notes on everything in this part that is relevant to the following request, "
+            f"keeping any timestamps.\n\n{task}"
         )
-        return response.choices[0].message.content
+        route, prompt = _route("map", system_prompt, request, document=chunk.text)
+        return _complete_prompt(route, prompt, temperature=0.3)
+
+    def reduce_notes(notes):
+        combined = "\n\n".join(f"Part {i + 1}:\n{note}" for i, note in enumerate(notes))
+        notes_context = f"The transcript was analyzed in {len(notes)} parts. Notes from each part, in order:\n\n{combined}"
+        route, prompt = _route(task_type, system_prompt,
+                               f"Using these notes, respond to the following request.\n\n{task}",
+                               turn_context=notes_context, history=history, max_tokens=max_tokens)
+        if not prompt.fits:
+            # Notes are still too long: reduce them hierarchically
+            return map_reduce_transcript(combined, task, system_prompt, max_tokens, temperature, history, task_type)
+        return _complete_prompt(route, prompt, temperature)
+
+    with span("llm.map_reduce", task=task_type) as attrs:
+        chunks = chunk_transcript(transcript)
+        attrs["chunks"] = len(chunks)
+        return map_reduce(chunks, map_chunk, reduce_notes)
+
+def _analysis_prompt(transcript, request: str, history: Optional[List[Dict]],
+                     excerpts: Optional[str]) -> Tuple[Route, Prompt]:
+    # Whole-video summaries, one-fact lookups and other questions are routed differently.
+    # The transcript (unless excerpts replace it) and earlier turns form the stable prefix
+    task = "summary" if request == SUMMARY_REQUEST else classify_question(request)
+    return _route(task, ANALYZE_SYSTEM_PROMPT, request, document=None if excerpts is not None else transcript,
+                  turn_context=excerpts, history=history)
 
+def analyze_transcript(transcript, prompt_template=SUMMARY_REQUEST,
+                       segments: Optional[List[Dict]] = None, history: Optional[List[Dict]] = None,
+                       excerpts: Optional[str] = None):
+    """
+    Analyze a transcript or answer a question about it.
+
+    Args:
+        transcript (str): Transcript text to analyze (may be None when excerpts are given)
+        prompt_template (str): Instruction, or the user's question in conversation mode
+        segments (List[Dict], optional): Timestamped segments used when map-reduce is needed
+        history (List[Dict], optional): Earlier conversation as chat messages; enables conversation mode
+        excerpts (str, optional): Context chosen for this question (e.g. retrieved excerpts,
+            possibly from several videos), sent with the question instead of the whole transcript
+
+    Returns:
+        str: Answer text, or an error message
+    """
+    try:
+        return _analyze(transcript, prompt_template, segments, history, excerpts)
     except Exception as e:
-        print(f"Detailed error: {str(e)}")
+        logger.exception("Transcript analysis failed")
         return f"Error analyzing transcript: {str(e)}"
 
-def generate_questions(transcript, num_questions=5):
+def _analyze(transcript, prompt_template: str, segments=None, history: Optional[List[Dict]] = None,
+             excerpts: Optional[str] = None) -> str:
+    route, prompt = _analysis_prompt(transcript, prompt_template, history, excerpts)
+
+    if not prompt.fits:
+        # Too long for one request: split the transcript and map-reduce over it
+        return map_reduce_transcript(segments or transcript or excerpts, prompt_template, ANALYZE_SYSTEM_PROMPT,
+                                     max_tokens=route.max_tokens, temperature=0.7, history=history,
+                                     task_type=route.task)
+
+    return _complete_prompt(route, prompt, temperature=0.7)
+
+def summarize_transcript(transcript, segments: Optional[List[Dict]] = None) -> str:
+    """
+    Summarize a whole transcript, raising on failure instead of returning an error message.
+
+    Args:
+        transcript (str): Transcript text
+        segments (List[Dict], optional): Timestamped segments used when map-reduce is needed
+
+    Returns:
+        str: Summary
+    """
+    return _analyze(transcript, SUMMARY_REQUEST, segments)
+
+def analyze_transcript_stream(transcript, prompt_template=SUMMARY_REQUEST,
+                              segments: Optional[List[Dict]] = None,
+                              metrics: Optional[Dict[str, float]] = None,
+                              history: Optional[List[Dict]] = None,
+                              excerpts: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming variant of analyze_transcript that yields the answer as it is generated.
+
+    Unlike analyze_transcript, errors are raised rather than returned as text, so the
+    caller can tell a failed answer from a real one. Closing the generator early
+    (e.g. when the user navigates away) closes the underlying HTTP stream.
+
+    Args:
+        transcript (str): Transcript text to analyze
+        prompt_template (str): Instruction, or the user's question in conversation mode
+        segments (List[Dict], optional): Timestamped segments used when map-reduce is needed
+        metrics (Dict[str, float], optional): Filled with 'ttft_seconds', 'total_seconds' and 'chunks'
+        history (List[Dict], optional): Earlier conversation as chat messages; enables conversation mode
+        excerpts (str, optional): Context chosen for this question (e.g. retrieved excerpts or a
+            summary), sent with the question instead of the whole transcript
+
+    Yields:
+        str: Answer text deltas
+    """
+    started = time.perf_counter()
+    if metrics is None:
+        metrics = {}
+    metrics["chunks"] = 0
+
+    route, prompt = _analysis_prompt(transcript, prompt_template, history, excerpts)
+
+    if not prompt.fits:
+        # The map phase must finish before anything can be shown, so the combined answer arrives in one piece
+        deltas = iter([map_reduce_transcript(segments or transcript or excerpts, prompt_template, ANALYZE_SYSTEM_PROMPT,
+                                             max_tokens=route.max_tokens, temperature=0.7, history=history,
+                                             task_type=route.task)])
+    else:
+        deltas = _complete_stream(prompt.messages, max_tokens=prompt.max_tokens, temperature=0.7, route=route)
+
     try:
-        prompt = f"Based on the following YouTube transcript, generate {num_questions} thoughtful questions about the content:\n\n{transcript}"
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that generates insightful questions based on video content."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500
-        )
-        return response.choices[0].message.content
+        for delta in deltas:
+            if metrics["chunks"] == 0:
+                metrics["ttft_seconds"] = time.perf_counter() - started
+            metrics["chunks"] += 1
+            yield delta
+    finally:
+        if hasattr(deltas, "close"):
+            deltas.close()
+        metrics["total_seconds"] = time.perf_counter() - started
+
+def summarize_conversation(previous_summary: str, messages: List[Dict]) -> str:
+    """
+    Fold older conversation turns into a running summary.
+
+    Only the turns being folded are sent along with the previous summary, so the
+    cost of each update does not grow with the length of the conversation.
+
+    Args:
+        previous_summary (str): Summary so far (may be empty)
+        messages (List[Dict]): Turns to fold in, oldest first
 
+    Returns:
+        str: Updated summary
+    """
+    turns = "\n\n".join(
+        f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}" for message in messages
+    )
+    route = get_router().route("memory", count_tokens(previous_summary) + count_tokens(turns))
+    prompt = (
+        f"Summary of the conversation so far:\n{previous_summary or '(none)'}\n\n"
+        f"New turns:\n{turns}\n\n"
+        f"Update the summary to include the new turns. Keep facts, questions asked and answers given; "
+        f"be concise (under {route.max_tokens // 2} words)."
+    )
+    return _complete(_messages(MEMORY_SYSTEM_PROMPT, prompt), max_tokens=route.max_tokens, temperature=0.2,
+                     route=route)
+
+def generate_questions(transcript, num_questions=5, segments: Optional[List[Dict]] = None):
+    try:
+        return _generate_questions(transcript, num_questions, segments)
     except Exception as e:
-        print(f"Detailed error: {str(e)}")
+        logger.exception("Question generation failed")
         return f"Error generating questions: {str(e)}"
+
+def _generate_questions(transcript, num_questions: int, segments=None) -> str:
+    # Same system prompt and transcript prefix as the summary and chat requests for this video
+    task = QUESTIONS_REQUEST.format(num_questions=num_questions)
+    route, prompt = _route("questions", ANALYZE_SYSTEM_PROMPT, task, document=transcript)
+    if not prompt.fits:
+        return map_reduce_transcript(segments or transcript, task, ANALYZE_SYSTEM_PROMPT, max_tokens=route.max_tokens,
+                                     task_type="questions")
+
+    return _complete_prompt(route, prompt)
+
+def suggest_questions(transcript, num_questions: int = 5, segments: Optional[List[Dict]] = None) -> List[str]:
+    """
+    Generate questions a viewer might ask about a transcript, raising on failure.
+
+    Args:
+        transcript (str): Transcript text
+        num_questions (int): Number of questions to ask for
+        segments (List[Dict], optional): Timestamped segments used when map-reduce is needed
+
+    Returns:
+        List[str]: Questions, with list numbering and bullets removed
+    """
+    text = _generate_questions(transcript, num_questions, segments)
+    questions = []
+    for line in text.splitlines():
+        match = _QUESTION_LINE.match(line)
+        if match and match.group(1).strip():
+            questions.append(match.group(1).strip().strip("*").strip())
+    return questions[:num_questions]
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed a batch of texts for the optional dense retrieval backend.
+
+    Args:
+        texts (List[str]): Texts to embed
+
+    Returns:
+        List[List[float]]: One vector per input text
+    """
+    vectors = []
+    # Keep each request well under the API's per-call input limit
+    for i in range(0, len(texts), 512):
+        with span("llm.embed", model=EMBEDDING_MODEL, inputs=len(texts[i:i + 512])):
+            response = _openai_call(get_client().embeddings.create, model=EMBEDDING_MODEL, input=texts[i:i + 512])
+        vectors.extend(item.embedding for item in response.data)
+    return vectors
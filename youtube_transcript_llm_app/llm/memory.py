@@ -0,0 +1,117 @@
+# Bounded conversation memory with a rolling summary of older turns
+import logging
+from typing import Callable, Dict, List, Optional
+
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Token budget for history sent with each request, and how many recent messages stay verbatim
+DEFAULT_HISTORY_TOKENS = 1500
+DEFAULT_KEEP_MESSAGES = 6
+
+
+class ConversationMemory:
+    """
+    Chat history that stays within a fixed token budget.
+
+    The most recent messages are kept verbatim. Once there are more than keep_messages
+    of them, or they exceed the token budget, the oldest are folded into a running
+    summary by summarize_fn(previous_summary, folded_messages). Only the newly folded
+    messages are summarized each time, so the cost of an update stays constant.
+    """
+
+    def __init__(
+        self,
+        summarize_fn: Optional[Callable[[str, List[Dict]], str]] = None,
+        max_tokens: int = DEFAULT_HISTORY_TOKENS,
+        keep_messages: int = DEFAULT_KEEP_MESSAGES,
+    ):
+        self.summarize_fn = summarize_fn
+        self.max_tokens = max_tokens
+        self.keep_messages = keep_messages
+        self.summary = ""
+        self.recent: List[Dict] = []
+
+    def add(self, role: str, content: str) -> None:
+        """
+        Append a message and fold older messages into the summary if over budget.
+
+        Args:
+            role (str): 'user' or 'assistant'
+            content (str): Message text
+        """
+        self.recent.append({"role": role, "content": content})
+        self.compact()
+
+    def _recent_tokens(self) -> int:
+        return sum(count_tokens(message["content"]) + 4 for message in self.recent)
+
+    def compact(self) -> None:
+        """Fold the oldest verbatim messages into the summary until the budget holds."""
+        # Leave half the budget for the verbatim tail; the summary gets the rest
+        recent_budget = self.max_tokens // 2
+        folded = []
+        while len(self.recent) > 2 and (
+            len(self.recent) > self.keep_messages or self._recent_tokens() > recent_budget
+        ):
+            # Fold whole user/assistant exchanges so the tail never starts mid-exchange
+            folded.extend(self.recent[:2])
+            self.recent = self.recent[2:]
+        if not folded:
+            return
+
+        if self.summarize_fn is not None:
+            try:
+                self.summary = self.summarize_fn(self.summary, folded)
+            except Exception:
+                logger.exception("Summary update failed; using extractive summary")
+                self.summary = self._extractive_summary(folded)
+        else:
+            self.summary = self._extractive_summary(folded)
+        self._trim_summary()
+
+    def _extractive_summary(self, folded: List[Dict]) -> str:
+        # Offline fallback: keep the first sentence of each folded message
+        lines = [self.summary] if self.summary else []
+        for message in folded:
+            first = message["content"].strip().split(". ")[0][:200]
+            lines.append(f"{'User' if message['role'] == 'user' else 'Assistant'}: {first}")
+        return "\n".join(lines)
+
+    def _trim_summary(self) -> None:
+        # Drop the oldest summary lines if the summary alone outgrows its share of the budget
+        summary_budget = self.max_tokens // 2
+        while self.summary and count_tokens(self.summary) > summary_budget:
+            lines = self.summary.split("\n")
+            if len(lines) == 1:
+                self.summary = self.summary[-summary_budget * 4:]
+                break
+            self.summary = "\n".join(lines[1:])
+
+    def messages(self) -> List[Dict]:
+        """
+        Get the history to send with the next request.
+
+        Returns:
+            List[Dict]: A summary system message (if any) followed by the recent messages
+        """
+        history = []
+        if self.summary:
+            history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        history.extend(self.recent)
+        return history
+
+    def token_count(self) -> int:
+        """
+        Count the tokens the history adds to a request.
+
+        Returns:
+            int: Approximate token count of messages()
+        """
+        return sum(count_tokens(message["content"]) + 4 for message in self.messages())
+
+    def clear(self) -> None:
+        """Forget the whole conversation."""
+        self.summary = ""
+        self.recent = []
@@ -0,0 +1,123 @@
+# Prompt layout and token budgeting for chat completion requests
+from typing import Dict, List, Optional
+
+from .tokens import MESSAGE_OVERHEAD_TOKENS, REPLY_PRIMING_TOKENS, context_window, count_tokens, exact_counts
+
+# How the transcript is presented. Every request about a video uses the same wording,
+# so they all share one prompt prefix
+DOCUMENT_TEMPLATE = "Transcript of the YouTube video:\n\n{transcript}"
+
+# Tokens kept free on top of the counted prompt, for message framing differences
+PROMPT_MARGIN_TOKENS = 100
+# Share of the context window kept free instead when tiktoken is missing: the length-based
+# estimate undercounts non-English and code-heavy text
+ESTIMATED_MARGIN_FRACTION = 0.25
+# Smallest completion budget worth sending a request for
+MIN_COMPLETION_TOKENS = 256
+
+
+def prompt_margin(model: str) -> int:
+    """
+    Get the tokens to keep free in a model's context window on top of the counted prompt.
+
+    Args:
+        model (str): Model name
+
+    Returns:
+        int: PROMPT_MARGIN_TOKENS with a tokenizer, otherwise ESTIMATED_MARGIN_FRACTION of the window
+    """
+    if exact_counts(model):
+        return PROMPT_MARGIN_TOKENS
+    return max(PROMPT_MARGIN_TOKENS, int(context_window(model) * ESTIMATED_MARGIN_FRACTION))
+
+
+class Prompt:
+    """
+    Chat messages sized to fit a model's context window.
+
+    Attributes:
+        messages (List[Dict]): Messages to send
+        max_tokens (int): Completion budget that fits next to the messages
+        prompt_tokens (int): Counted prompt tokens
+        prefix_tokens (int): Prompt tokens before the final message, which stay the same
+            from one turn to the next and can be served from the provider's prompt cache
+        history_dropped (int): Oldest history messages left out to make room
+        fits (bool): False if even without history the completion budget would be
+            below the minimum; the caller should fall back to map-reduce
+    """
+
+    __slots__ = ("messages", "max_tokens", "prompt_tokens", "prefix_tokens", "history_dropped", "fits")
+
+    def __init__(self, messages: List[Dict], max_tokens: int, prompt_tokens: int, prefix_tokens: int,
+                 history_dropped: int, fits: bool):
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.prompt_tokens = prompt_tokens
+        self.prefix_tokens = prefix_tokens
+        self.history_dropped = history_dropped
+        self.fits = fits
+
+
+def build_prompt(system_prompt: str, request: str, document: Optional[str] = None,
+                 turn_context: Optional[str] = None, history: Optional[List[Dict]] = None,
+                 max_tokens: int = 800, min_tokens: int = MIN_COMPLETION_TOKENS,
+                 model: str = "gpt-3.5-turbo") -> Prompt:
+    """
+    Lay out a request with its static content first and per-turn content last.
+
+    Messages are ordered system prompt, transcript, earlier turns, then one user
+    message holding this turn's context (e.g. retrieved excerpts) and the request.
+    Everything before that last message is identical across requests about the same
+    video and grows append-only within a conversation, so provider-side prompt
+    caching can reuse it.
+
+    The completion budget is max_tokens, or whatever is left of the context window if
+    that is less. While it would be below min_tokens, the oldest history messages are
+    dropped (a reply is never kept without its question). The same inputs always give
+    the same prompt.
+
+    Args:
+        system_prompt (str): System instructions
+        request (str): Instruction or question for this turn
+        document (str, optional): Transcript text, placed in the stable prefix
+        turn_context (str, optional): Context that changes every turn, sent with the request
+        history (List[Dict], optional): Earlier conversation messages, oldest first
+        max_tokens (int): Desired completion budget
+        min_tokens (int): Smallest acceptable completion budget (capped at max_tokens)
+        model (str): Model whose tokenizer and context window are used
+
+    Returns:
+        Prompt: Messages with the completion budget that fits
+    """
+    prefix = [{"role": "system", "content": system_prompt}]
+    if document is not None:
+        prefix.append({"role": "system", "content": DOCUMENT_TEMPLATE.format(transcript=document)})
+    final = {"role": "user", "content": f"{turn_context}\n\n{request}" if turn_context else request}
+    history = list(history or [])
+
+    def tokens(message: Dict) -> int:
+        return count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS
+
+    fixed = sum(tokens(message) for message in prefix) + tokens(final) + REPLY_PRIMING_TOKENS
+    history_tokens = [tokens(message) for message in history]
+    available = context_window(model) - prompt_margin(model) - fixed - sum(history_tokens)
+    min_tokens = min(min_tokens, max_tokens)
+
+    dropped = 0
+    while available < min_tokens and dropped < len(history):
+        available += history_tokens[dropped]
+        dropped += 1
+        # Drop the reply along with its question
+        while dropped < len(history) and history[dropped]["role"] == "assistant":
+            available += history_tokens[dropped]
+            dropped += 1
+
+    prompt_tokens = fixed + sum(history_tokens[dropped:])
+    return Prompt(
+        messages=prefix + history[dropped:] + [final],
+        max_tokens=max(min(max_tokens, available), 0),
+        prompt_tokens=prompt_tokens,
+        prefix_tokens=prompt_tokens - tokens(final) - REPLY_PRIMING_TOKENS,
+        history_dropped=dropped,
+        fits=available >= min_tokens,
+    )
@@ -0,0 +1,459 @@
+# Content-addressed cache for chat completion responses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+DEFAULT_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2048))
+DEFAULT_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "youtube_transcript_llm", "responses.sqlite3")
+)
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """
+    Hash a chat completion request into a cache key.
+
+    Every parameter that affects the output (model, messages, max_tokens, temperature, ...)
+    is part of the key; parameters are serialized with sorted keys so order does not matter.
+
+    Args:
+        params (Dict[str, Any]): Keyword arguments for chat.completions.create
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU storage for cached responses."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskBackend:
+    """SQLite storage for cached responses that survives restarts."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + ttl, now)
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _StreamFlight:
+    """
+    A streamed completion in progress, shared by every reader of the same request.
+
+    Chunks are buffered as they arrive. Whichever reader needs the next chunk first
+    pulls it from the upstream generator, so the answer keeps streaming as long as
+    any reader remains; the upstream is closed once every reader has stopped.
+    """
+
+    __slots__ = ("key", "upstream", "ttl", "cond", "chunks", "pumping", "readers", "done", "value", "error")
+
+    def __init__(self, key: str, upstream: Iterator[str], ttl: float):
+        self.key = key
+        self.upstream = upstream
+        self.ttl = ttl
+        self.cond = threading.Condition()
+        self.chunks: List[str] = []
+        self.pumping = False
+        self.readers = 1
+        self.done = False
+        self.value = None
+        self.error = None
+
+
+class SharedStream:
+    """
+    Chunks of a streamed completion, from the cache or shared with identical concurrent requests.
+
+    Iterate it exactly once. After iteration 'value' holds the complete response dict.
+
+    Attributes:
+        source (str): 'cache' for a stored response, 'leader' for the reader that started
+            the upstream request, 'follower' for one that joined it
+        value (Dict, optional): Complete response with 'content' and token usage, once finished
+    """
+
+    def __init__(self, cache: "ResponseCache", source: str, flight: Optional[_StreamFlight] = None,
+                 value: Optional[Dict] = None):
+        self._cache = cache
+        self._flight = flight
+        self.source = source
+        self.value = value
+
+    def __iter__(self) -> Iterator[str]:
+        if self._flight is None:
+            yield self.value["content"]
+            return
+        flight = self._flight
+        position = 0
+        try:
+            while True:
+                with flight.cond:
+                    while position >= len(flight.chunks) and not flight.done and flight.pumping:
+                        flight.cond.wait()
+                    if position < len(flight.chunks):
+                        chunk = flight.chunks[position]
+                    elif flight.done:
+                        break
+                    else:
+                        chunk = None
+                        flight.pumping = True
+                if chunk is None:
+                    chunk = self._cache._pump(flight)
+                    if chunk is None:
+                        break
+                position += 1
+                yield chunk
+        finally:
+            self._cache._leave(flight)
+        if flight.error is not None:
+            raise flight.error
+        self.value = flight.value
+        if self.source == "follower":
+            self._cache._record_saved(self.value)
+
+
+class ResponseCache:
+    """
+    Caches completions by request hash and coalesces concurrent identical requests,
+    streamed ones included.
+
+    Cached values are dicts with 'content' plus the 'prompt_tokens' and
+    'completion_tokens' the original call consumed, which is what a hit saves.
+    """
+
+    def __init__(self, backend=None, ttl: float = DEFAULT_TTL_SECONDS):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "prompt_tokens_saved": 0, "completion_tokens_saved": 0}
+
+    def _record_hit(self, value: Dict) -> None:
+        with self._lock:
+            self._stats["hits"] += 1
+        self._record_saved(value)
+
+    def _record_saved(self, value: Dict) -> None:
+        with self._lock:
+            self._stats["prompt_tokens_saved"] += value.get("prompt_tokens", 0)
+            self._stats["completion_tokens_saved"] += value.get("completion_tokens", 0)
+
+    def get(self, params: Dict[str, Any]) -> Optional[Dict]:
+        """
+        Look up a cached response without calling upstream.
+
+        Args:
+            params (Dict[str, Any]): Request parameters
+
+        Returns:
+            Optional[Dict]: Cached value, or None
+        """
+        value = self.backend.get(request_key(params))
+        if value is not None:
+            self._record_hit(value)
+        else:
+            with self._lock:
+                self._stats["misses"] += 1
+        return value
+
+    def set(self, params: Dict[str, Any], value: Dict, ttl: Optional[float] = None) -> None:
+        """
+        Store a response.
+
+        Args:
+            params (Dict[str, Any]): Request parameters
+            value (Dict): Value with 'content' and token usage
+            ttl (float, optional): Seconds until expiry; defaults to the cache TTL
+        """
+        self.backend.set(request_key(params), value, self.ttl if ttl is None else ttl)
+
+    def get_or_call(
+        self,
+        params: Dict[str, Any],
+        call: Callable[[], Dict],
+        ttl: Optional[float] = None,
+    ) -> Dict:
+        """
+        Return the cached response for params, calling upstream at most once for concurrent duplicates.
+
+        Args:
+            params (Dict[str, Any]): Request parameters (the cache key is derived from them)
+            call (Callable): Performs the request and returns a value dict
+            ttl (float, optional): Seconds until expiry; defaults to the cache TTL
+
+        Returns:
+            Dict: Cached or fresh value
+        """
+        key = request_key(params)
+        value = self.backend.get(key)
+        if value is not None:
+            self._record_hit(value)
+            return value
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._in_flight[key] = flight
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            self._record_saved(flight.value)
+            return flight.value
+
+        try:
+            flight.value = call()
+            self.backend.set(key, flight.value, self.ttl if ttl is None else ttl)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+        return flight.value
+
+    def stream(
+        self,
+        params: Dict[str, Any],
+        produce: Callable[[], Iterator[str]],
+        ttl: Optional[float] = None,
+    ) -> SharedStream:
+        """
+        Stream the response for params, sharing one upstream stream among concurrent duplicates.
+
+        A cached response is returned as a single chunk. Otherwise the first caller starts
+        `produce` and identical requests made before it finishes read the same chunks,
+        including those already streamed. Only complete responses are stored.
+
+        Args:
+            params (Dict[str, Any]): Request parameters (the cache key is derived from them)
+            produce (Callable): Returns a generator that yields text chunks and returns
+                the value dict ('content' and token usage) when the stream completes
+            ttl (float, optional): Seconds until expiry; defaults to the cache TTL
+
+        Returns:
+            SharedStream: Chunks to iterate, with the final value afterwards
+        """
+        key = request_key(params)
+        value = self.backend.get(key)
+        if value is not None:
+            self._record_hit(value)
+            return SharedStream(self, "cache", value=value)
+
+        with self._lock:
+            flight = self._streams.get(key)
+            if flight is not None and not flight.done:
+                with flight.cond:
+                    flight.readers += 1
+                self._stats["coalesced"] += 1
+                return SharedStream(self, "follower", flight)
+            flight = _StreamFlight(key, produce(), self.ttl if ttl is None else ttl)
+            self._streams[key] = flight
+            self._stats["misses"] += 1
+        return SharedStream(self, "leader", flight)
+
+    def _pump(self, flight: _StreamFlight) -> Optional[str]:
+        # Pull the next chunk from upstream for every reader; None once the stream has ended
+        chunk = None
+        try:
+            chunk = next(flight.upstream)
+        except StopIteration as stop:
+            flight.value = stop.value
+            self.backend.set(flight.key, flight.value, flight.ttl)
+        except BaseException as e:
+            flight.error = e
+        with flight.cond:
+            flight.pumping = False
+            if chunk is None:
+                flight.done = True
+            else:
+                flight.chunks.append(chunk)
+            flight.cond.notify_all()
+        if chunk is None:
+            with self._lock:
+                if self._streams.get(flight.key) is flight:
+                    del self._streams[flight.key]
+        return chunk
+
+    def _leave(self, flight: _StreamFlight) -> None:
+        # Called when a reader finishes or stops early; the last one out closes an unfinished upstream
+        with self._lock:
+            with flight.cond:
+                flight.readers -= 1
+                abandoned = flight.readers == 0 and not flight.done
+                if abandoned:
+                    flight.done = True
+                    flight.error = RuntimeError("Every reader stopped before the stream completed")
+                    flight.cond.notify_all()
+            if abandoned and self._streams.get(flight.key) is flight:
+                del self._streams[flight.key]
+        if abandoned:
+            flight.upstream.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit rate and tokens saved.
+
+        Returns:
+            Dict[str, Any]: Counters plus 'entries' and 'hit_rate'
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        stats["entries"] = len(self.backend)
+        return stats
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        self.backend.clear()
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache.
+
+    LLM_CACHE_BACKEND selects 'memory' (default), 'disk' or 'off'.
+
+    Returns:
+        Optional[ResponseCache]: Shared cache, or None if caching is off
+    """
+    global _default_cache
+    backend_name = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+    if backend_name == "off":
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                backend = DiskBackend() if backend_name == "disk" else MemoryBackend()
+                _default_cache = ResponseCache(backend)
+    return _default_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """
+    Replace the process-wide response cache.
+
+    Args:
+        cache (ResponseCache, optional): New cache instance
+    """
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
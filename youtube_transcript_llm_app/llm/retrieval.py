@@ -0,0 +1,313 @@
+# Per-video retrieval index over timestamped transcript segments
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from utils.transcript import format_timestamp
+
+from .chunking import chunk_text
+from .tokens import count_tokens
+
+# Window size (tokens) of each retrievable excerpt and the overlap between neighbours
+DEFAULT_WINDOW_TOKENS = 200
+DEFAULT_WINDOW_OVERLAP = 1
+# Transcripts longer than this many tokens are answered from retrieved excerpts
+RETRIEVAL_MIN_TOKENS = 3000
+RETRIEVAL_TOP_K = 6
+# Questions about the whole video still need the full transcript
+WHOLE_VIDEO_PATTERN = re.compile(r"\b(summar\w*|overview|tl;?dr|key points|main (topic|idea|point)s?|whole video)\b", re.IGNORECASE)
+EXCERPTS_LABEL = "Excerpts most relevant to the question, with timestamps"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from has have he her his how i if in is it its "
+    "me my of on or our she so that the their them they this to was we were what when where "
+    "which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms for lexical scoring, dropping stopwords.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Terms in order of appearance
+    """
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if term not in _STOPWORDS]
+
+
+class Window:
+    """
+    A retrievable excerpt made of consecutive transcript segments.
+
+    Attributes:
+        text (str): Excerpt text
+        start (float, optional): Start time in seconds
+        end (float, optional): End time in seconds
+    """
+
+    __slots__ = ("text", "start", "end")
+
+    def __init__(self, text: str, start: Optional[float] = None, end: Optional[float] = None):
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def format(self) -> str:
+        """
+        Render the excerpt with its time range for inclusion in a prompt.
+
+        Returns:
+            str: e.g. '[12:30-13:10] text'
+        """
+        if self.start is None:
+            return self.text
+        return f"[{format_timestamp(self.start)}-{format_timestamp(self.end)}] {self.text}"
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.text) + 2 * sys.getsizeof(0.0)
+
+
+def build_windows(
+    transcript: Union[str, List[Dict]],
+    window_tokens: int = DEFAULT_WINDOW_TOKENS,
+    overlap: int = DEFAULT_WINDOW_OVERLAP,
+) -> List[Window]:
+    """
+    Group a transcript into overlapping excerpts of roughly window_tokens tokens.
+
+    Segment lists keep their timestamps; plain text is split on sentence boundaries.
+
+    Args:
+        transcript (Union[str, List[Dict]]): Transcript text or segments with 'text', 'start', 'duration'
+        window_tokens (int): Approximate token size of each excerpt
+        overlap (int): Number of trailing segments repeated at the start of the next excerpt
+
+    Returns:
+        List[Window]: Excerpts in transcript order
+    """
+    if isinstance(transcript, str):
+        return [Window(chunk.text) for chunk in chunk_text(transcript, window_tokens)]
+
+    windows = []
+    current = []
+    tokens = 0
+    for segment in transcript:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        seg_tokens = count_tokens(text) + 1
+        if current and tokens + seg_tokens > window_tokens:
+            windows.append(_window_from(current))
+            current = current[-overlap:] if overlap else []
+            tokens = sum(count_tokens(s["text"]) + 1 for s in current)
+        current.append(segment)
+        tokens += seg_tokens
+    if current:
+        windows.append(_window_from(current))
+    return windows
+
+
+def _window_from(segments: List[Dict]) -> Window:
+    start = float(segments[0].get("start", 0.0))
+    last = segments[-1]
+    end = float(last.get("start", 0.0)) + float(last.get("duration", 0.0))
+    return Window(" ".join(s["text"].strip() for s in segments), start, end)
+
+
+class BM25Index:
+    """
+    Okapi BM25 lexical index over a list of documents. Works fully offline.
+    """
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[tuple]] = {}
+        self._lengths = []
+        for doc_id, document in enumerate(documents):
+            terms = Counter(tokenize(document))
+            self._lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                self._postings.setdefault(term, []).append((doc_id, freq))
+        count = len(self._lengths)
+        self._avg_length = (sum(self._lengths) / count) if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """
+        Score every document that shares at least one term with the query.
+
+        Args:
+            query (str): Query text
+
+        Returns:
+            Dict[int, float]: BM25 score keyed by document index
+        """
+        scores: Dict[int, float] = {}
+        avg_length = self._avg_length or 1.0
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for doc_id, freq in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+    def nbytes(self) -> int:
+        # Each posting is a (doc_id, freq) tuple of ints; each term also has an idf float
+        posting = sys.getsizeof((0, 0)) + sys.getsizeof(2 ** 20)
+        terms = sum(sys.getsizeof(term) + sys.getsizeof(postings) + len(postings) * posting + sys.getsizeof(0.0)
+                    for term, postings in self._postings.items())
+        return terms + sys.getsizeof(self._postings) + sys.getsizeof(self._idf) + sys.getsizeof(self._lengths)
+
+
+class EmbeddingIndex:
+    """
+    Dense vector index using an external embedding function and cosine similarity.
+    """
+
+    def __init__(self, documents: Sequence[str], embed_fn: Callable[[List[str]], List[List[float]]]):
+        self._embed_fn = embed_fn
+        self._vectors = [self._normalize(v) for v in embed_fn(list(documents))] if documents else []
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """
+        Score every document by cosine similarity to the query.
+
+        Args:
+            query (str): Query text
+
+        Returns:
+            Dict[int, float]: Similarity keyed by document index
+        """
+        if not self._vectors:
+            return {}
+        q = self._normalize(self._embed_fn([query])[0])
+        return {i: sum(a * b for a, b in zip(q, v)) for i, v in enumerate(self._vectors)}
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(vector) + len(vector) * sys.getsizeof(0.0) for vector in self._vectors)
+
+
+class TranscriptIndex:
+    """
+    Retrieval index for one video's transcript.
+
+    Always has a BM25 scorer; when an embedding function is supplied, lexical and
+    dense rankings are combined with reciprocal rank fusion.
+    """
+
+    def __init__(
+        self,
+        transcript: Union[str, List[Dict]],
+        embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        window_tokens: int = DEFAULT_WINDOW_TOKENS,
+    ):
+        started = time.perf_counter()
+        self.windows = build_windows(transcript, window_tokens)
+        texts = [window.text for window in self.windows]
+        self._bm25 = BM25Index(texts)
+        self._dense = EmbeddingIndex(texts, embed_fn) if embed_fn is not None else None
+        self.build_seconds = time.perf_counter() - started
+        self.last_query_seconds = 0.0
+
+    def search(self, query: str, k: int = 6) -> List[Window]:
+        """
+        Find the excerpts most relevant to a query.
+
+        Args:
+            query (str): Question text
+            k (int): Maximum number of excerpts to return
+
+        Returns:
+            List[Window]: Top excerpts, ordered by position in the video
+        """
+        started = time.perf_counter()
+        lexical = self._bm25.scores(query)
+        if self._dense is None:
+            ranked = sorted(lexical, key=lexical.get, reverse=True)
+        else:
+            fused: Dict[int, float] = {}
+            for scores in (lexical, self._dense.scores(query)):
+                for rank, doc_id in enumerate(sorted(scores, key=scores.get, reverse=True)):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (60 + rank)
+            ranked = sorted(fused, key=fused.get, reverse=True)
+        top = sorted(ranked[:k])
+        self.last_query_seconds = time.perf_counter() - started
+        return [self.windows[i] for i in top]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get index size and timing figures.
+
+        Returns:
+            Dict[str, float]: 'windows', 'build_ms' and 'last_query_ms'
+        """
+        return {
+            "windows": len(self.windows),
+            "build_ms": round(self.build_seconds * 1000, 2),
+            "last_query_ms": round(self.last_query_seconds * 1000, 2),
+        }
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the excerpts and scorers, for the retrieval cache's byte bound.
+
+        Returns:
+            int: Size in bytes
+        """
+        size = sum(window.nbytes() for window in self.windows) + self._bm25.nbytes()
+        if self._dense is not None:
+            size += self._dense.nbytes()
+        return size
+
+
+def format_excerpts(windows: List[Window]) -> str:
+    """
+    Join excerpts into a prompt-ready block.
+
+    Args:
+        windows (List[Window]): Excerpts to include
+
+    Returns:
+        str: Excerpts separated by blank lines
+    """
+    return "\n\n".join(window.format() for window in windows)
+
+
+def build_retrieval_index(result) -> TranscriptIndex:
+    """
+    Build the retrieval index for a video, using its timestamped segments when available.
+
+    Set RETRIEVAL_BACKEND=embedding to add OpenAI embeddings on top of BM25.
+
+    Args:
+        result (TranscriptResult): Resolved transcript
+
+    Returns:
+        TranscriptIndex: Index over the transcript
+    """
+    embed_fn = None
+    if os.getenv("RETRIEVAL_BACKEND") == "embedding":
+        # Imported here so BM25-only use never loads the OpenAI client
+        from .interactions import embed_texts
+        embed_fn = embed_texts
+    return TranscriptIndex(result.transcript if result.transcript is not None else result.text, embed_fn=embed_fn)
@@ -0,0 +1,516 @@
+# Latency-aware choice of model and completion budget for each LLM request
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from utils.instrumentation import export_jsonl
+from utils.resilience import CircuitOpenError
+from .prompts import MIN_COMPLETION_TOKENS, prompt_margin
+from .tokens import MODEL_CONTEXT_WINDOWS, context_window as model_context_window
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Models the router may choose from, in order of preference when they are otherwise equal.
+# quality ranks capability (higher is stronger); prices are USD per million tokens; the
+# speed figures are priors used until latencies have been observed. Override with
+# LLM_MODELS (a JSON list like this one, or the path of a JSON file holding it)
+DEFAULT_MODEL_TABLE = [
+    {"name": "gpt-4o-mini", "quality": 2, "input_cost": 0.15, "cached_input_cost": 0.075, "output_cost": 0.60,
+     "overhead_seconds": 0.4, "output_tokens_per_second": 90, "prefill_tokens_per_second": 6000},
+    {"name": "gpt-3.5-turbo", "quality": 1, "input_cost": 0.50, "output_cost": 1.50,
+     "overhead_seconds": 0.4, "output_tokens_per_second": 90, "prefill_tokens_per_second": 6000},
+    {"name": "gpt-4o", "quality": 3, "input_cost": 2.50, "cached_input_cost": 1.25, "output_cost": 10.00,
+     "overhead_seconds": 0.5, "output_tokens_per_second": 60, "prefill_tokens_per_second": 4000},
+]
+
+# Send every request to this one model instead of routing (no fallback)
+PINNED_MODEL = os.getenv("LLM_MODEL") or None
+# The cheapest model whose expected latency is within this factor of the fastest one wins
+LATENCY_SLACK = float(os.getenv("ROUTING_LATENCY_SLACK", 1.25))
+# Seconds a model that just failed is tried only after the others
+MODEL_COOLDOWN_SECONDS = float(os.getenv("ROUTING_COOLDOWN_SECONDS", 30))
+# Every Nth request of a task goes to the eligible model measured least recently, so the
+# latency of models that are not being chosen stays known (0 = never)
+PROBE_EVERY = int(os.getenv("ROUTING_PROBE_EVERY", 20))
+# Optional JSON-lines file receiving every routing decision and its outcome
+ROUTING_LOG_PATH = os.getenv("ROUTING_LOG_PATH")
+
+# Weight of the newest observation in each model's latency correction
+LATENCY_EWMA_ALPHA = 0.2
+# Share of the completion budget a typical answer uses, for latency estimates
+EXPECTED_OUTPUT_SHARE = 0.5
+# Decisions kept for the sidebar and stats()
+RECENT_DECISIONS = 50
+
+# Questions asking for a single fact ("Who ...", "When ...", "How many ...")
+_LOOKUP_QUESTION = re.compile(
+    r"^\s*(who|whom|when|where|which|what (year|time|date|day|is the name)|how (many|much|old|long))\b",
+    re.IGNORECASE
+)
+LOOKUP_MAX_WORDS = 15
+
+
+class TaskProfile:
+    """
+    What a kind of request needs from a model.
+
+    Attributes:
+        min_quality (int): Lowest model quality allowed
+        max_tokens (int): Completion budget
+        tokens_per_1k_prompt (int): Extra completion budget per 1000 prompt tokens, for
+            outputs that grow with the input such as summaries
+        ceiling (int): Upper limit of the grown budget
+    """
+
+    __slots__ = ("min_quality", "max_tokens", "tokens_per_1k_prompt", "ceiling")
+
+    def __init__(self, min_quality: int, max_tokens: int, tokens_per_1k_prompt: int = 0,
+                 ceiling: Optional[int] = None):
+        self.min_quality = min_quality
+        self.max_tokens = max_tokens
+        self.tokens_per_1k_prompt = tokens_per_1k_prompt
+        self.ceiling = ceiling or max_tokens
+
+    def budget(self, prompt_tokens: int) -> int:
+        return min(self.ceiling, self.max_tokens + self.tokens_per_1k_prompt * prompt_tokens // 1000)
+
+
+# Request kinds: one-fact questions, other questions, whole-video summaries, suggested
+# questions, per-chunk map-reduce notes and the rolling conversation summary
+TASKS: Dict[str, TaskProfile] = {
+    "lookup": TaskProfile(min_quality=1, max_tokens=300),
+    "answer": TaskProfile(min_quality=2, max_tokens=800),
+    "summary": TaskProfile(min_quality=2, max_tokens=400, tokens_per_1k_prompt=20, ceiling=1200),
+    "questions": TaskProfile(min_quality=2, max_tokens=500),
+    "map": TaskProfile(min_quality=1, max_tokens=500),
+    "memory": TaskProfile(min_quality=1, max_tokens=300),
+}
+
+
+def classify_question(question: str) -> str:
+    """
+    Tell a short factual lookup from a question that needs a fuller answer.
+
+    Args:
+        question (str): User question
+
+    Returns:
+        str: 'lookup' or 'answer'
+    """
+    if len(question.split()) <= LOOKUP_MAX_WORDS and _LOOKUP_QUESTION.match(question):
+        return "lookup"
+    return "answer"
+
+
+class ModelSpec:
+    """One entry of the model table: capability, context window, prices and speed priors."""
+
+    __slots__ = ("name", "quality", "context_window", "input_cost", "cached_input_cost", "output_cost",
+                 "overhead_seconds", "output_tokens_per_second", "prefill_tokens_per_second")
+
+    def __init__(self, name: str, quality: int = 1, context_window: Optional[int] = None,
+                 input_cost: float = 0.0, cached_input_cost: Optional[float] = None, output_cost: float = 0.0,
+                 overhead_seconds: float = 0.5, output_tokens_per_second: float = 60.0,
+                 prefill_tokens_per_second: float = 5000.0):
+        self.name = name
+        self.quality = quality
+        self.context_window = context_window or model_context_window(name)
+        self.input_cost = input_cost
+        self.cached_input_cost = input_cost if cached_input_cost is None else cached_input_cost
+        self.output_cost = output_cost
+        self.overhead_seconds = overhead_seconds
+        self.output_tokens_per_second = output_tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any]) -> "ModelSpec":
+        return cls(**{key: value for key, value in entry.items() if key in cls.__slots__})
+
+    def prior_seconds(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """Latency the speed priors predict for a request of this size."""
+        return (self.overhead_seconds + prompt_tokens / self.prefill_tokens_per_second
+                + completion_tokens / self.output_tokens_per_second)
+
+    def cost(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        """Price of a request in USD."""
+        return ((prompt_tokens - cached_tokens) * self.input_cost + cached_tokens * self.cached_input_cost
+                + completion_tokens * self.output_cost) / 1_000_000
+
+
+class Route:
+    """
+    A routing decision: the model to try first, the fallbacks and the completion budget.
+
+    Attributes:
+        task (str): Request kind (a key of TASKS)
+        model (str): Chosen model
+        candidates (List[str]): Models to try in order, starting with the chosen one
+        max_tokens (int): Completion budget
+        prompt_tokens (int): Estimated prompt size the decision was based on
+        expected_seconds (float): Predicted latency on the chosen model
+        reason (str): Why the model was chosen
+    """
+
+    __slots__ = ("task", "model", "candidates", "max_tokens", "prompt_tokens", "expected_seconds", "reason")
+
+    def __init__(self, task: str, candidates: List[str], max_tokens: int, prompt_tokens: int,
+                 expected_seconds: float, reason: str):
+        self.task = task
+        self.model = candidates[0]
+        self.candidates = candidates
+        self.max_tokens = max_tokens
+        self.prompt_tokens = prompt_tokens
+        self.expected_seconds = expected_seconds
+        self.reason = reason
+
+    def max_tokens_for(self, model: str, prompt_tokens: Optional[int] = None) -> int:
+        """
+        Completion budget on a given candidate, shrunk to what its context window leaves.
+
+        Args:
+            model (str): Candidate model
+            prompt_tokens (int, optional): Actual prompt size; defaults to the estimate
+
+        Returns:
+            int: Completion budget
+        """
+        used = self.prompt_tokens if prompt_tokens is None else prompt_tokens
+        room = model_context_window(model) - used - prompt_margin(model)
+        return max(1, min(self.max_tokens, room))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task": self.task,
+            "model": self.model,
+            "candidates": list(self.candidates),
+            "max_tokens": self.max_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "expected_ms": round(self.expected_seconds * 1000, 1),
+            "reason": self.reason,
+        }
+
+
+class Router:
+    """
+    Picks a model and completion budget per request and learns from the outcomes.
+
+    A model can take a request if its quality is at least the task's minimum and the
+    prompt plus a minimal completion fits its context window. Among those, the latency
+    of each is predicted from the table's speed priors, scaled by a per-model correction
+    learned from observed latencies (models not observed yet get the average correction),
+    and the cheapest model within LATENCY_SLACK of the fastest is chosen. Every
+    PROBE_EVERY-th request of a task goes to the eligible model measured least recently
+    instead. The others follow as fallbacks, fastest first; models that failed in the
+    last MODEL_COOLDOWN_SECONDS go last. If no model is large enough, the one with the
+    largest context window is chosen and the caller map-reduces.
+
+    Every outcome is recorded per task and model (calls, failures, fallbacks, latency,
+    tokens and cost) for stats(), and every decision is kept in a short audit log.
+    """
+
+    def __init__(self, models: List[ModelSpec], tasks: Optional[Dict[str, TaskProfile]] = None,
+                 pinned: Optional[str] = None, latency_slack: float = LATENCY_SLACK,
+                 cooldown: float = MODEL_COOLDOWN_SECONDS, probe_every: int = PROBE_EVERY,
+                 log_path: Optional[str] = ROUTING_LOG_PATH):
+        if not models:
+            raise ValueError("The model table is empty")
+        self.models = {spec.name: spec for spec in models}
+        self.tasks = dict(TASKS if tasks is None else tasks)
+        self.pinned = pinned
+        self.latency_slack = latency_slack
+        self.cooldown = cooldown
+        self.probe_every = probe_every
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._correction: Dict[str, float] = {}
+        self._observed_at: Dict[str, float] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._routed: Dict[str, int] = {}
+        self._routes: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._decisions: deque = deque(maxlen=RECENT_DECISIONS)
+
+    def _spec(self, model: str) -> ModelSpec:
+        spec = self.models.get(model)
+        if spec is None:
+            # Pinned models need not be in the table
+            spec = ModelSpec(model)
+        return spec
+
+    def expected_seconds(self, model: str, prompt_tokens: int, max_tokens: int) -> float:
+        """
+        Predict a request's latency on a model.
+
+        Args:
+            model (str): Model name
+            prompt_tokens (int): Prompt size
+            max_tokens (int): Completion budget
+
+        Returns:
+            float: Seconds
+        """
+        prior = self._spec(model).prior_seconds(prompt_tokens, int(max_tokens * EXPECTED_OUTPUT_SHARE))
+        with self._lock:
+            correction = self._correction.get(model)
+            if correction is None:
+                correction = sum(self._correction.values()) / len(self._correction) if self._correction else 1.0
+        return prior * correction
+
+    def route(self, task: str, prompt_tokens: int, max_tokens: Optional[int] = None) -> Route:
+        """
+        Choose a model and completion budget for a request.
+
+        Args:
+            task (str): Request kind (a key of TASKS)
+            prompt_tokens (int): Estimated prompt size
+            max_tokens (int, optional): Completion budget to use instead of the task's
+
+        Returns:
+            Route: Decision, with fallbacks
+        """
+        profile = self.tasks.get(task) or self.tasks["answer"]
+        budget = max_tokens or profile.budget(prompt_tokens)
+        if self.pinned:
+            return Route(task, [self.pinned], budget, prompt_tokens,
+                         self.expected_seconds(self.pinned, prompt_tokens, budget), "pinned")
+
+        needed = prompt_tokens + min(budget, MIN_COMPLETION_TOKENS)
+        capable = [spec for spec in self.models.values() if spec.quality >= profile.min_quality] \
+            or list(self.models.values())
+        eligible = [spec for spec in capable if spec.context_window >= needed + prompt_margin(spec.name)]
+        if not eligible:
+            # Too long for any model in one request: the fewest map-reduce chunks, cheapest first
+            largest = sorted(capable, key=lambda spec: (-spec.context_window, spec.cost(prompt_tokens, budget)))
+            return Route(task, [spec.name for spec in largest], budget, prompt_tokens,
+                         self.expected_seconds(largest[0].name, prompt_tokens, budget), "largest context window")
+
+        order = list(self.models)
+        expected = {spec.name: self.expected_seconds(spec.name, prompt_tokens, budget) for spec in eligible}
+        now = time.monotonic()
+        with self._lock:
+            cooling = {name for name, failed_at in self._failed_at.items() if now - failed_at < self.cooldown}
+            self._routed[task] = routed = self._routed.get(task, 0) + 1
+            observed_at = dict(self._observed_at)
+        ready = [spec for spec in eligible if spec.name not in cooling] or eligible
+        fastest = min(expected[spec.name] for spec in ready)
+        # Cheapest for this request among those close enough to the fastest
+        close = [spec for spec in ready if expected[spec.name] <= fastest * self.latency_slack]
+        chosen = min(close, key=lambda spec: (spec.cost(prompt_tokens, budget), order.index(spec.name)))
+
+        probe = None
+        if self.probe_every and routed % self.probe_every == 0 and len(ready) > 1:
+            stalest = min(ready, key=lambda spec: (observed_at.get(spec.name, 0.0), order.index(spec.name)))
+            if stalest is not chosen:
+                chosen = probe = stalest
+
+        fallbacks = sorted((spec for spec in eligible if spec is not chosen),
+                           key=lambda spec: (spec.name in cooling, expected[spec.name]))
+        if probe is not None:
+            reason = "probe"
+        elif chosen.name in cooling:
+            reason = "all eligible models failed recently"
+        elif len(close) > 1:
+            reason = "cheapest within latency slack"
+        elif len(ready) > 1:
+            reason = "fastest"
+        else:
+            reason = "only eligible model"
+        return Route(task, [chosen.name] + [spec.name for spec in fallbacks], budget, prompt_tokens,
+                     expected[chosen.name], reason)
+
+    def call(self, route: Route, fn: Callable[[str], T]) -> Tuple[str, T]:
+        """
+        Run a request on the route's models in order until one succeeds.
+
+        Failures move on to the next candidate, except an open circuit, which applies
+        to every model of the backend.
+
+        Args:
+            route (Route): Routing decision
+            fn (Callable): Called as fn(model); returns the response
+
+        Returns:
+            Tuple[str, T]: Model that answered, and its response
+
+        Raises:
+            Exception: The last candidate's error if every candidate failed
+        """
+        for index, model in enumerate(route.candidates):
+            started = time.perf_counter()
+            try:
+                return model, fn(model)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                self.record_failure(route, model, time.perf_counter() - started, e)
+                if index + 1 == len(route.candidates):
+                    raise
+                logger.warning("%s request on %s failed (%s); falling back to %s",
+                               route.task, model, e, route.candidates[index + 1])
+
+    def _route_stats(self, task: str, model: str) -> Dict[str, float]:
+        return self._routes.setdefault((task, model), {
+            "calls": 0, "failures": 0, "fallbacks": 0, "seconds": 0.0, "prompt_tokens": 0,
+            "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+        })
+
+    def record(self, route: Route, model: str, seconds: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, cached_tokens: int = 0) -> float:
+        """
+        Record a successful request and update the model's latency correction.
+
+        Args:
+            route (Route): Routing decision the request followed
+            model (str): Model that answered
+            seconds (float): Request latency
+            prompt_tokens (int): Prompt tokens reported by the API
+            completion_tokens (int): Completion tokens reported by the API
+            cached_tokens (int): Prompt tokens served from the provider's prompt cache
+
+        Returns:
+            float: Cost of the request in USD
+        """
+        spec = self._spec(model)
+        cost = spec.cost(prompt_tokens, completion_tokens, cached_tokens)
+        prior = spec.prior_seconds(prompt_tokens or route.prompt_tokens, completion_tokens)
+        with self._lock:
+            ratio = seconds / prior if prior > 0 else 1.0
+            previous = self._correction.get(model)
+            self._correction[model] = ratio if previous is None else \
+                previous + LATENCY_EWMA_ALPHA * (ratio - previous)
+            self._observed_at[model] = time.monotonic()
+            self._failed_at.pop(model, None)
+            stats = self._route_stats(route.task, model)
+            stats["calls"] += 1
+            stats["fallbacks"] += model != route.model
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += prompt_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += cost
+        self._log(route, model, seconds, cost_usd=round(cost, 8), prompt_tokens=prompt_tokens,
+                  completion_tokens=completion_tokens, cached_tokens=cached_tokens)
+        return cost
+
+    def record_failure(self, route: Route, model: str, seconds: float, error: BaseException) -> None:
+        """
+        Record a failed request; the model is tried last for the cooldown period.
+
+        Args:
+            route (Route): Routing decision the request followed
+            model (str): Model that failed
+            seconds (float): Time spent before the failure
+            error (BaseException): The failure
+        """
+        with self._lock:
+            self._failed_at[model] = time.monotonic()
+            stats = self._route_stats(route.task, model)
+            stats["failures"] += 1
+            stats["seconds"] += seconds
+        self._log(route, model, seconds, error=f"{type(error).__name__}: {error}")
+
+    def _log(self, route: Route, model: str, seconds: float, **outcome) -> None:
+        decision = dict(route.to_dict(), served_by=model, latency_ms=round(seconds * 1000, 1), time=time.time())
+        decision.update(outcome)
+        with self._lock:
+            self._decisions.append(decision)
+        if self.log_path:
+            export_jsonl(decision, self.log_path)
+
+    def decisions(self) -> List[Dict[str, Any]]:
+        """
+        Get the most recent routing decisions with their outcomes, oldest first.
+
+        Returns:
+            List[Dict[str, Any]]: Decisions with 'served_by', 'latency_ms' and either
+                'cost_usd' and token counts, or 'error'
+        """
+        with self._lock:
+            return list(self._decisions)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-route outcomes and each model's learned latency correction.
+
+        Returns:
+            Dict[str, Any]: 'routes' keyed by 'task/model' with counts, 'mean_ms',
+                tokens and 'cost_usd'; 'latency_correction' per model; 'total_cost_usd'
+        """
+        with self._lock:
+            routes = {}
+            for (task, model), stats in sorted(self._routes.items()):
+                attempts = stats["calls"] + stats["failures"]
+                routes[f"{task}/{model}"] = dict(
+                    stats,
+                    seconds=round(stats["seconds"], 3),
+                    cost_usd=round(stats["cost_usd"], 6),
+                    mean_ms=round(stats["seconds"] / attempts * 1000, 1) if attempts else 0.0,
+                )
+            return {
+                "routes": routes,
+                "latency_correction": {model: round(value, 3) for model, value in self._correction.items()},
+                "total_cost_usd": round(sum(stats["cost_usd"] for stats in self._routes.values()), 6),
+            }
+
+
+def load_model_table(value: Optional[str] = None) -> List[ModelSpec]:
+    """
+    Read the model table from LLM_MODELS, or use the default one.
+
+    Entries may give a context_window; it is then also used for prompt budgets.
+
+    Args:
+        value (str, optional): JSON list, or the path of a JSON file; defaults to LLM_MODELS
+
+    Returns:
+        List[ModelSpec]: Models in order of preference
+    """
+    value = os.getenv("LLM_MODELS") if value is None else value
+    entries = DEFAULT_MODEL_TABLE
+    if value:
+        if value.lstrip().startswith("["):
+            entries = json.loads(value)
+        else:
+            with open(value, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+    for entry in entries:
+        if entry.get("context_window"):
+            MODEL_CONTEXT_WINDOWS[entry["name"]] = int(entry["context_window"])
+    return [ModelSpec.from_dict(entry) for entry in entries]
+
+
+_router: Optional[Router] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> Router:
+    """
+    Get the process-wide router, built from LLM_MODELS and LLM_MODEL on first use.
+
+    Returns:
+        Router: Shared router
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = Router(load_model_table(), pinned=PINNED_MODEL)
+    return _router
+
+
+def set_router(router: Optional[Router]) -> None:
+    """
+    Replace the process-wide router (None rebuilds it from the environment on next use).
+
+    Args:
+        router (Router, optional): New router
+    """
+    global _router
+    with _router_lock:
+        _router = router
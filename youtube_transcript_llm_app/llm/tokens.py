@@ -0,0 +1,118 @@
+# Local token counting helpers
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Context window sizes (in tokens) for the models this app uses
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 16385
+
+# Tokens the chat format adds around each message, and to prime the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+# Token counts remembered, keyed by a digest of the text so large transcripts are not kept alive
+TOKEN_COUNT_CACHE_SIZE = 4096
+_counts: "OrderedDict[tuple, int]" = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    # Without tiktoken (or its encoding files, which it downloads on first use) token
+    # counts are estimated from text length
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("No tokenizer for %s (%s); estimating token counts from text length, "
+                       "with a wider safety margin in prompts", model, e)
+        return None
+
+
+def exact_counts(model: str = "gpt-3.5-turbo") -> bool:
+    """
+    Check whether token counts for a model come from its tokenizer rather than an estimate.
+
+    Args:
+        model (str): Model name
+
+    Returns:
+        bool: True if tiktoken is available for the model
+    """
+    return _get_encoding(model) is not None
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when it is installed, otherwise estimates roughly four characters per token.
+    Exact counts are cached, so the transcript and history that are resent every turn
+    are only tokenized once.
+
+    Args:
+        text (str): Text to measure
+        model (str): Model whose tokenizer should be used
+
+    Returns:
+        int: Number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    key = (model, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+            return count
+    count = len(encoding.encode(text, disallowed_special=()))
+    with _counts_lock:
+        _counts[key] = count
+        if len(_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return count
+
+
+def message_tokens(messages: List[Dict], model: str = "gpt-3.5-turbo") -> int:
+    """
+    Count the prompt tokens a list of chat messages costs, including message framing.
+
+    Args:
+        messages (List[Dict]): Chat messages with 'content'
+        model (str): Model whose tokenizer should be used
+
+    Returns:
+        int: Number of prompt tokens
+    """
+    return sum(count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS for message in messages) \
+        + REPLY_PRIMING_TOKENS
+
+
+def context_window(model: str) -> int:
+    """
+    Get the context window size for a model.
+
+    Args:
+        model (str): Model name
+
+    Returns:
+        int: Maximum prompt plus completion tokens
+    """
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
@@ -0,0 +1,41 @@
+# Tests for the headless API's startup: API key lookup and per-worker OpenAI clients
+import os
+import sys
+import unittest
+from unittest import mock
+
+import api
+from llm import interactions
+
+
+class APIKeyTest(unittest.TestCase):
+    def test_environment_only_outside_streamlit(self):
+        modules = {name: module for name, module in sys.modules.items() if not name.startswith("streamlit")}
+        with mock.patch.dict(sys.modules, modules, clear=True):
+            with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test"}):
+                self.assertEqual(interactions.get_api_key(), "sk-test")
+            with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+                with self.assertRaises(RuntimeError):
+                    interactions.get_api_key()
+            self.assertNotIn("streamlit", sys.modules)
+
+
+class WorkerClientTest(unittest.TestCase):
+    def test_client_built_after_fork(self):
+        with mock.patch.object(api.os, "fork", return_value=12345) as fork, \
+                mock.patch.object(interactions, "get_client") as get_client:
+            self.assertEqual(api.spawn_workers(mock.Mock(), 2), [12345, 12345])
+        self.assertEqual(fork.call_count, 2)
+        # The parent leaves the client, and its connection pool, to each worker
+        get_client.assert_not_called()
+
+    def test_warm_up_without_key(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}), \
+                mock.patch.object(interactions, "get_client") as get_client:
+            with self.assertLogs("api", "WARNING"):
+                api._warm_up()
+        get_client.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+# Tests for the headless batch runner, using the offline stub backends
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import batch
+
+
+class CountingTranscriptBackend(batch.StubTranscriptBackend):
+    """Stub backend that records how many fetches run at once."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency=latency, words=50)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+
+    def fetch(self, video_id):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append(video_id)
+        try:
+            return super().fetch(video_id)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class CountingLLMBackend(batch.StubLLMBackend):
+    """Stub backend that records how many LLM calls run at once."""
+
+    def __init__(self, latency: float = 0.0, fail_on: str = ""):
+        super().__init__(latency=latency)
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def run(self, task, transcript):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.fail_on and task == self.fail_on:
+                raise RuntimeError("simulated LLM failure")
+            return super().run(task, transcript)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def run_batch(self, video_ids, transcript_backend=None, llm_backend=None, **kwargs):
+        output = io.StringIO()
+        runner = batch.BatchRunner(
+            transcript_backend or batch.StubTranscriptBackend(words=50),
+            llm_backend or batch.StubLLMBackend(),
+            output,
+            progress_every=0,
+            **kwargs,
+        )
+        summary = runner.run(video_ids)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        return summary, {record["video_id"]: record for record in records}
+
+    def test_statuses(self):
+        summary, records = self.run_batch(["video1", "disabled1", "error1"], tasks=["summary", "questions"])
+        self.assertEqual((summary["ok"], summary["unavailable"], summary["error"]), (1, 1, 1))
+        self.assertEqual(records["video1"]["status"], "ok")
+        self.assertIn("summary", records["video1"])
+        self.assertIn("questions", records["video1"])
+        self.assertEqual(records["disabled1"]["status"], "unavailable")
+        self.assertEqual(records["error1"]["status"], "error")
+
+    def test_llm_failure_is_error(self):
+        _, records = self.run_batch(["video1"], llm_backend=CountingLLMBackend(fail_on="questions"),
+                                    tasks=["summary", "questions"])
+        self.assertEqual(records["video1"]["status"], "error")
+        self.assertIn("simulated LLM failure", records["video1"]["error"])
+
+    def test_concurrency_limits(self):
+        transcripts = CountingTranscriptBackend(latency=0.02)
+        llm = CountingLLMBackend(latency=0.02)
+        video_ids = [f"video{i}" for i in range(30)]
+        summary, records = self.run_batch(video_ids, transcripts, llm, youtube_concurrency=3, llm_concurrency=2)
+        self.assertEqual(summary["ok"], 30)
+        self.assertEqual(len(records), 30)
+        self.assertLessEqual(transcripts.max_active, 3)
+        self.assertLessEqual(llm.max_active, 2)
+        # Both pools were actually used in parallel
+        self.assertGreater(transcripts.max_active, 1)
+        self.assertGreater(llm.max_active, 1)
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.output = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.input = self.output + ".txt"
+
+    def tearDown(self):
+        for path in (self.output, self.input):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_load_checkpoint_skips_unavailable_and_retries_errors(self):
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"video_id": "a", "status": "ok"}) + "\n")
+            f.write(json.dumps({"video_id": "b", "status": "unavailable"}) + "\n")
+            f.write(json.dumps({"video_id": "c", "status": "error"}) + "\n")
+            f.write('{"video_id": "d", "sta')  # interrupted mid-write
+        self.assertEqual(batch.load_checkpoint(self.output), {"a", "b"})
+
+    def test_load_checkpoint_missing_file(self):
+        os.remove(self.output)
+        self.assertEqual(batch.load_checkpoint(self.output), set())
+
+    def test_resume(self):
+        with open(self.input, "w", encoding="utf-8") as f:
+            f.write("video000001\ndisabled001\nerror000001\n")
+        argv = [self.input, "-o", self.output, "--stub", "--resume"]
+
+        with mock.patch("sys.stderr", io.StringIO()):
+            self.assertEqual(batch.main(argv), 1)
+        first = read_records(self.output)
+        self.assertEqual(sorted(record["video_id"] for record in first), ["disabled001", "error000001", "video000001"])
+
+        calls = []
+        fetch = batch.StubTranscriptBackend.fetch
+
+        def recording_fetch(backend, video_id):
+            calls.append(video_id)
+            return fetch(backend, video_id)
+
+        with mock.patch.object(batch.StubTranscriptBackend, "fetch", recording_fetch), \
+                mock.patch("sys.stderr", io.StringIO()):
+            batch.main(argv)
+        # Only the failed video is fetched again; ok and unavailable videos are skipped
+        self.assertEqual(calls, ["error000001"])
+        self.assertEqual(len(read_records(self.output)), 4)
+
+
+class YouTubeTranscriptBackendTest(unittest.TestCase):
+    def fetch(self, result):
+        with mock.patch("utils.transcript_utils.get_transcript_result", return_value=result):
+            return batch.YouTubeTranscriptBackend(["en"]).fetch(result.video_id)
+
+    def test_maps_result_status(self):
+        from utils.transcript import Transcript
+        from utils.transcript_resolver import TranscriptResult
+
+        transcript = Transcript.from_segments([{"text": "Error correction codes add redundancy", "start": 0.0,
+                                                "duration": 2.0}])
+        self.assertEqual(self.fetch(TranscriptResult("v1", "ok", transcript)),
+                         ("ok", "Error correction codes add redundancy"))
+        for status in ("disabled", "not_found", "unavailable"):
+            self.assertEqual(self.fetch(TranscriptResult("v1", status))[0], "unavailable")
+        self.assertEqual(self.fetch(TranscriptResult("v1", "error", message="Error listing transcripts: boom")),
+                         ("error", "Error listing transcripts: boom"))
+
+
+if __name__ == '__main__':
+    unittest.main()
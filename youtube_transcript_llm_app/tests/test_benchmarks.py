@@ -0,0 +1,103 @@
+# Tests for the offline benchmark harness: statistics, regression checks and the local fakes
+import json
+import unittest
+from urllib.request import Request, urlopen
+
+from benchmarks.fakes import FakeOpenAIServer, FakeTranscriptProvider, make_segments
+from benchmarks.pipeline import compare, measure, percentile, video_id_for
+
+
+def post(url, body):
+    request = Request(url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
+    with urlopen(request, timeout=5) as response:
+        return response.read().decode("utf-8")
+
+
+class StatisticsTest(unittest.TestCase):
+    def test_percentile(self):
+        samples = [4.0, 1.0, 3.0, 2.0, 5.0]
+        self.assertEqual(percentile(samples, 0), 1.0)
+        self.assertEqual(percentile(samples, 50), 3.0)
+        self.assertEqual(percentile(samples, 100), 5.0)
+        self.assertAlmostEqual(percentile(samples, 90), 4.6)
+        self.assertEqual(percentile([7.0], 99), 7.0)
+
+    def test_measure(self):
+        calls = []
+        figures = measure(lambda: calls.append(1), iterations=3, warmup=2)
+        # Warmup, timed iterations and one traced iteration
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(set(figures), {"p50_ms", "p90_ms", "p99_ms", "mean_ms", "ops_per_s", "peak_kb"})
+
+    def test_compare(self):
+        baseline = {"fast": {"p50_ms": 1.0}, "slow": {"p50_ms": 100.0}}
+        results = {
+            # Within the absolute slack
+            "fast": {"p50_ms": 5.5},
+            # 30% over the baseline
+            "slow": {"p50_ms": 130.0},
+            "new": {"p50_ms": 1000.0},
+        }
+        regressions = compare(results, baseline, threshold=0.25, slack_ms=5.0)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("slow:"))
+
+    def test_video_ids(self):
+        self.assertEqual(len(video_id_for(1)), 11)
+        self.assertNotEqual(video_id_for(1), video_id_for(10))
+
+
+class FakeTranscriptProviderTest(unittest.TestCase):
+    def test_segments_are_deterministic(self):
+        segments = make_segments(3, words_per_segment=4, seconds_per_segment=2.0)
+        self.assertEqual(segments, make_segments(3, words_per_segment=4, seconds_per_segment=2.0))
+        self.assertEqual([segment["start"] for segment in segments], [0.0, 2.0, 4.0])
+        self.assertEqual(len(segments[0]["text"].split()), 5)
+
+    def test_install(self):
+        from youtube_transcript_api import TranscriptsDisabled, YouTubeTranscriptApi
+
+        original = YouTubeTranscriptApi.__dict__["get_transcript"]
+        provider = FakeTranscriptProvider()
+        video_id = provider.register("abcdefghijk", 4)
+        with provider.install():
+            self.assertEqual(len(YouTubeTranscriptApi.get_transcript(video_id)), 4)
+            with self.assertRaises(TranscriptsDisabled):
+                YouTubeTranscriptApi.get_transcript("unknown0000")
+        self.assertIs(YouTubeTranscriptApi.__dict__["get_transcript"], original)
+
+
+class FakeOpenAIServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeOpenAIServer(latency=0, completion_words=5).start()
+        self.addCleanup(self.server.stop)
+
+    def test_completion(self):
+        body = json.loads(post(f"{self.server.url}/chat/completions",
+                               {"model": "m", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 3}))
+        self.assertEqual(len(body["choices"][0]["message"]["content"].split()), 3)
+        self.assertEqual(self.server.requests["chat"], 1)
+
+    def test_streamed_completion(self):
+        body = post(f"{self.server.url}/chat/completions",
+                    {"model": "m", "messages": [{"role": "user", "content": "hi"}], "stream": True})
+        events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+        self.assertEqual(events[-1], "[DONE]")
+        self.assertEqual(len(events[:-1]), 5)
+
+    def test_embeddings(self):
+        body = json.loads(post(f"{self.server.url}/embeddings", {"model": "e", "input": ["a b", "a b", "c"]}))
+        vectors = [item["embedding"] for item in body["data"]]
+        self.assertEqual(len(vectors[0]), self.server.embedding_dim)
+        self.assertEqual(vectors[0], vectors[1])
+        self.assertNotEqual(vectors[0], vectors[2])
+
+    def test_oembed(self):
+        with urlopen(f"{self.server.origin}/oembed?url=https://www.youtube.com/watch%3Fv%3Dabcdefghijk",
+                     timeout=5) as response:
+            self.assertEqual(json.loads(response.read())["title"], "Benchmark video abcdefghijk")
+        self.assertEqual(self.server.requests["youtube"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
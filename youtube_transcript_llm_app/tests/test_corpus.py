@@ -0,0 +1,93 @@
+# Tests for the on-disk cross-video corpus index
+import os
+import shutil
+import tempfile
+import unittest
+
+from llm.corpus import CorpusIndex
+
+
+def segments(texts, step=10.0):
+    return [{"text": text, "start": i * step, "duration": step} for i, text in enumerate(texts)]
+
+
+class CorpusIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def make_index(self, **kwargs):
+        return CorpusIndex(self.directory, window_tokens=30, **kwargs)
+
+    def test_add_and_search(self):
+        index = self.make_index()
+        index.add("vid_space", segments(["rockets reach orbit", "astronauts live on the station"]), "Space")
+        index.add("vid_cook", "Bread needs flour, water and yeast. Knead the dough well.", "Baking")
+        self.assertEqual(len(index), 2)
+        # Staged videos are not searchable until committed
+        self.assertEqual(index.search("rockets"), [])
+        index.commit()
+
+        hits = index.search("rockets orbit")
+        self.assertEqual(hits[0].video_id, "vid_space")
+        self.assertEqual(hits[0].title, "Space")
+        self.assertEqual(hits[0].start, 0.0)
+        self.assertEqual(index.search("yeast dough")[0].video_id, "vid_cook")
+        self.assertIsNone(index.search("yeast dough")[0].start)
+        self.assertEqual(index.search("unrelated"), [])
+        self.assertEqual(index.stats()["videos"], 2)
+
+    def test_remove(self):
+        index = self.make_index()
+        index.add("a", "cats purr softly", "A")
+        index.add("b", "dogs bark loudly", "B")
+        index.commit()
+        self.assertTrue(index.remove("a"))
+        self.assertFalse(index.remove("missing"))
+        self.assertNotIn("a", index)
+        index.commit()
+        self.assertEqual(index.search("cats"), [])
+        self.assertEqual(index.search("dogs")[0].video_id, "b")
+        self.assertEqual(len(index), 1)
+
+    def test_readd_replaces(self):
+        index = self.make_index()
+        index.add("a", "first version about volcanoes", "Old")
+        index.commit()
+        index.add("a", "second version about glaciers", "New")
+        index.commit()
+        self.assertEqual(index.search("volcanoes"), [])
+        hits = index.search("glaciers")
+        self.assertEqual([(hit.video_id, hit.title) for hit in hits], [("a", "New")])
+        self.assertEqual(len(index), 1)
+
+    def test_merge_keeps_results(self):
+        index = self.make_index(max_segments=2)
+        for i in range(6):
+            index.add(f"vid{i}", f"video {i} talks about topic{i} and shared words", f"Video {i}")
+            index.commit()
+        index.remove("vid2")
+        index.commit()
+        self.assertLessEqual(index.stats()["segments"], 2)
+        for i in (0, 1, 3, 4, 5):
+            self.assertEqual(index.search(f"topic{i}")[0].video_id, f"vid{i}")
+        self.assertEqual(index.search("topic2"), [])
+
+        index.compact()
+        self.assertEqual(index.stats()["segments"], 1)
+        self.assertEqual(index.stats()["videos"], 5)
+        self.assertEqual(len(index.search("shared words", k=10)), 5)
+        # Only the manifest and the merged segment remain on disk
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_reopen(self):
+        index = self.make_index()
+        index.add("a", "persistent knowledge about tides", "A")
+        index.commit()
+        reopened = self.make_index()
+        self.assertIn("a", reopened)
+        self.assertEqual(reopened.search("tides")[0].video_id, "a")
+
+
+if __name__ == '__main__':
+    unittest.main()
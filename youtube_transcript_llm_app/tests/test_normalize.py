@@ -0,0 +1,110 @@
+# Tests for transcript normalization rules and no-speech detection
+import unittest
+
+from utils.normalize import (
+    ALL_RULES,
+    NO_SPEECH_MESSAGE,
+    RULE_FILLERS,
+    RULE_MARKERS,
+    RULE_OVERLAPS,
+    RULE_SENTENCES,
+    normalize_result,
+    normalize_segments,
+    parse_rules,
+)
+from utils.transcript import Transcript
+from utils.transcript_resolver import TranscriptResult
+
+
+def segments(*texts, step=2.0):
+    return [{"text": text, "start": i * step, "duration": step} for i, text in enumerate(texts)]
+
+
+class ParseRulesTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_rules("markers, Fillers"), {RULE_MARKERS, RULE_FILLERS})
+        self.assertEqual(parse_rules("all"), ALL_RULES)
+        self.assertEqual(parse_rules("off"), frozenset())
+        self.assertEqual(parse_rules(""), frozenset())
+        self.assertEqual(parse_rules("markers,bogus"), {RULE_MARKERS})
+
+
+class NormalizeSegmentsTest(unittest.TestCase):
+    def test_markers_and_fillers(self):
+        result = normalize_segments(segments("[Music] hello  there", "um, so (applause) we begin ♪♪", "[Laughter]"),
+                                    frozenset({RULE_MARKERS, RULE_FILLERS}))
+        self.assertEqual(result.transcript.text, "hello there so we begin")
+        self.assertEqual(len(result.transcript), 2)
+        # The dropped '[Laughter]' segment belongs to the unit before it
+        self.assertEqual(result.original_range(1), (1, 3))
+        self.assertEqual(result.unit_for_original(2), 1)
+
+    def test_no_rules_only_collapses_whitespace(self):
+        result = normalize_segments(segments("[Music]  um  hello", "   "), frozenset())
+        self.assertEqual(result.transcript.text, "[Music] um hello")
+        self.assertEqual(len(result.transcript), 1)
+
+    def test_rolling_caption_overlaps(self):
+        result = normalize_segments(segments("hello there my", "there my friend how", "friend how are you"),
+                                    frozenset({RULE_OVERLAPS}))
+        self.assertEqual(result.transcript.text, "hello there my friend how are you")
+        self.assertEqual([unit["start"] for unit in result.transcript], [0.0, 2.0, 4.0])
+
+    def test_sentences(self):
+        result = normalize_segments(segments("this is the first", "sentence.", "And a second one."),
+                                    frozenset({RULE_SENTENCES}))
+        self.assertEqual([unit["text"] for unit in result.transcript],
+                         ["this is the first sentence.", "And a second one."])
+        self.assertEqual(result.transcript[0]["duration"], 4.0)
+        self.assertEqual(result.original_range(0), (0, 2))
+
+    def test_report(self):
+        result = normalize_segments(segments("[Music] hello", "[Music]"), frozenset({RULE_MARKERS}))
+        report = result.report(count_tokens=lambda text: len(text.split()))
+        self.assertEqual((report["segments_before"], report["segments_after"]), (2, 1))
+        self.assertEqual((report["tokens_before"], report["tokens_after"]), (3, 1))
+        self.assertEqual(report["token_reduction"], round(1 - 1 / 3, 4))
+
+
+class NormalizeResultTest(unittest.TestCase):
+    def result(self, *texts, is_generated=True, language_code="en"):
+        return TranscriptResult("vid", "ok", Transcript.from_segments(segments(*texts)), language_code=language_code,
+                                is_generated=is_generated)
+
+    def test_keeps_original(self):
+        result = normalize_result(self.result("[Music] hello", "world"), frozenset({RULE_MARKERS}))
+        self.assertTrue(result.ok)
+        self.assertEqual(result.text, "hello world")
+        self.assertEqual(result.normalization.original.text, "[Music] hello world")
+        # Normalizing twice is a no-op
+        self.assertIs(normalize_result(result, frozenset({RULE_MARKERS})).transcript, result.transcript)
+
+    def test_only_markers_is_not_found(self):
+        result = normalize_result(self.result("[Music]", "[Applause]", "♪♪"), frozenset({RULE_MARKERS}))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.status, "not_found")
+        self.assertIsNone(result.transcript)
+        self.assertEqual(result.text, NO_SPEECH_MESSAGE)
+
+    def test_manual_tracks_keep_repeats(self):
+        result = normalize_result(self.result("we said it", "said it twice", is_generated=False),
+                                  frozenset({RULE_OVERLAPS}))
+        self.assertEqual(result.text, "we said it said it twice")
+
+    def test_fillers_only_in_english(self):
+        result = normalize_result(self.result("um so", "uh yes", language_code="en-GB"), frozenset({RULE_FILLERS}))
+        self.assertEqual(result.text, "so yes")
+        # "um" is Portuguese for "a"/"one"
+        result = normalize_result(self.result("[Música] comprei um carro", language_code="pt-BR"),
+                                  frozenset({RULE_MARKERS, RULE_FILLERS}))
+        self.assertEqual(result.text, "comprei um carro")
+        self.assertEqual(result.normalization.rules, {RULE_MARKERS})
+
+    def test_failed_result_untouched(self):
+        result = normalize_result(TranscriptResult("vid", "disabled"), ALL_RULES)
+        self.assertEqual(result.status, "disabled")
+        self.assertIsNone(result.normalization)
+
+
+if __name__ == '__main__':
+    unittest.main()
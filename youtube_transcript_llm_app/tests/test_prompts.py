@@ -0,0 +1,92 @@
+# Tests for prompt layout and token budgeting
+import unittest
+from unittest import mock
+
+from llm.prompts import DOCUMENT_TEMPLATE, PROMPT_MARGIN_TOKENS, build_prompt, prompt_margin
+from llm.tokens import MESSAGE_OVERHEAD_TOKENS, REPLY_PRIMING_TOKENS, context_window, count_tokens
+
+MODEL = "gpt-3.5-turbo"
+
+
+def tokens(message):
+    return count_tokens(message["content"], MODEL) + MESSAGE_OVERHEAD_TOKENS
+
+
+def filler(count):
+    # Text of about `count` tokens, with tiktoken or with the length-based estimate
+    per_word = count_tokens("x " * 1000, MODEL) / 1000
+    return "x " * int(count / per_word)
+
+
+class PromptMarginTest(unittest.TestCase):
+    def test_margin(self):
+        with mock.patch("llm.prompts.exact_counts", return_value=True):
+            self.assertEqual(prompt_margin(MODEL), PROMPT_MARGIN_TOKENS)
+        with mock.patch("llm.prompts.exact_counts", return_value=False):
+            # Estimated counts keep a quarter of the window free
+            self.assertEqual(prompt_margin(MODEL), context_window(MODEL) // 4)
+
+
+class BuildPromptTest(unittest.TestCase):
+    def test_layout(self):
+        history = [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}]
+        prompt = build_prompt("system", "question?", document="transcript", turn_context="excerpts",
+                              history=history, model=MODEL)
+        self.assertEqual(prompt.messages, [
+            {"role": "system", "content": "system"},
+            {"role": "system", "content": DOCUMENT_TEMPLATE.format(transcript="transcript")},
+            *history,
+            {"role": "user", "content": "excerpts\n\nquestion?"},
+        ])
+        self.assertTrue(prompt.fits)
+        self.assertEqual(prompt.max_tokens, 800)
+        self.assertEqual(prompt.history_dropped, 0)
+        self.assertEqual(prompt.prompt_tokens, sum(tokens(m) for m in prompt.messages) + REPLY_PRIMING_TOKENS)
+        self.assertEqual(prompt.prefix_tokens, sum(tokens(m) for m in prompt.messages[:-1]))
+
+    def test_shared_prefix(self):
+        summary = build_prompt("system", "Summarize.", document="transcript", model=MODEL)
+        chat = build_prompt("system", "Who spoke?", document="transcript", turn_context="excerpts", model=MODEL)
+        self.assertEqual(summary.messages[:-1], chat.messages[:-1])
+        self.assertEqual(summary.prefix_tokens, chat.prefix_tokens)
+
+    def test_budget_shrinks_to_context_window(self):
+        free = context_window(MODEL) - prompt_margin(MODEL)
+        document = "word " * 10
+        base = build_prompt("system", "go", document=document, model=MODEL)
+        # Grow the document until only 500 tokens are left for the completion
+        padding = filler(free - base.prompt_tokens - 500)
+        prompt = build_prompt("system", "go", document=document + padding, max_tokens=800, model=MODEL)
+        self.assertTrue(prompt.fits)
+        self.assertLess(prompt.max_tokens, 800)
+        self.assertEqual(prompt.max_tokens, free - prompt.prompt_tokens)
+
+    def test_oldest_history_dropped_with_its_reply(self):
+        free = context_window(MODEL) - prompt_margin(MODEL)
+        turn = filler(free * 0.55)
+        history = [
+            {"role": "user", "content": "old question " + turn},
+            {"role": "assistant", "content": "old answer"},
+            {"role": "user", "content": "recent question " + turn},
+            {"role": "assistant", "content": "recent answer"},
+        ]
+        prompt = build_prompt("system", "next?", history=history, model=MODEL)
+        self.assertEqual(prompt.history_dropped, 2)
+        self.assertEqual(prompt.messages[1:3], history[2:])
+        self.assertTrue(prompt.fits)
+
+    def test_does_not_fit(self):
+        document = filler(context_window(MODEL) * 2)
+        prompt = build_prompt("system", "go", document=document, model=MODEL)
+        self.assertFalse(prompt.fits)
+        self.assertEqual(prompt.max_tokens, 0)
+
+    def test_deterministic(self):
+        args = ("system", "question", "transcript", "context", [{"role": "user", "content": "hi"}])
+        first, second = build_prompt(*args, model=MODEL), build_prompt(*args, model=MODEL)
+        self.assertEqual(first.messages, second.messages)
+        self.assertEqual(first.max_tokens, second.max_tokens)
+
+
+if __name__ == '__main__':
+    unittest.main()
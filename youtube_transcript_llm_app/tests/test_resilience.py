@@ -0,0 +1,124 @@
+# Tests for the resilience layer: deadlines around blocking calls and slots held by streams
+import threading
+import time
+import unittest
+from unittest import mock
+
+from utils.resilience import Backend, ResilienceError, call_with_timeout, get_backend, set_backend
+from utils.transcript_resolver import Candidate, list_tracks
+
+
+class HangingTrack:
+    """Caption track whose fetch never returns until released."""
+
+    language_code = "en"
+    is_generated = False
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def fetch(self):
+        self.release.wait()
+        return []
+
+
+class CallWithTimeoutTest(unittest.TestCase):
+    def test_result_and_errors(self):
+        self.assertEqual(call_with_timeout(lambda: 42, 1.0), 42)
+        with self.assertRaises(KeyError):
+            call_with_timeout(lambda: {}["missing"], 1.0)
+
+    def test_hanging_call(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            call_with_timeout(release.wait, 0.1)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class YouTubeDeadlineTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(set_backend, get_backend("youtube"))
+        self.backend = Backend("youtube", concurrency=1, max_attempts=2, base_delay=0.01, deadline=0.3)
+        set_backend(self.backend)
+
+    def assert_fails_within_deadline(self, call):
+        started = time.monotonic()
+        with self.assertRaises(ResilienceError):
+            call()
+        self.assertLess(time.monotonic() - started, 1.0)
+        # The hung request no longer holds the backend's only slot
+        self.assertEqual(self.backend.limiter.in_flight, 0)
+
+    def test_hanging_fetch(self):
+        track = HangingTrack()
+        self.addCleanup(track.release.set)
+        self.assert_fails_within_deadline(Candidate(track).fetch)
+
+    def test_hanging_listing(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def list_transcripts(video_id, **kwargs):
+            release.wait()
+            return []
+
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        with mock.patch.object(YouTubeTranscriptApi, "list_transcripts", staticmethod(list_transcripts)):
+            self.assert_fails_within_deadline(lambda: list_tracks("hangingvid1"))
+
+
+class HeldStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = Backend("test", concurrency=4, deadline=5.0)
+
+    def test_slot_held_until_exhausted(self):
+        stream = self.backend.stream(lambda remaining: iter([1, 2]))
+        self.assertEqual(next(stream), 1)
+        self.assertEqual(self.backend.limiter.in_flight, 1)
+        self.assertEqual(list(stream), [2])
+        self.assertEqual(self.backend.limiter.in_flight, 0)
+        self.assertGreater(self.backend.limiter.limit, 4)
+        # Closing after the end does not release the slot twice
+        stream.close()
+        self.assertEqual(self.backend.limiter.in_flight, 0)
+
+    def test_close_releases_slot(self):
+        closed = []
+
+        class Response:
+            def __iter__(self):
+                return iter([1, 2, 3])
+
+            def close(self):
+                closed.append(True)
+
+        stream = self.backend.stream(lambda remaining: Response())
+        next(stream)
+        stream.close()
+        self.assertEqual(closed, [True])
+        self.assertEqual(self.backend.limiter.in_flight, 0)
+
+    def test_error_mid_stream_shrinks_limit(self):
+        def events():
+            yield 1
+            raise TimeoutError("read timed out")
+
+        stream = self.backend.stream(lambda remaining: events())
+        with self.assertRaises(TimeoutError):
+            list(stream)
+        self.assertEqual(self.backend.limiter.in_flight, 0)
+        self.assertEqual(self.backend.limiter.limit, 2)
+        self.assertEqual(self.backend.stats()["failures"], 1)
+
+    def test_stream_past_deadline_shrinks_limit(self):
+        stream = self.backend.stream(lambda remaining: iter([1]), deadline=0.05)
+        time.sleep(0.1)
+        list(stream)
+        self.assertEqual(self.backend.limiter.limit, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
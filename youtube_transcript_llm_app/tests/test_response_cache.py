@@ -0,0 +1,159 @@
+# Tests for the LLM response cache, including shared streams
+import threading
+import unittest
+
+from llm.response_cache import DiskBackend, MemoryBackend, ResponseCache, request_key
+
+PARAMS = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+
+
+def produce_from(chunks, calls, gate=None):
+    def produce():
+        calls.append(1)
+        for chunk in chunks:
+            if gate is not None:
+                gate.wait(5)
+            yield chunk
+        return {"content": "".join(chunks), "prompt_tokens": 5, "completion_tokens": len(chunks)}
+    return produce
+
+
+class RequestKeyTest(unittest.TestCase):
+    def test_order_independent(self):
+        self.assertEqual(request_key({"a": 1, "b": 2}), request_key({"b": 2, "a": 1}))
+        self.assertNotEqual(request_key(PARAMS), request_key(dict(PARAMS, max_tokens=11)))
+
+
+class BackendTest(unittest.TestCase):
+    def check_backend(self, backend):
+        backend.set("a", {"content": "x"}, ttl=60)
+        self.assertEqual(backend.get("a"), {"content": "x"})
+        backend.set("b", {"content": "y"}, ttl=-1)
+        self.assertIsNone(backend.get("b"))
+        backend.set("c", {"content": "z"}, ttl=60)
+        backend.set("d", {"content": "w"}, ttl=60)
+        # max_entries is 2: the least recently used entry is gone
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(len(backend), 2)
+
+    def test_memory(self):
+        self.check_backend(MemoryBackend(max_entries=2))
+
+    def test_disk(self):
+        self.check_backend(DiskBackend(":memory:", max_entries=2))
+
+
+class GetOrCallTest(unittest.TestCase):
+    def test_coalesces(self):
+        cache = ResponseCache()
+        calls = []
+        gate = threading.Event()
+
+        def call():
+            calls.append(1)
+            gate.wait(5)
+            return {"content": "answer", "prompt_tokens": 5, "completion_tokens": 1}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_call(PARAMS, call)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while cache.stats()["coalesced"] < 3:
+            threading.Event().wait(0.005)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r["content"] for r in results], ["answer"] * 4)
+        self.assertEqual(cache.get(PARAMS)["content"], "answer")
+
+
+class StreamTest(unittest.TestCase):
+    def test_leader_then_cache(self):
+        cache = ResponseCache()
+        calls = []
+        shared = cache.stream(PARAMS, produce_from(["a", "b", "c"], calls))
+        self.assertEqual(shared.source, "leader")
+        self.assertEqual(list(shared), ["a", "b", "c"])
+        self.assertEqual(shared.value["content"], "abc")
+
+        again = cache.stream(PARAMS, produce_from(["x"], calls))
+        self.assertEqual(again.source, "cache")
+        self.assertEqual(list(again), ["abc"])
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_streams_share_one_call(self):
+        cache = ResponseCache()
+        calls = []
+        gate = threading.Event()
+        leader = cache.stream(PARAMS, produce_from(["a", "b", "c"], calls, gate))
+        follower = cache.stream(PARAMS, produce_from(["x"], calls))
+        self.assertEqual(follower.source, "follower")
+
+        results = {}
+        threads = [threading.Thread(target=lambda name=name, s=s: results.setdefault(name, list(s)))
+                   for name, s in (("leader", leader), ("follower", follower))]
+        for thread in threads:
+            thread.start()
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, {"leader": ["a", "b", "c"], "follower": ["a", "b", "c"]})
+        self.assertEqual(follower.value["content"], "abc")
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 1))
+        self.assertEqual(stats["completion_tokens_saved"], 3)
+
+    def test_follower_finishes_when_leader_stops(self):
+        cache = ResponseCache()
+        calls = []
+        leader = iter(cache.stream(PARAMS, produce_from(["a", "b", "c"], calls)))
+        follower = cache.stream(PARAMS, produce_from(["x"], calls))
+        self.assertEqual(next(leader), "a")
+        leader.close()
+        self.assertEqual(list(follower), ["a", "b", "c"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get(PARAMS)["content"], "abc")
+
+    def test_abandoned_stream_is_closed_and_not_cached(self):
+        cache = ResponseCache()
+        closed = []
+
+        def produce():
+            try:
+                yield "a"
+                yield "b"
+            finally:
+                closed.append(True)
+            return {"content": "ab"}
+
+        reader = iter(cache.stream(PARAMS, produce))
+        self.assertEqual(next(reader), "a")
+        reader.close()
+        self.assertEqual(closed, [True])
+        self.assertIsNone(cache.get(PARAMS))
+        # The next request starts a fresh stream
+        self.assertEqual(cache.stream(PARAMS, produce).source, "leader")
+
+    def test_errors_reach_every_reader(self):
+        cache = ResponseCache()
+
+        def produce():
+            yield "a"
+            raise RuntimeError("stream broke")
+
+        leader = cache.stream(PARAMS, produce)
+        follower = cache.stream(PARAMS, produce)
+        with self.assertRaises(RuntimeError):
+            list(leader)
+        with self.assertRaises(RuntimeError):
+            list(follower)
+        self.assertIsNone(cache.get(PARAMS))
+        self.assertEqual(cache.stream(PARAMS, produce).source, "leader")
+
+
+if __name__ == '__main__':
+    unittest.main()
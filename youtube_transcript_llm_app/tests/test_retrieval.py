@@ -0,0 +1,104 @@
+# Tests for per-video BM25 retrieval
+import unittest
+
+from llm.retrieval import BM25Index, TranscriptIndex, Window, build_windows, format_excerpts, tokenize
+from utils.shared_cache import SharedCache
+
+
+def segments(texts, step=10.0):
+    return [{"text": text, "start": i * step, "duration": step} for i, text in enumerate(texts)]
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize("What is the Speed of LIGHT? It's 299,792 km/s"),
+                         ["speed", "light", "it's", "299", "792", "km", "s"])
+
+
+class BM25IndexTest(unittest.TestCase):
+    def test_scores(self):
+        index = BM25Index(["the cat sat on the mat", "dogs chase cats", "a cat and a cat", "nothing here"])
+        scores = index.scores("cat")
+        self.assertEqual(set(scores), {0, 2})
+        # Higher term frequency scores higher
+        self.assertGreater(scores[2], scores[0])
+        self.assertEqual(index.scores("unicorn"), {})
+        self.assertEqual(BM25Index([]).scores("cat"), {})
+
+    def test_rare_terms_weigh_more(self):
+        index = BM25Index(["apple banana", "apple cherry", "apple date"])
+        scores = index.scores("apple cherry")
+        self.assertEqual(max(scores, key=scores.get), 1)
+
+
+class WindowsTest(unittest.TestCase):
+    def test_segment_windows(self):
+        texts = [f"sentence number {i} about topic {i}" for i in range(40)]
+        windows = build_windows(segments(texts), window_tokens=40, overlap=1)
+        self.assertGreater(len(windows), 1)
+        self.assertEqual(windows[0].start, 0.0)
+        self.assertEqual(windows[-1].end, 400.0)
+        # Neighbouring windows share one segment
+        self.assertEqual(windows[1].start, windows[0].end - 10.0)
+        shared = windows[0].text[windows[0].text.rindex("sentence"):]
+        self.assertTrue(windows[1].text.startswith(shared))
+
+    def test_text_windows(self):
+        windows = build_windows("First sentence here. Second sentence there.", window_tokens=200)
+        self.assertEqual(len(windows), 1)
+        self.assertIsNone(windows[0].start)
+
+    def test_format(self):
+        self.assertEqual(Window("hi", 75.0, 90.0).format(), "[1:15-1:30] hi")
+        self.assertEqual(Window("hi").format(), "hi")
+        self.assertEqual(format_excerpts([Window("a"), Window("b")]), "a\n\nb")
+
+
+class TranscriptIndexTest(unittest.TestCase):
+    def setUp(self):
+        texts = ["welcome to the show"] * 10 + ["photosynthesis converts sunlight into sugar"] \
+            + ["more filler talk here"] * 10 + ["mitochondria produce energy for the cell"]
+        self.index = TranscriptIndex(segments(texts), window_tokens=20)
+
+    def test_search(self):
+        hits = self.index.search("how does photosynthesis work", k=1)
+        self.assertEqual(len(hits), 1)
+        self.assertIn("photosynthesis", hits[0].text)
+
+    def test_results_in_video_order(self):
+        hits = self.index.search("mitochondria photosynthesis", k=2)
+        self.assertEqual(len(hits), 2)
+        self.assertLess(hits[0].start, hits[1].start)
+
+    def test_dense_fusion(self):
+        calls = []
+
+        def embed(texts):
+            calls.append(len(texts))
+            return [[1.0 if "energy" in text else 0.0, 1.0] for text in texts]
+
+        index = TranscriptIndex(segments(["energy talk", "other talk"]), embed_fn=embed, window_tokens=5)
+        hits = index.search("energy", k=1)
+        self.assertIn("energy", hits[0].text)
+        self.assertEqual(calls[0], len(index.windows))
+
+    def test_nbytes_bounds_shared_cache(self):
+        small = TranscriptIndex(segments(["short talk"]))
+        large = TranscriptIndex(segments([f"segment {i} about subject{i}" for i in range(2000)]))
+        self.assertGreater(large.nbytes(), 10 * small.nbytes())
+
+        cache = SharedCache("retrieval-test", max_bytes=int(large.nbytes() * 1.5))
+        cache.set("a", large)
+        cache.set("b", TranscriptIndex(segments([f"segment {i} about subject{i}" for i in range(2000)])))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_stats(self):
+        self.index.search("cell")
+        stats = self.index.stats()
+        self.assertEqual(stats["windows"], len(self.index.windows))
+        self.assertGreaterEqual(stats["last_query_ms"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
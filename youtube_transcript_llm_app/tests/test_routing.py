@@ -0,0 +1,121 @@
+# Tests for latency-aware model routing
+import unittest
+
+from llm.routing import DEFAULT_MODEL_TABLE, ModelSpec, Router, TaskProfile, classify_question
+
+
+def make_router(**kwargs):
+    kwargs.setdefault("probe_every", 0)
+    return Router([ModelSpec.from_dict(entry) for entry in DEFAULT_MODEL_TABLE], log_path=None, **kwargs)
+
+
+class ClassifyQuestionTest(unittest.TestCase):
+    def test_classify(self):
+        self.assertEqual(classify_question("Who is the speaker?"), "lookup")
+        self.assertEqual(classify_question("How many steps are there?"), "lookup")
+        self.assertEqual(classify_question("Why does the speaker think this matters?"), "answer")
+        self.assertEqual(classify_question("Who " + "really " * 20 + "said it?"), "answer")
+
+
+class TaskProfileTest(unittest.TestCase):
+    def test_budget_grows_with_prompt(self):
+        profile = TaskProfile(min_quality=1, max_tokens=400, tokens_per_1k_prompt=20, ceiling=1200)
+        self.assertEqual(profile.budget(0), 400)
+        self.assertEqual(profile.budget(10000), 600)
+        self.assertEqual(profile.budget(10 ** 6), 1200)
+
+
+class RouterTest(unittest.TestCase):
+    def test_cheapest_within_latency_slack(self):
+        route = make_router().route("lookup", 1000)
+        # gpt-4o-mini and gpt-3.5-turbo are equally fast; gpt-4o-mini is cheaper
+        self.assertEqual(route.model, "gpt-4o-mini")
+        self.assertEqual(route.reason, "cheapest within latency slack")
+        self.assertEqual(route.max_tokens, 300)
+        self.assertEqual(set(route.candidates), {"gpt-4o-mini", "gpt-3.5-turbo", "gpt-4o"})
+
+    def test_quality_floor(self):
+        route = make_router().route("answer", 1000)
+        self.assertNotIn("gpt-3.5-turbo", route.candidates)
+        self.assertEqual(route.candidates, ["gpt-4o-mini", "gpt-4o"])
+        self.assertEqual(route.reason, "fastest")
+
+    def test_context_window_eligibility(self):
+        route = make_router().route("lookup", 30000)
+        self.assertNotIn("gpt-3.5-turbo", route.candidates)
+        self.assertEqual(route.max_tokens_for("gpt-4o-mini"), 300)
+
+    def test_too_long_for_every_model(self):
+        route = make_router().route("summary", 500000)
+        self.assertEqual(route.reason, "largest context window")
+        self.assertEqual(route.model, "gpt-4o-mini")
+
+    def test_pinned(self):
+        route = make_router(pinned="my-model").route("answer", 1000)
+        self.assertEqual(route.candidates, ["my-model"])
+        self.assertEqual(route.reason, "pinned")
+
+    def test_failed_model_cools_down(self):
+        router = make_router(cooldown=60)
+        route = router.route("answer", 1000)
+        router.record_failure(route, "gpt-4o-mini", 0.1, RuntimeError("boom"))
+        route = router.route("answer", 1000)
+        self.assertEqual(route.candidates, ["gpt-4o", "gpt-4o-mini"])
+        # A success ends the cooldown
+        router.record(route, "gpt-4o-mini", 1.0, prompt_tokens=1000, completion_tokens=100)
+        self.assertEqual(router.route("answer", 1000).model, "gpt-4o-mini")
+
+    def test_call_falls_back(self):
+        router = make_router()
+        route = router.route("answer", 1000)
+
+        def fn(model):
+            if model == "gpt-4o-mini":
+                raise RuntimeError("unavailable")
+            return f"answer from {model}"
+
+        self.assertEqual(router.call(route, fn), ("gpt-4o", "answer from gpt-4o"))
+        stats = router.stats()["routes"]
+        self.assertEqual(stats["answer/gpt-4o-mini"]["failures"], 1)
+
+    def test_call_raises_when_every_model_fails(self):
+        router = make_router()
+        route = router.route("answer", 1000)
+
+        def fn(model):
+            raise RuntimeError(model)
+
+        with self.assertRaises(RuntimeError):
+            router.call(route, fn)
+
+    def test_observed_latency_changes_choice(self):
+        router = make_router()
+        route = router.route("answer", 1000)
+        # gpt-4o-mini turns out to be ten times slower than its prior
+        prior = router.models["gpt-4o-mini"].prior_seconds(1000, 100)
+        router.record(route, "gpt-4o-mini", prior * 10, prompt_tokens=1000, completion_tokens=100)
+        # Models not observed yet get the average correction, so the choice holds
+        self.assertEqual(router.route("answer", 1000).model, "gpt-4o-mini")
+        prior = router.models["gpt-4o"].prior_seconds(1000, 100)
+        router.record(route, "gpt-4o", prior, prompt_tokens=1000, completion_tokens=100)
+        self.assertEqual(router.route("answer", 1000).model, "gpt-4o")
+
+    def test_probe(self):
+        router = make_router(probe_every=2)
+        first = router.route("lookup", 1000)
+        router.record(first, first.model, 1.0, prompt_tokens=1000, completion_tokens=100)
+        second = router.route("lookup", 1000)
+        self.assertEqual(second.reason, "probe")
+        self.assertNotEqual(second.model, first.model)
+
+    def test_record_cost(self):
+        router = make_router()
+        route = router.route("answer", 1000)
+        cost = router.record(route, "gpt-4o-mini", 1.0, prompt_tokens=1000, completion_tokens=1000,
+                             cached_tokens=500)
+        self.assertAlmostEqual(cost, (500 * 0.15 + 500 * 0.075 + 1000 * 0.60) / 1_000_000)
+        self.assertEqual(router.decisions()[-1]["served_by"], "gpt-4o-mini")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# Tests for the process-wide SharedCache: single-flight, LRU bounds and TTL
+import threading
+import time
+import unittest
+
+from utils.shared_cache import SharedCache
+
+
+class Sized:
+    """Value reporting its own size, like Transcript and TranscriptIndex."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def nbytes(self):
+        return self.size
+
+
+class SharedCacheTest(unittest.TestCase):
+    def test_single_flight(self):
+        cache = SharedCache("test")
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        # Let every thread reach the cache before the computation finishes
+        deadline = time.monotonic() + 5
+        while cache.stats()["coalesced"] < 7 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 8)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"], stats["in_flight"]), (1, 7, 0))
+        self.assertEqual(cache.get_or_compute("key", compute), "value")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_errors_are_shared_and_not_cached(self):
+        cache = SharedCache("test")
+        attempts = []
+
+        def failing():
+            attempts.append(1)
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute("key", failing)
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute("key", failing)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(cache.stats()["errors"], 2)
+        self.assertEqual(cache.get_or_compute("key", lambda: "ok"), "ok")
+
+    def test_should_cache(self):
+        cache = SharedCache("test")
+        self.assertEqual(cache.get_or_compute("key", lambda: "Error", should_cache=lambda v: v != "Error"), "Error")
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get_or_compute("key", lambda: "good", should_cache=lambda v: v != "Error"), "good")
+        self.assertEqual(cache.get("key"), "good")
+
+    def test_lru_by_entries(self):
+        cache = SharedCache("test", max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_bounded_by_bytes(self):
+        cache = SharedCache("test", max_bytes=100)
+        cache.set("a", "x" * 60)
+        cache.set("b", "y" * 60)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 60)
+        cache.set("huge", "z" * 1000)
+        self.assertIsNone(cache.get("huge"))
+
+    def test_bounded_by_nbytes(self):
+        cache = SharedCache("test", max_bytes=100)
+        cache.set("a", Sized(60))
+        cache.set("b", Sized(60))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 60)
+        cache.set("huge", Sized(1000))
+        self.assertIsNone(cache.get("huge"))
+
+    def test_ttl(self):
+        cache = SharedCache("test", ttl=0.05)
+        cache.set("a", "1")
+        self.assertEqual(cache.get("a"), "1")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
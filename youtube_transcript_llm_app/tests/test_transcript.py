@@ -0,0 +1,88 @@
+# Tests for the compact Transcript arrays and timestamp helpers
+import unittest
+
+from utils.transcript import Transcript, as_transcript, format_timestamp, parse_timestamp
+
+SEGMENTS = [
+    {"text": "hello there", "start": 0.0, "duration": 2.0},
+    {"text": "general kenobi", "start": 2.0, "duration": 3.0},
+    {"text": "you are a bold one", "start": 6.0, "duration": 2.5},
+]
+
+
+class TranscriptTest(unittest.TestCase):
+    def setUp(self):
+        self.transcript = Transcript.from_segments(SEGMENTS)
+
+    def test_round_trip_segments(self):
+        self.assertEqual(len(self.transcript), 3)
+        self.assertEqual(self.transcript.text, "hello there general kenobi you are a bold one")
+        self.assertEqual(self.transcript.to_segments(), SEGMENTS)
+        self.assertEqual(self.transcript[-1]["text"], "you are a bold one")
+        self.assertEqual(self.transcript.segment_text(1), "general kenobi")
+        self.assertEqual(self.transcript.end, 8.5)
+        with self.assertRaises(IndexError):
+            self.transcript[3]
+
+    def test_index_lookups(self):
+        self.assertEqual(self.transcript.index_at_time(-1), 0)
+        self.assertEqual(self.transcript.index_at_time(2.0), 1)
+        self.assertEqual(self.transcript.index_at_time(5.5), 1)
+        self.assertEqual(self.transcript.index_at_time(100), 2)
+        offset = self.transcript.text.index("kenobi")
+        self.assertEqual(self.transcript.index_at_offset(offset), 1)
+        self.assertEqual(self.transcript.time_at_offset(offset), 2.0)
+        self.assertEqual(self.transcript.index_at_offset(10 ** 6), 2)
+
+    def test_time_ranges(self):
+        self.assertEqual(self.transcript.range_indices(2.0, 6.0), (1, 2))
+        self.assertEqual(self.transcript.range_indices(1.0, 7.0), (0, 3))
+        self.assertEqual(self.transcript.text_between(2.5, 3.0), "general kenobi")
+        self.assertEqual(self.transcript.text_between(5.2, 5.9), "")
+
+    def test_slice(self):
+        part = self.transcript.slice(1, 3)
+        self.assertEqual(part.to_segments(), SEGMENTS[1:])
+        self.assertEqual(part.text, "general kenobi you are a bold one")
+        empty = self.transcript.slice(1, 1)
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.text, "")
+
+    def test_bytes_round_trip(self):
+        for compress in (True, False):
+            restored = Transcript.from_bytes(self.transcript.to_bytes(compress=compress))
+            self.assertEqual(restored.to_segments(), SEGMENTS)
+            self.assertEqual(restored.text, self.transcript.text)
+        with self.assertRaises(ValueError):
+            Transcript.from_bytes(b"not a transcript at all")
+
+    def test_empty(self):
+        empty = Transcript.from_segments([])
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.text, "")
+        self.assertEqual(empty.end, 0.0)
+        self.assertEqual(empty.time_at_offset(5), 0.0)
+        self.assertEqual(Transcript.from_bytes(empty.to_bytes()).text, "")
+
+    def test_as_transcript(self):
+        self.assertIsNone(as_transcript(None))
+        self.assertIs(as_transcript(self.transcript), self.transcript)
+        self.assertEqual(as_transcript(SEGMENTS).text, self.transcript.text)
+
+
+class TimestampTest(unittest.TestCase):
+    def test_format(self):
+        self.assertEqual(format_timestamp(0), "0:00")
+        self.assertEqual(format_timestamp(75.9), "1:15")
+        self.assertEqual(format_timestamp(3725), "1:02:05")
+
+    def test_parse(self):
+        self.assertEqual(parse_timestamp("90"), 90.0)
+        self.assertEqual(parse_timestamp("1:30"), 90.0)
+        self.assertEqual(parse_timestamp(" 1:02:05 "), 3725.0)
+        for value in ("", "abc", "1:2:3:4", "-5", "nan", "inf"):
+            self.assertIsNone(parse_timestamp(value), value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Tests for the SQLite transcript cache: TTL expiry, LRU eviction and negative caching
+import time
+import unittest
+
+from utils.transcript_cache import KIND_SEGMENTS, KIND_TEXT, TranscriptCache
+
+
+class TranscriptCacheTest(unittest.TestCase):
+    def make_cache(self, **kwargs):
+        cache = TranscriptCache(path=":memory:", **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hit_and_miss(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("vid", ["en"], KIND_TEXT))
+        cache.set("vid", ["en"], KIND_TEXT, "hello world")
+        entry = cache.get("vid", ["en"], KIND_TEXT)
+        self.assertEqual(entry.value, "hello world")
+        self.assertFalse(entry.is_error)
+        # Languages and kind are part of the key
+        self.assertIsNone(cache.get("vid", ["de"], KIND_TEXT))
+        self.assertIsNone(cache.get("vid", ["en"], KIND_SEGMENTS))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 3, 1))
+
+    def test_ttl_expiry(self):
+        cache = self.make_cache(ttl=0.05)
+        cache.set("vid", None, KIND_TEXT, "hello")
+        self.assertIsNotNone(cache.get("vid", None, KIND_TEXT))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("vid", None, KIND_TEXT))
+        self.assertEqual(cache.stats()["expired"], 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_negative_entries(self):
+        cache = self.make_cache(negative_ttl=0.05)
+        cache.set_negative("vid", None, KIND_TEXT, "disabled", "Transcripts are disabled for this video.")
+        entry = cache.get("vid", None, KIND_TEXT)
+        self.assertTrue(entry.is_error)
+        self.assertEqual(entry.error_type, "disabled")
+        self.assertEqual(entry.value, "Transcripts are disabled for this video.")
+        self.assertEqual(cache.stats()["negative_hits"], 1)
+        # Negative entries use their own, shorter TTL
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("vid", None, KIND_TEXT))
+
+    def test_lru_eviction_by_entries(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set("a", None, KIND_TEXT, "a")
+        time.sleep(0.01)
+        cache.set("b", None, KIND_TEXT, "b")
+        time.sleep(0.01)
+        # Touch "a" so "b" becomes the least recently used entry
+        cache.get("a", None, KIND_TEXT)
+        time.sleep(0.01)
+        cache.set("c", None, KIND_TEXT, "c")
+        self.assertIsNotNone(cache.get("a", None, KIND_TEXT))
+        self.assertIsNone(cache.get("b", None, KIND_TEXT))
+        self.assertIsNotNone(cache.get("c", None, KIND_TEXT))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        cache = self.make_cache(max_bytes=100)
+        cache.set("a", None, KIND_TEXT, "x" * 60)
+        time.sleep(0.01)
+        cache.set("b", None, KIND_TEXT, "y" * 60)
+        self.assertIsNone(cache.get("a", None, KIND_TEXT))
+        self.assertIsNotNone(cache.get("b", None, KIND_TEXT))
+        # Values larger than the whole cache are not stored at all
+        cache.set("c", None, KIND_TEXT, "z" * 200)
+        self.assertIsNone(cache.get("c", None, KIND_TEXT))
+        self.assertLessEqual(cache.stats()["bytes"], 100)
+
+    def test_invalidate(self):
+        cache = self.make_cache()
+        cache.set("vid", ["en"], KIND_TEXT, "text")
+        cache.set("vid", ["en"], KIND_SEGMENTS, [{"text": "text", "start": 0.0, "duration": 1.0}])
+        cache.set("other", ["en"], KIND_TEXT, "other")
+        cache.invalidate("vid")
+        self.assertIsNone(cache.get("vid", ["en"], KIND_TEXT))
+        self.assertIsNone(cache.get("vid", ["en"], KIND_SEGMENTS))
+        self.assertIsNotNone(cache.get("other", ["en"], KIND_TEXT))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+# Tests for transcript viewer paging
+import unittest
+
+from utils import transcript_view
+
+
+class PagingTest(unittest.TestCase):
+    def test_page_count_rounds_up(self):
+        self.assertEqual(transcript_view.page_count(1, page_size=50), 1)
+        self.assertEqual(transcript_view.page_count(50, page_size=50), 1)
+        self.assertEqual(transcript_view.page_count(51, page_size=50), 2)
+
+    def test_page_bounds_clamp_to_valid_pages(self):
+        self.assertEqual(transcript_view.page_bounds(2, 120, page_size=50), (50, 100))
+        self.assertEqual(transcript_view.page_bounds(3, 120, page_size=50), (100, 120))
+        self.assertEqual(transcript_view.page_bounds(9, 120, page_size=50), (100, 120))
+        self.assertEqual(transcript_view.page_bounds(0, 120, page_size=50), (0, 50))
+
+    def test_empty_transcript_has_one_empty_page(self):
+        self.assertEqual(transcript_view.page_count(0), 1)
+        first, last = transcript_view.page_bounds(1, 0)
+        self.assertEqual((first, last), (0, 0))
+        self.assertEqual(list(range(0)[first:last]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
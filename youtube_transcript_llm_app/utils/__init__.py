@@ -1 +1,6 @@
-from .transcript_utils import get_video_id, get_transcript, get_video_title
+from .transcript_utils import (
+    get_video_id, get_transcript, get_transcript_result, get_video_title, get_video_metadata, get_transcript_segments
+)
+from .transcript_cache import TranscriptCache, get_transcript_cache
+from .transcript import Transcript
+from .transcript_resolver import TranscriptResult
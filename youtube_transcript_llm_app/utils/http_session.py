@@ -0,0 +1,44 @@
+# Shared, connection-pooled HTTP session for outbound requests
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+# (connect, read) timeouts in seconds used for every outbound request
+DEFAULT_TIMEOUT = (3.05, 10)
+
+USER_AGENT = (
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
+)
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """
+    Get the process-wide keep-alive HTTP session.
+
+    The session is created on first use and reused afterwards, so repeated requests
+    to the same host share pooled TCP/TLS connections.
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # requests is imported on first use to keep module import cheap
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.8"})
+                _session = session
+    return _session
@@ -0,0 +1,364 @@
+# Lightweight tracing, metrics export and per-request profiling
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Append every finished trace to this JSON-lines file when set
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "youtube_transcript_llm_profiles"))
+
+# Span attributes that are summed into counters rather than stored as labels
+_TOKEN_ATTRS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+
+class Trace:
+    """
+    Spans recorded while handling one request (a chat turn, a video load, ...).
+
+    Spans are flat: each has a name, an offset from the start of the trace, a duration
+    and free-form attributes such as token counts and cache hit flags.
+    """
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attrs = dict(attrs or {})
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, duration_ms: float, attrs: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "offset_ms": round((started - self._started) * 1000, 2),
+                "duration_ms": round(duration_ms, 2),
+                **attrs,
+            })
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize for export.
+
+        Returns:
+            Dict[str, Any]: Trace fields and its spans ordered by start
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["offset_ms"])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            **self.attrs,
+            "spans": spans,
+        }
+
+
+class MetricsRegistry:
+    """Process-wide latency histograms, token/cache/error counters keyed by stage, and gauges."""
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def _count(self, metric: str, labels: Dict[str, str], amount: float = 1) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, stage: str, duration_ms: float, attrs: Dict[str, Any]) -> None:
+        """
+        Record one finished span.
+
+        Args:
+            stage (str): Span name
+            duration_ms (float): Span duration
+            attrs (Dict[str, Any]): Span attributes (token counts, 'cache_hit', 'error', and
+                'task', 'model' and 'cost_usd' for routed LLM requests)
+        """
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                stage, {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets_ms)}
+            )
+            histogram["count"] += 1
+            histogram["sum"] += duration_ms
+            for i, bound in enumerate(self.buckets_ms):
+                if duration_ms <= bound:
+                    histogram["buckets"][i] += 1
+            for attr in _TOKEN_ATTRS:
+                if attrs.get(attr):
+                    self._count("tokens_total", {"stage": stage, "kind": attr[:-len("_tokens")]}, attrs[attr])
+            if "cache_hit" in attrs:
+                self._count("cache_lookups_total", {"stage": stage, "result": "hit" if attrs["cache_hit"] else "miss"})
+            if attrs.get("error"):
+                self._count("errors_total", {"stage": stage})
+            if "task" in attrs and "model" in attrs:
+                # Requests and spend per routing decision (see llm.routing)
+                route = {"stage": stage, "task": attrs["task"], "model": attrs["model"]}
+                self._count("routed_requests_total", route)
+                if attrs.get("cost_usd"):
+                    self._count("cost_usd_total", route, attrs["cost_usd"])
+
+    def set_gauge(self, metric: str, value: float) -> None:
+        """
+        Record the current value of a level, such as a queue depth.
+
+        Args:
+            metric (str): Gauge name
+            value (float): Current value
+        """
+        with self._lock:
+            self._gauges[metric] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get current metrics.
+
+        Returns:
+            Dict[str, Any]: 'stages' (count, mean and p95 estimate in ms), 'counters' and 'gauges'
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in self._histograms.items():
+                stages[stage] = {
+                    "count": histogram["count"],
+                    "mean_ms": round(histogram["sum"] / histogram["count"], 2),
+                    "p95_ms": self._bucket_quantile(histogram, 0.95),
+                }
+            counters = {
+                f"{metric}{{{','.join(f'{k}={v}' for k, v in labels)}}}": value
+                for (metric, labels), value in sorted(self._counters.items())
+            }
+            gauges = dict(sorted(self._gauges.items()))
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def _bucket_quantile(self, histogram: Dict[str, Any], quantile: float) -> Optional[float]:
+        # Upper bound of the first bucket holding the quantile (None if it lies past the last bucket)
+        target = histogram["count"] * quantile
+        for bound, count in zip(self.buckets_ms, histogram["buckets"]):
+            if count >= target:
+                return float(bound)
+        return None
+
+    def to_prometheus(self, prefix: str = "yt_llm") -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): Metric name prefix
+
+        Returns:
+            str: Exposition text
+        """
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Time spent in each pipeline stage.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets_ms, histogram["buckets"]):
+                    lines.append(
+                        f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {count}'
+                    )
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"] / 1000:.6f}')
+                lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+            emitted = set()
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric not in emitted:
+                    lines.append(f"# TYPE {prefix}_{metric} counter")
+                    emitted.add(metric)
+                rendered = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{prefix}_{metric}{{{rendered}}} {value:g}")
+
+            for metric, value in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {prefix}_{metric} gauge")
+                lines.append(f"{prefix}_{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+_registry = MetricsRegistry()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_recent_traces: deque = deque(maxlen=50)
+_export_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry.
+
+    Returns:
+        MetricsRegistry: Shared registry
+    """
+    return _registry
+
+
+def current_trace() -> Optional[Trace]:
+    """
+    Get the trace active in this context, if any.
+
+    Returns:
+        Optional[Trace]: Active trace
+    """
+    return _current_trace.get()
+
+
+def recent_traces() -> List[Dict[str, Any]]:
+    """
+    Get the most recently finished traces, newest last.
+
+    Returns:
+        List[Dict[str, Any]]: Serialized traces
+    """
+    return list(_recent_traces)
+
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[Trace]:
+    """
+    Collect the spans of one request.
+
+    Spans opened anywhere in this context (including map-reduce worker threads,
+    which inherit the context) are attached to the trace. The finished trace is kept
+    in recent_traces() and appended to METRICS_JSONL_PATH if that is set.
+
+    Args:
+        name (str): Request name, e.g. 'chat_turn'
+        **attrs: Extra fields stored on the trace
+
+    Yields:
+        Trace: The active trace
+    """
+    active = Trace(name, attrs)
+    token = _current_trace.set(active)
+    try:
+        yield active
+    finally:
+        _current_trace.reset(token)
+        active.finish()
+        record = active.to_dict()
+        _recent_traces.append(record)
+        if METRICS_JSONL_PATH:
+            export_jsonl(record, METRICS_JSONL_PATH)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Time a pipeline stage.
+
+    The yielded dict can be filled with attributes while the stage runs, e.g.
+    prompt_tokens, completion_tokens or cache_hit. Exceptions are recorded as an
+    'error' attribute and re-raised. Safe to hold open across generator yields.
+
+    Args:
+        name (str): Stage name, e.g. 'llm.complete'
+        **attrs: Initial attributes
+
+    Yields:
+        Dict[str, Any]: Mutable span attributes
+    """
+    active = _current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        _registry.observe(name, duration_ms, attrs)
+        if active is not None:
+            active.add(name, started, duration_ms, attrs)
+
+
+def export_jsonl(record: Dict[str, Any], path: str) -> None:
+    """
+    Append one trace as a JSON line.
+
+    Args:
+        record (Dict[str, Any]): Serialized trace
+        path (str): Output file
+    """
+    try:
+        with _export_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+    except OSError:
+        logger.exception("Could not write trace to %s", path)
+
+
+class ProfileResult:
+    """Output of a profiled request: the .prof file path and a text report of the top functions."""
+
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.report: str = ""
+
+
+@contextmanager
+def profile(enabled: bool = True, name: str = "request", limit: int = 25) -> Iterator[ProfileResult]:
+    """
+    Run a block under cProfile and dump the result.
+
+    Does nothing when disabled, so callers can wrap a request unconditionally and
+    flip the toggle at runtime. The .prof file (readable with pstats or snakeviz)
+    is written to PROFILE_DIR.
+
+    Args:
+        enabled (bool): Whether to profile
+        name (str): File name prefix
+        limit (int): Functions listed in the text report
+
+    Yields:
+        ProfileResult: Filled in when the block exits
+    """
+    result = ProfileResult()
+    if not enabled:
+        yield result
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        result.path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.prof")
+        profiler.dump_stats(result.path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(limit)
+        result.report = report.getvalue()
+        logger.info("Profile written to %s", result.path)
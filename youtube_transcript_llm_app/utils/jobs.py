@@ -0,0 +1,246 @@
+# Background job scheduler for per-video precomputation
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .instrumentation import get_registry, span
+
+logger = logging.getLogger(__name__)
+
+# Threads running background jobs, and videos whose finished jobs are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_MAX_KEYS = 64
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """
+    One background computation, identified by a key (e.g. a video ID) and a name.
+
+    Attributes:
+        key (str): Group the job belongs to
+        name (str): Job name, e.g. 'summary'
+        status (str): 'pending', 'running', 'done' or 'failed'
+        result: Return value once done
+        error (str, optional): Error message if failed
+    """
+
+    __slots__ = ("key", "name", "status", "result", "error", "submitted_at", "started_at", "finished_at", "_done")
+
+    def __init__(self, key: str, name: str):
+        self.key = key
+        self.name = name
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the job finishes.
+
+        Args:
+            timeout (float, optional): Seconds to wait at most
+
+        Returns:
+            bool: True if the job finished
+        """
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Describe the job for display.
+
+        Returns:
+            Dict[str, Any]: Name, status, error, and queue and run times in ms
+        """
+        now = time.monotonic()
+        started = self.started_at if self.started_at is not None else now
+        return {
+            "name": self.name,
+            "status": self.status,
+            "queued_ms": round((started - self.submitted_at) * 1000, 1),
+            "run_ms": round(((self.finished_at or now) - started) * 1000, 1) if self.started_at is not None else None,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """
+    Runs jobs on a thread pool, at most one per (key, name).
+
+    Submitting a job that is already queued, running or done returns the existing job,
+    so every rerun (and every session viewing the same video) can ask for the same
+    artifacts without duplicating work. A failed job stays failed, so a caller polling
+    for results stops, until it is explicitly retried with retry(). Finished jobs of
+    the least recently used keys are dropped beyond `max_keys`. Queue depth is
+    published as gauges and job durations as 'job.<name>' spans in the metrics
+    registry.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_keys: int = JOB_MAX_KEYS):
+        self.max_workers = max_workers
+        self.max_keys = max_keys
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, Dict[str, Job]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    def _publish(self) -> None:
+        # Called with the lock held
+        registry = get_registry()
+        registry.set_gauge("jobs_queued", self._queued)
+        registry.set_gauge("jobs_running", self._running)
+
+    def submit(self, key: str, name: str, fn: Callable, *args, **kwargs) -> Job:
+        """
+        Schedule fn(*args, **kwargs) unless the same job already exists.
+
+        Args:
+            key (str): Group, e.g. a video ID
+            name (str): Job name within the group
+            fn (Callable): Work to run on a background thread
+
+        Returns:
+            Job: The new or existing job (which may have failed)
+        """
+        return self._schedule(key, name, fn, args, kwargs, retry=False)
+
+    def retry(self, key: str, name: str, fn: Callable, *args, **kwargs) -> Job:
+        """
+        Schedule fn(*args, **kwargs) again if the job failed, otherwise behave like submit().
+
+        Args:
+            key (str): Group, e.g. a video ID
+            name (str): Job name within the group
+            fn (Callable): Work to run on a background thread
+
+        Returns:
+            Job: The new or existing job
+        """
+        return self._schedule(key, name, fn, args, kwargs, retry=True)
+
+    def _schedule(self, key: str, name: str, fn: Callable, args: tuple, kwargs: dict, retry: bool) -> Job:
+        with self._lock:
+            jobs = self._jobs.setdefault(key, {})
+            self._jobs.move_to_end(key)
+            job = jobs.get(name)
+            if job is not None and not (retry and job.status == FAILED):
+                return job
+            job = Job(key, name)
+            jobs[name] = job
+            self._queued += 1
+            self._publish()
+            self._evict()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="precompute")
+            executor = self._executor
+        executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _evict(self) -> None:
+        # Called with the lock held; keys with unfinished jobs are never dropped
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_keys:
+                break
+            if all(job.finished for job in self._jobs[key].values()):
+                del self._jobs[key]
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._publish()
+        job.started_at = time.monotonic()
+        job.status = RUNNING
+        try:
+            with span(f"job.{job.name}", queued_ms=round((job.started_at - job.submitted_at) * 1000, 1)):
+                job.result = fn(*args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            logger.exception("Background job %s for %s failed", job.name, job.key)
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._running -= 1
+                self._publish()
+            job._done.set()
+
+    def get(self, key: str, name: str) -> Optional[Job]:
+        """
+        Look up a job.
+
+        Args:
+            key (str): Group
+            name (str): Job name
+
+        Returns:
+            Optional[Job]: The job, if it was submitted and not evicted
+        """
+        with self._lock:
+            return self._jobs.get(key, {}).get(name)
+
+    def jobs(self, key: str) -> Dict[str, Job]:
+        """
+        Get all jobs of a group.
+
+        Args:
+            key (str): Group
+
+        Returns:
+            Dict[str, Job]: Jobs by name
+        """
+        with self._lock:
+            return dict(self._jobs.get(key, {}))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler counters.
+
+        Returns:
+            Dict[str, Any]: Queue depth, running jobs, workers and tracked keys
+        """
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "running": self._running,
+                "workers": self.max_workers,
+                "keys": len(self._jobs),
+            }
+
+
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    """
+    Get the process-wide job scheduler, shared by every session.
+
+    Returns:
+        JobScheduler: Shared scheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = JobScheduler()
+    return _scheduler
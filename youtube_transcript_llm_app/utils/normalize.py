@@ -0,0 +1,282 @@
+# Transcript text normalization: strip caption noise before it reaches the LLM
+import os
+import re
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from .instrumentation import span
+from .transcript import Transcript
+from .transcript_resolver import STATUS_NOT_FOUND, TranscriptResult
+
+RULE_MARKERS = "markers"
+RULE_FILLERS = "fillers"
+RULE_OVERLAPS = "overlaps"
+RULE_SENTENCES = "sentences"
+ALL_RULES = frozenset({RULE_MARKERS, RULE_FILLERS, RULE_OVERLAPS, RULE_SENTENCES})
+DEFAULT_RULES = frozenset({RULE_MARKERS, RULE_FILLERS, RULE_OVERLAPS})
+
+# Rules applied to every fetched transcript: a comma-separated list, 'all', or 'off'
+TRANSCRIPT_NORMALIZE = os.getenv("TRANSCRIPT_NORMALIZE", ",".join(sorted(DEFAULT_RULES)))
+
+# Longest rolling-caption overlap looked for, and the shortest one removed (unless the
+# whole segment repeats), so that a single coincidentally repeated word is kept
+MAX_OVERLAP_WORDS = 16
+MIN_OVERLAP_WORDS = 2
+# Sentence units end at punctuation, after this many words, or at a pause this long
+MAX_SENTENCE_WORDS = 40
+MAX_SENTENCE_GAP = 2.0
+# Shown instead of a transcript when nothing but caption noise was left
+NO_SPEECH_MESSAGE = "The captions for this video contain no speech (only markers such as [Music])."
+
+_MARKER_PATTERN = (
+    r"\[[^\]\x1f]{1,40}\]"  # [Music], [Applause], [Laughter], [inaudible], ...
+    r"|\((?:music|applause|laughter|laughs|cheering|inaudible|silence|crosstalk)\)"
+    r"|[♪♫]+"
+)
+_FILLER_PATTERN = r"\b(?:u+m+|u+h+|erm+|hmm+|mhm)\b[,.]?"
+# Base language codes whose filler words _FILLER_PATTERN matches. In other languages the
+# same spellings are real words (Portuguese "um", German "um"), so the rule is skipped
+FILLER_LANGUAGES = frozenset({"en"})
+# Joins segments for the removal pass; excluded from the bracketed-marker pattern
+_SEPARATOR = "\x1f"
+_SENTENCE_END = re.compile(r"[.!?…][\"')\]]*$")
+
+
+def parse_rules(value: str) -> FrozenSet[str]:
+    """
+    Parse a rule list such as TRANSCRIPT_NORMALIZE.
+
+    Args:
+        value (str): Comma-separated rule names, 'all', or 'off'/'none'/'' for no rules
+
+    Returns:
+        FrozenSet[str]: Known rule names (unknown names are ignored)
+    """
+    names = {name.strip().lower() for name in value.split(",") if name.strip()}
+    if "all" in names:
+        return ALL_RULES
+    return frozenset(names & ALL_RULES)
+
+
+@lru_cache(maxsize=16)
+def _removal_pattern(rules: FrozenSet[str]) -> Optional["re.Pattern"]:
+    # One alternation for every enabled removal rule, compiled once per rule set
+    parts = []
+    if RULE_MARKERS in rules:
+        parts.append(_MARKER_PATTERN)
+    if RULE_FILLERS in rules:
+        parts.append(_FILLER_PATTERN)
+    if not parts:
+        return None
+    # The lookahead lets the regex engine skip positions that cannot start any match
+    return re.compile(r"(?=[\[(♪♫uehm])(?:" + "|".join(parts) + ")", re.IGNORECASE)
+
+
+class Normalization:
+    """
+    A normalized transcript together with its source and what normalization saved.
+
+    Unit u of `transcript` was built from the original segments
+    sources[u]:sources[u + 1]. Original segments dropped entirely (e.g. a lone
+    '[Music]') belong to the range of the unit before them.
+
+    Attributes:
+        transcript (Transcript): Normalized transcript
+        original (Transcript): Transcript as fetched
+        sources (array): First original segment index of each unit, plus a final len(original)
+        rules (FrozenSet[str]): Rules that were applied
+    """
+
+    __slots__ = ("transcript", "original", "sources", "rules", "_token_counts")
+
+    def __init__(self, transcript: Transcript, original: Transcript, sources: array, rules: FrozenSet[str]):
+        self.transcript = transcript
+        self.original = original
+        self.sources = sources
+        self.rules = rules
+        self._token_counts: Optional[Tuple[int, int]] = None
+
+    def original_range(self, unit: int) -> Tuple[int, int]:
+        """
+        Get the original segments a normalized unit was built from.
+
+        Args:
+            unit (int): Index into the normalized transcript
+
+        Returns:
+            Tuple[int, int]: Half-open range of original segment indices
+        """
+        return self.sources[unit], self.sources[unit + 1]
+
+    def unit_for_original(self, index: int) -> int:
+        """
+        Find the normalized unit that holds (or absorbed) an original segment.
+
+        Args:
+            index (int): Original segment index
+
+        Returns:
+            int: Normalized unit index (0 if the segment precedes every unit)
+        """
+        return min(max(bisect_right(self.sources, index) - 1, 0), max(len(self.transcript) - 1, 0))
+
+    def report(self, count_tokens: Optional[Callable[[str], int]] = None) -> Dict[str, float]:
+        """
+        Summarize what normalization removed.
+
+        Args:
+            count_tokens (Callable, optional): Token counter; token figures are included
+                when given (and computed only once per transcript)
+
+        Returns:
+            Dict[str, float]: Segment and character counts before and after, plus
+                'tokens_before', 'tokens_after' and 'token_reduction' (a fraction) with count_tokens
+        """
+        report = {
+            "rules": ",".join(sorted(self.rules)),
+            "segments_before": len(self.original),
+            "segments_after": len(self.transcript),
+            "chars_before": len(self.original.text),
+            "chars_after": len(self.transcript.text),
+        }
+        if count_tokens is not None:
+            if self._token_counts is None:
+                self._token_counts = (count_tokens(self.original.text), count_tokens(self.transcript.text))
+            before, after = self._token_counts
+            report["tokens_before"] = before
+            report["tokens_after"] = after
+            report["token_reduction"] = round(1 - after / before, 4) if before else 0.0
+        return report
+
+    def nbytes(self) -> int:
+        return self.transcript.nbytes() + self.original.nbytes() + len(self.sources) * self.sources.itemsize
+
+
+def _overlap(tail: list, lowered: list) -> int:
+    # Length of the longest run of words that ends `tail` and starts `lowered`
+    first = lowered[0]
+    for size in range(min(len(tail), len(lowered)), 0, -1):
+        if size < MIN_OVERLAP_WORDS and size != len(lowered):
+            break
+        if tail[-size] == first and tail[-size:] == lowered[:size]:
+            return size
+    return 0
+
+
+def normalize_segments(segments: Iterable, rules: Optional[FrozenSet[str]] = None) -> Normalization:
+    """
+    Clean a transcript in a single pass over its segments.
+
+    Depending on `rules`: strips non-speech markers such as [Music] ('markers') and
+    English filler words ('fillers'), removes the words each rolling auto-caption repeats
+    from the previous one ('overlaps') and merges segments into sentence-level units
+    ('sentences'). Whitespace is always collapsed and empty segments dropped. Each
+    unit keeps the start time of its first segment and spans to the end of its last.
+
+    Args:
+        segments (Iterable): Transcript or segment dicts with 'text', 'start' and 'duration'
+        rules (FrozenSet[str], optional): Rules to apply (default: TRANSCRIPT_NORMALIZE)
+
+    Returns:
+        Normalization: Normalized transcript with the mapping back to the original
+    """
+    original = segments if isinstance(segments, Transcript) else Transcript.from_segments(segments)
+    rules = parse_rules(TRANSCRIPT_NORMALIZE) if rules is None else rules
+    removal = _removal_pattern(rules)
+    dedupe = RULE_OVERLAPS in rules
+    merge = RULE_SENTENCES in rules
+
+    # Output columns, built directly in Transcript's layout
+    starts = array("d")
+    durations = array("d")
+    offsets = array("I")
+    parts = []
+    sources = array("I")
+    position = 0
+    tail: list = []
+    pending = None  # [first original index, start, end, words] of the unit being built
+
+    def flush():
+        nonlocal position
+        first, start, end, words = pending
+        text = " ".join(words)
+        starts.append(start)
+        durations.append(max(end - start, 0.0))
+        offsets.append(position)
+        parts.append(text)
+        sources.append(first)
+        position += len(text) + 1
+
+    # Markers and fillers are removed with one regex pass over all segments, joined by a
+    # separator that no rule can match across
+    joined = _SEPARATOR.join(original.segment_text(index) for index in range(len(original)))
+    if removal is not None:
+        joined = removal.sub(" ", joined)
+    texts = joined.split(_SEPARATOR)
+    lowered_texts = joined.lower().split(_SEPARATOR) if dedupe else texts
+
+    for index in range(len(original)):
+        # split() without arguments also collapses runs of whitespace and newlines
+        words = texts[index].split()
+        if dedupe and words:
+            lowered = lowered_texts[index].split()
+            overlap = _overlap(tail, lowered)
+            words = words[overlap:]
+            tail = (tail + lowered[overlap:])[-MAX_OVERLAP_WORDS:]
+        if not words:
+            continue
+
+        start = original.starts[index]
+        end = start + original.durations[index]
+        if pending is not None and merge and start - pending[2] <= MAX_SENTENCE_GAP \
+                and not _SENTENCE_END.search(pending[3][-1]) and len(pending[3]) < MAX_SENTENCE_WORDS:
+            pending[2] = max(pending[2], end)
+            pending[3].extend(words)
+            continue
+        if pending is not None:
+            flush()
+        pending = [index, start, end, words]
+    if pending is not None:
+        flush()
+
+    offsets.append(position)
+    sources.append(len(original))
+    return Normalization(Transcript(starts, durations, offsets, " ".join(parts)), original, sources, rules)
+
+
+def normalize_result(result: TranscriptResult, rules: Optional[FrozenSet[str]] = None) -> TranscriptResult:
+    """
+    Normalize the transcript of a resolved result in place.
+
+    Args:
+        result (TranscriptResult): Result from resolve_transcript or the cache
+        rules (FrozenSet[str], optional): Rules to apply (default: TRANSCRIPT_NORMALIZE);
+            'overlaps' is skipped for manual caption tracks and 'fillers' for tracks
+            whose language is not in FILLER_LANGUAGES
+
+    Returns:
+        TranscriptResult: The same result; unchanged if it has no transcript, no rules
+            are enabled or it was normalized already. A transcript with no text left
+            (e.g. auto-captions made only of '[Music]' markers) becomes status 'not_found'
+    """
+    rules = parse_rules(TRANSCRIPT_NORMALIZE) if rules is None else rules
+    if result.is_generated is False:
+        # Only YouTube's automatic captions roll over; hand-made tracks do not repeat themselves
+        rules = rules - {RULE_OVERLAPS}
+    if (result.language_code or "").split("-")[0].lower() not in FILLER_LANGUAGES:
+        rules = rules - {RULE_FILLERS}
+    if result.transcript is not None and result.normalization is None and rules:
+        with span("transcript.normalize", rules=",".join(sorted(rules))) as attrs:
+            normalization = normalize_segments(result.transcript, rules)
+            attrs["segments_before"] = len(normalization.original)
+            attrs["segments_after"] = len(normalization.transcript)
+        result.transcript = normalization.transcript
+        result.normalization = normalization
+    if result.ok and result.transcript is not None and not result.transcript.text.strip():
+        # Nothing for the viewer or the LLM to work with
+        result.status = STATUS_NOT_FOUND
+        result.message = NO_SPEECH_MESSAGE
+        result.transcript = None
+    return result
@@ -0,0 +1,600 @@
+# Rate limiting, adaptive concurrency, retries and circuit breaking for outbound calls
+import contextvars
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Outcomes of a failed attempt, as decided by classify_error
+THROTTLED = "throttled"
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+_RETRYABLE_STATUS = {408, 409, 500, 502, 503, 504}
+# Exception class names treated as transient without importing the libraries that define them
+_THROTTLED_NAMES = {"RateLimitError", "TooManyRequests"}
+_RETRYABLE_NAMES = {
+    "APITimeoutError", "APIConnectionError", "InternalServerError",  # openai
+    "Timeout", "ConnectTimeout", "ReadTimeout", "ConnectionError", "ChunkedEncodingError",  # requests
+    "YouTubeRequestFailed",  # youtube_transcript_api
+    "TimeoutError", "ConnectionResetError",
+}
+
+
+class ResilienceError(Exception):
+    """Raised by the resilience layer itself rather than by the upstream service."""
+
+    def __init__(self, backend: str, message: str):
+        super().__init__(message)
+        self.backend = backend
+
+
+class CircuitOpenError(ResilienceError):
+    """The backend has been failing and calls are rejected until it cools down."""
+
+    def __init__(self, backend: str, retry_in: float):
+        super().__init__(backend, f"{backend} is temporarily unavailable; retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(ResilienceError, TimeoutError):
+    """The call could not complete (including waits and retries) within its deadline."""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # requests.Response is falsy for 4xx/5xx, so compare against None explicitly
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None) if response is not None else None
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Read the server's requested wait from an error, if it carries one.
+
+    Understands an explicit `retry_after` attribute and the Retry-After (seconds or
+    HTTP date) and retry-after-ms headers of the error's HTTP response.
+
+    Args:
+        error (BaseException): Error raised by an outbound call
+
+    Returns:
+        Optional[float]: Seconds to wait, or None
+    """
+    explicit = getattr(error, "retry_after", None)
+    if isinstance(explicit, (int, float)):
+        return max(0.0, float(explicit))
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) if response is not None else None
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Decide how the resilience layer treats a failed attempt.
+
+    Args:
+        error (BaseException): Error raised by an outbound call
+
+    Returns:
+        str: THROTTLED (back off and shrink concurrency), RETRYABLE (transient) or FATAL (give up)
+    """
+    status = _status_code(error)
+    name = type(error).__name__
+    if status == 429 or name in _THROTTLED_NAMES:
+        return THROTTLED
+    if status is not None:
+        return RETRYABLE if status in _RETRYABLE_STATUS else FATAL
+    if name in _RETRYABLE_NAMES or isinstance(error, (TimeoutError, ConnectionError)):
+        return RETRYABLE
+    return FATAL
+
+
+def call_with_timeout(fn: Callable[[], T], timeout: float) -> T:
+    """
+    Run a blocking call that has no timeout of its own, waiting at most `timeout` seconds.
+
+    The call runs on its own daemon thread. If it has not returned in time the caller gets
+    a TimeoutError, which Backend.call treats as retryable, and the thread is abandoned, so
+    a hung request no longer holds the caller's thread or its concurrency slot.
+
+    Args:
+        fn (Callable): Call to run
+        timeout (float): Seconds to wait for it
+
+    Returns:
+        The result of fn
+
+    Raises:
+        TimeoutError: If fn did not return within `timeout`
+        Exception: Whatever fn raised
+    """
+    done = threading.Event()
+    outcome: Dict[str, Any] = {}
+    # Run in a copy of the caller's context so the call stays attached to the caller's trace
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            outcome["result"] = context.run(fn)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=run, name="bounded-call", daemon=True).start()
+    if not done.wait(timeout):
+        raise TimeoutError(f"call did not return within {timeout:.1f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average with bursts of up to `burst`; rate <= 0 means unlimited."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for it if necessary.
+
+        Args:
+            deadline (float, optional): time.monotonic() value to give up at
+
+        Returns:
+            bool: False if the token would only be available after the deadline
+        """
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by about one slot per limit's worth of successes and
+    halves on throttling or timeouts (at most once per cooldown, so one burst of 429s
+    counts as a single congestion signal).
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32,
+                 decrease: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Wait for a free slot.
+
+        Args:
+            deadline (float, optional): time.monotonic() value to give up at
+
+        Returns:
+            bool: False if no slot freed up before the deadline
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    return False
+                self._cond.wait(timeout)
+            self.in_flight += 1
+            return True
+
+    def release(self, outcome: str) -> None:
+        """
+        Free a slot and adapt the limit.
+
+        Args:
+            outcome (str): 'success', THROTTLED, RETRYABLE or FATAL
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if outcome == "success":
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome in (THROTTLED, RETRYABLE) and now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_decrease = now
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and rejects calls for
+    `reset_timeout` seconds, then lets a single probe through (half-open) to test recovery.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Returns:
+            bool: False while the circuit is open (or a half-open probe is already running)
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.retry_in() > 0:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit opened after %d consecutive failures", self._failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class Backend:
+    """
+    Resilience policy for one upstream service.
+
+    call() runs an operation through, in order: the token bucket, the adaptive
+    concurrency limit and the circuit breaker, retrying transient failures with
+    jittered exponential backoff (never shorter than the server's Retry-After) until
+    the attempts or the call's deadline run out.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: Optional[float] = None,
+        concurrency: int = 8,
+        max_concurrency: int = 32,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        deadline: float = 60.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        classify: Callable[[BaseException], str] = classify_error,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(concurrency, maximum=max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.classify = classify
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0, "successes": 0, "retries": 0, "throttled": 0, "failures": 0,
+            "circuit_rejections": 0, "deadline_exceeded": 0,
+        }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def backoff(self, attempt: int, server_delay: Optional[float] = None) -> float:
+        """
+        Delay before the next attempt: full jitter over an exponential ceiling, raised to
+        the server's Retry-After (plus a little jitter so waiting clients do not align).
+
+        Args:
+            attempt (int): Number of the attempt that just failed (1-based)
+            server_delay (float, optional): Retry-After from the server
+
+        Returns:
+            float: Seconds to sleep
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if server_delay is not None:
+            delay = max(delay, server_delay + random.uniform(0, self.base_delay / 2))
+        return delay
+
+    def _deadline_error(self, deadline: float, cause: Optional[BaseException] = None) -> DeadlineExceeded:
+        self._count("deadline_exceeded")
+        detail = f" (last error: {cause})" if cause is not None else ""
+        return DeadlineExceeded(self.name, f"{self.name} call did not finish within {deadline:.1f}s{detail}")
+
+    def call(self, fn: Callable[[float], T], deadline: Optional[float] = None) -> T:
+        """
+        Run fn with rate limiting, adaptive concurrency, retries and circuit breaking.
+
+        Args:
+            fn (Callable): Called as fn(timeout) with the seconds left before the deadline;
+                it should pass that on as its own request timeout
+            deadline (float, optional): Seconds for the whole call including retries;
+                defaults to the backend's deadline
+
+        Returns:
+            The result of fn
+
+        Raises:
+            CircuitOpenError: If the backend's circuit is open
+            DeadlineExceeded: If waiting or retrying would overrun the deadline
+            Exception: The last error from fn if it is not retryable or attempts ran out
+        """
+        result, _ = self._call(fn, deadline, hold=False)
+        return result
+
+    def stream(self, fn: Callable[[float], Iterable[T]], deadline: Optional[float] = None) -> "HeldStream":
+        """
+        Open a streamed response like call(), keeping its concurrency slot until the stream is done.
+
+        Only opening the stream is retried. The slot is released when the returned iterator
+        is exhausted or closed, with the outcome of the whole stream.
+
+        Args:
+            fn (Callable): Called as fn(timeout) and returns an iterable response
+            deadline (float, optional): Seconds for opening the stream including retries;
+                defaults to the backend's deadline
+
+        Returns:
+            HeldStream: Iterator over the response
+
+        Raises:
+            CircuitOpenError: If the backend's circuit is open
+            DeadlineExceeded: If waiting or retrying would overrun the deadline
+            Exception: The last error from fn if it is not retryable or attempts ran out
+        """
+        result, deadline_at = self._call(fn, deadline, hold=True)
+        return HeldStream(self, result, deadline_at)
+
+    def _call(self, fn: Callable[[float], T], deadline: Optional[float], hold: bool) -> Tuple[T, float]:
+        # With hold, a successful call keeps its concurrency slot for the caller to release
+        budget = self.deadline if deadline is None else deadline
+        deadline_at = time.monotonic() + budget
+        self._count("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.bucket.acquire(deadline_at) or not self.limiter.acquire(deadline_at):
+                raise self._deadline_error(budget)
+            if not self.breaker.allow():
+                self.limiter.release(FATAL)
+                self._count("circuit_rejections")
+                raise CircuitOpenError(self.name, self.breaker.retry_in())
+
+            try:
+                result = fn(max(0.001, deadline_at - time.monotonic()))
+            except Exception as e:
+                kind = self.classify(e)
+                self.limiter.release(kind)
+                if kind == FATAL:
+                    # The service answered; the request itself was bad
+                    self.breaker.record_success()
+                    self._count("failures")
+                    raise
+                self.breaker.record_failure()
+                self._count("throttled" if kind == THROTTLED else "failures")
+                if attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt, retry_after(e))
+                if time.monotonic() + delay >= deadline_at:
+                    raise self._deadline_error(budget, e) from e
+                logger.info("%s attempt %d failed (%s); retrying in %.2fs", self.name, attempt, e, delay)
+                self._count("retries")
+                time.sleep(delay)
+                continue
+
+            if not hold:
+                self.limiter.release("success")
+            self.breaker.record_success()
+            self._count("successes")
+            return result, deadline_at
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get counters and the current limiter and breaker state.
+
+        Returns:
+            Dict[str, Any]: Counters plus 'concurrency_limit', 'in_flight' and 'circuit'
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["concurrency_limit"] = round(self.limiter.limit, 2)
+        stats["in_flight"] = self.limiter.in_flight
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+class HeldStream:
+    """
+    Streamed response that holds its backend's concurrency slot until it is exhausted or closed.
+
+    The slot is released with the outcome of the whole stream: an error while reading is
+    classified like a failed call, and a stream still running past the call's deadline
+    counts as a timeout, so slow streams shrink the concurrency limit like slow calls do.
+    """
+
+    def __init__(self, backend: Backend, stream: Iterable, deadline_at: float):
+        self._backend = backend
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._deadline_at = deadline_at
+        self._held = True
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._release(None)
+            raise
+        except Exception as e:
+            self._release(e)
+            raise
+
+    def close(self) -> None:
+        """Close the underlying response and free the slot."""
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._release(None)
+
+    def __del__(self):
+        self._release(None)
+
+    def _release(self, error: Optional[BaseException]) -> None:
+        if not self._held:
+            return
+        self._held = False
+        backend = self._backend
+        if error is not None:
+            outcome = backend.classify(error)
+            if outcome != FATAL:
+                backend.breaker.record_failure()
+            backend._count("failures")
+        elif time.monotonic() > self._deadline_at:
+            outcome = RETRYABLE
+        else:
+            outcome = "success"
+        backend.limiter.release(outcome)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _default_settings(name: str) -> Dict[str, Any]:
+    # <NAME>_RATE_LIMIT (calls/s, 0 = unlimited), <NAME>_RATE_BURST, <NAME>_CONCURRENCY,
+    # <NAME>_DEADLINE (s) and <NAME>_MAX_ATTEMPTS. OpenAI's own limits are enforced
+    # through 429s and Retry-After; YouTube is paced to stay clear of its captcha wall
+    prefix = name.upper()
+    rate, burst, concurrency, deadline = {
+        "openai": (0.0, 1.0, 8, 90.0),
+        "youtube": (5.0, 20.0, 4, 20.0),
+    }.get(name, (0.0, 1.0, 8, 60.0))
+    return {
+        "rate": _env_float(f"{prefix}_RATE_LIMIT", rate),
+        "burst": _env_float(f"{prefix}_RATE_BURST", burst),
+        "concurrency": int(_env_float(f"{prefix}_CONCURRENCY", concurrency)),
+        "deadline": _env_float(f"{prefix}_DEADLINE", deadline),
+        "max_attempts": int(_env_float(f"{prefix}_MAX_ATTEMPTS", 4)),
+    }
+
+
+_backends: Dict[str, Backend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str, **kwargs) -> Backend:
+    """
+    Get (or create) the process-wide policy for a backend such as 'openai' or 'youtube'.
+
+    Args:
+        name (str): Backend name
+        **kwargs: Backend options, used only when the backend is first created
+            (defaults come from <NAME>_RATE_LIMIT, <NAME>_CONCURRENCY, <NAME>_DEADLINE
+            and <NAME>_MAX_ATTEMPTS)
+
+    Returns:
+        Backend: Shared backend
+    """
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            backend = Backend(name, **{**_default_settings(name), **kwargs})
+            _backends[name] = backend
+        return backend
+
+
+def set_backend(backend: Backend) -> None:
+    """
+    Replace the process-wide policy for backend.name.
+
+    Args:
+        backend (Backend): New backend
+    """
+    with _backends_lock:
+        _backends[backend.name] = backend
+
+
+def backend_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get stats for every backend created so far.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Stats keyed by backend name
+    """
+    with _backends_lock:
+        backends = list(_backends.values())
+    return {backend.name: backend.stats() for backend in backends}
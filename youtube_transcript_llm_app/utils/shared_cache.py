@@ -0,0 +1,247 @@
+# Process-wide in-memory cache shared by all Streamlit sessions
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class _Flight:
+    """A computation in progress that other callers can wait on."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _size_of(value: Any) -> int:
+    if hasattr(value, "nbytes"):
+        # Compact containers such as utils.transcript.Transcript report their own size
+        return value.nbytes()
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(item) for item in value) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sum(_size_of(k) + _size_of(v) for k, v in value.items()) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """
+    Bounded LRU cache with single-flight deduplication.
+
+    Concurrent get_or_compute calls for the same key run the compute function once;
+    the other callers block until that one result is ready and then share it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, _Flight] = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a value without computing it.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None if absent or expired
+        """
+        with self._lock:
+            value = self._lookup(key)
+        return None if value is _MISSING else value
+
+    def _lookup(self, key: Hashable) -> Any:
+        # Caller must hold the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, size, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self._remove(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, computing it at most once across concurrent callers.
+
+        Args:
+            key: Cache key
+            compute (Callable): Zero-argument function producing the value
+            should_cache (Callable, optional): Predicate deciding whether a result is stored
+                (e.g. to skip transient error messages). Waiters still share the result.
+
+        Returns:
+            The cached or freshly computed value
+
+        Raises:
+            Exception: Whatever compute raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self._stats["hits"] += 1
+                return value
+
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                self._stats["misses"] += 1
+                flight = _Flight()
+                self._in_flight[key] = flight
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+                del self._in_flight[key]
+            flight.done.set()
+            raise
+
+        with self._lock:
+            if should_cache is None or should_cache(flight.value):
+                self._store(key, flight.value)
+            del self._in_flight[key]
+        flight.done.set()
+        return flight.value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value directly.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        # Caller must hold the lock
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, size, expires_at)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller must hold the lock
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop a single key.
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        'coalesced' is the number of duplicate computations avoided by waiting on an
+        in-flight one.
+
+        Returns:
+            Dict[str, Any]: Counters plus 'entries', 'bytes' and 'in_flight'
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["in_flight"] = len(self._in_flight)
+        return stats
+
+
+_registry: Dict[str, SharedCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_shared_cache(name: str, **kwargs) -> SharedCache:
+    """
+    Get (or create) the named process-wide cache.
+
+    Args:
+        name (str): Cache name, e.g. 'transcripts', 'titles' or 'llm'
+        **kwargs: SharedCache options, used only when the cache is first created
+
+    Returns:
+        SharedCache: The shared cache instance
+    """
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            cache = SharedCache(name, **kwargs)
+            _registry[name] = cache
+        return cache
+
+
+def shared_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get counters for every named cache.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Stats keyed by cache name
+    """
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.stats() for cache in caches}
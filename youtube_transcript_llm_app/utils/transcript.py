@@ -0,0 +1,319 @@
+# Compact columnar representation of a timestamped transcript
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+_MAGIC = b"YTTR"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBII")  # magic, version, flags, segment count, payload length
+_FLAG_ZLIB = 1
+
+
+class Transcript:
+    """
+    Timestamped transcript stored as parallel arrays instead of a list of dicts.
+
+    Segment start times and durations live in array('d') columns and all segment text
+    lives in one string, with array('I') character offsets marking where each segment
+    begins. Segments are joined with single spaces, so `text` equals the output of
+    get_transcript for the same segments.
+
+    Iterating (or indexing) yields plain {'text', 'start', 'duration'} dicts, so a
+    Transcript can be passed anywhere a segment list from get_youtube_transcript is expected.
+    """
+
+    __slots__ = ("starts", "durations", "offsets", "text")
+
+    def __init__(self, starts: array, durations: array, offsets: array, text: str):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Dict]) -> "Transcript":
+        """
+        Build a Transcript from segment dicts.
+
+        Args:
+            segments (Iterable[Dict]): Segments with 'text', 'start' and 'duration'
+
+        Returns:
+            Transcript: Compact transcript
+        """
+        starts = array("d")
+        durations = array("d")
+        offsets = array("I")
+        parts = []
+        position = 0
+        for segment in segments:
+            text = segment["text"]
+            starts.append(float(segment.get("start", 0.0)))
+            durations.append(float(segment.get("duration", 0.0)))
+            offsets.append(position)
+            parts.append(text)
+            position += len(text) + 1
+        # Sentinel so segment i always spans offsets[i]:offsets[i + 1] - 1
+        offsets.append(position)
+        return cls(starts, durations, offsets, " ".join(parts))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment_text(self, index: int) -> str:
+        """
+        Get the text of one segment.
+
+        Args:
+            index (int): Segment index
+
+        Returns:
+            str: Segment text
+        """
+        return self.text[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return {"text": self.segment_text(index), "start": self.starts[index], "duration": self.durations[index]}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_segments(self) -> List[Dict]:
+        """
+        Expand back into the list-of-dicts form returned by get_youtube_transcript.
+
+        Returns:
+            List[Dict]: Segments with 'text', 'start' and 'duration'
+        """
+        return list(self)
+
+    @property
+    def end(self) -> float:
+        """End time of the last segment, in seconds."""
+        if not len(self):
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    def index_at_time(self, seconds: float) -> int:
+        """
+        Find the segment playing at a given time.
+
+        Args:
+            seconds (float): Time offset in seconds
+
+        Returns:
+            int: Index of the last segment starting at or before the time (0 if before the first)
+        """
+        return max(bisect_right(self.starts, seconds) - 1, 0)
+
+    def index_at_offset(self, char_offset: int) -> int:
+        """
+        Find the segment containing a character offset into `text`.
+
+        Args:
+            char_offset (int): Offset into the joined text
+
+        Returns:
+            int: Segment index
+        """
+        return min(max(bisect_right(self.offsets, char_offset) - 1, 0), max(len(self) - 1, 0))
+
+    def time_at_offset(self, char_offset: int) -> float:
+        """
+        Map a character offset in `text` back to the start time of its segment.
+
+        Args:
+            char_offset (int): Offset into the joined text
+
+        Returns:
+            float: Start time in seconds
+        """
+        if not len(self):
+            return 0.0
+        return self.starts[self.index_at_offset(char_offset)]
+
+    def range_indices(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        Get the half-open range of segments overlapping a time window.
+
+        Args:
+            start (float): Window start in seconds
+            end (float): Window end in seconds
+
+        Returns:
+            Tuple[int, int]: (first, last + 1) segment indices
+        """
+        first = self.index_at_time(start)
+        if len(self) and self.starts[first] + self.durations[first] <= start:
+            first += 1
+        # Segments starting at or after `end` are outside the window
+        last = bisect_left(self.starts, end, lo=first)
+        return first, max(last, first)
+
+    def text_between(self, start: float, end: float) -> str:
+        """
+        Get the text spoken between two times.
+
+        Args:
+            start (float): Window start in seconds
+            end (float): Window end in seconds
+
+        Returns:
+            str: Text of every segment overlapping the window
+        """
+        first, last = self.range_indices(start, end)
+        if first >= last:
+            return ""
+        return self.text[self.offsets[first]:self.offsets[last] - 1]
+
+    def slice(self, first: int, last: int) -> "Transcript":
+        """
+        Get a sub-transcript by segment index range.
+
+        Args:
+            first (int): First segment index
+            last (int): One past the last segment index
+
+        Returns:
+            Transcript: Segments first..last-1
+        """
+        base = self.offsets[first] if first < len(self.offsets) else 0
+        offsets = array("I", (offset - base for offset in self.offsets[first:last + 1]))
+        text = self.text[self.offsets[first]:self.offsets[last] - 1] if last > first else ""
+        return Transcript(self.starts[first:last], self.durations[first:last], offsets, text)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the arrays and text.
+
+        Returns:
+            int: Size in bytes
+        """
+        return (
+            self.starts.itemsize * len(self.starts)
+            + self.durations.itemsize * len(self.durations)
+            + self.offsets.itemsize * len(self.offsets)
+            + sys.getsizeof(self.text)
+        )
+
+    def to_bytes(self, compress: bool = True) -> bytes:
+        """
+        Serialize to a compact little-endian binary form.
+
+        Args:
+            compress (bool): zlib-compress the payload
+
+        Returns:
+            bytes: Serialized transcript
+        """
+        columns = [array("d", self.starts), array("d", self.durations), array("I", self.offsets)]
+        if sys.byteorder == "big":
+            for column in columns:
+                column.byteswap()
+        payload = b"".join(column.tobytes() for column in columns) + self.text.encode("utf-8")
+        flags = 0
+        if compress:
+            payload = zlib.compress(payload, 6)
+            flags |= _FLAG_ZLIB
+        return _HEADER.pack(_MAGIC, _VERSION, flags, len(self), len(payload)) + payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Transcript":
+        """
+        Deserialize a transcript produced by to_bytes.
+
+        Args:
+            data (bytes): Serialized transcript
+
+        Returns:
+            Transcript: Decoded transcript
+
+        Raises:
+            ValueError: If the data is not a serialized transcript
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Data too short to be a serialized transcript")
+        magic, version, flags, count, length = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a serialized transcript (bad magic or version)")
+        payload = data[_HEADER.size:_HEADER.size + length]
+        if flags & _FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+
+        starts, durations, offsets = array("d"), array("d"), array("I")
+        position = 0
+        for column, size in ((starts, count), (durations, count), (offsets, count + 1)):
+            end = position + column.itemsize * size
+            column.frombytes(payload[position:end])
+            position = end
+        if sys.byteorder == "big":
+            for column in (starts, durations, offsets):
+                column.byteswap()
+        return cls(starts, durations, offsets, payload[position:].decode("utf-8"))
+
+
+def as_transcript(segments) -> Optional[Transcript]:
+    """
+    Convert a segment list to a Transcript, passing Transcripts and None through.
+
+    Args:
+        segments (Union[List[Dict], Transcript, None]): Segments to convert
+
+    Returns:
+        Optional[Transcript]: Compact transcript, or None
+    """
+    if segments is None or isinstance(segments, Transcript):
+        return segments
+    return Transcript.from_segments(segments)
+
+
+def format_timestamp(seconds: float) -> str:
+    """
+    Format a time offset as M:SS or H:MM:SS.
+
+    Args:
+        seconds (float): Offset in seconds
+
+    Returns:
+        str: Formatted timestamp
+    """
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """
+    Parse a time offset written as seconds, M:SS or H:MM:SS.
+
+    Args:
+        value (str): Timestamp text
+
+    Returns:
+        Optional[float]: Offset in seconds, or None if the text is not a timestamp
+    """
+    parts = value.strip().split(":")
+    if not 1 <= len(parts) <= 3:
+        return None
+    try:
+        numbers = [float(part) for part in parts]
+    except ValueError:
+        return None
+    # Also rejects 'nan' and 'inf', which float() accepts
+    if not all(0 <= number < float("inf") for number in numbers):
+        return None
+    seconds = 0.0
+    for number in numbers:
+        seconds = seconds * 60 + number
+    return seconds
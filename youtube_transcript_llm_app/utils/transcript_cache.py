@@ -0,0 +1,300 @@
+# Persistent on-disk cache for YouTube transcripts
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Default settings, overridable through environment variables
+DEFAULT_CACHE_PATH = os.getenv(
+    "TRANSCRIPT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "youtube_transcript_llm", "transcripts.sqlite3")
+)
+DEFAULT_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_NEGATIVE_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_NEGATIVE_TTL", 3600))
+DEFAULT_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", 2000))
+DEFAULT_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Kinds of values stored in the cache
+KIND_TEXT = "text"
+KIND_SEGMENTS = "segments"
+KIND_RESOLVED = "resolved"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    is_error INTEGER NOT NULL DEFAULT 0,
+    error_type TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts (last_access);
+"""
+
+
+class CacheEntry:
+    """
+    A single cached value.
+
+    Attributes:
+        value: Joined transcript text, list of segments, or the error message for negative entries.
+        is_error (bool): True if this is a cached failure (negative entry).
+        error_type (str, optional): Short name of the failure, e.g. 'disabled' or 'not_found'.
+    """
+
+    __slots__ = ("value", "is_error", "error_type")
+
+    def __init__(self, value: Any, is_error: bool = False, error_type: Optional[str] = None):
+        self.value = value
+        self.is_error = is_error
+        self.error_type = error_type
+
+
+class TranscriptCache:
+    """
+    SQLite-backed transcript cache with TTL expiry, LRU eviction and negative caching.
+
+    Entries are keyed by video ID, preferred language list and kind ('text', 'segments' or 'resolved').
+    The cache is bounded both by number of entries and total payload size; once either bound
+    is exceeded, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {"hits": 0, "misses": 0, "negative_hits": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+    @staticmethod
+    def make_key(video_id: str, languages: Optional[List[str]], kind: str) -> str:
+        """
+        Build the cache key for a video, language list and value kind.
+
+        Args:
+            video_id (str): YouTube video ID
+            languages (List[str], optional): Preferred language codes, in order
+            kind (str): KIND_TEXT, KIND_SEGMENTS or KIND_RESOLVED
+
+        Returns:
+            str: Cache key
+        """
+        return f"{kind}:{video_id}:{','.join(languages or ['en'])}"
+
+    def _connect(self) -> sqlite3.Connection:
+        # Open lazily so importing the module never touches the filesystem
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, video_id: str, languages: Optional[List[str]], kind: str) -> Optional[CacheEntry]:
+        """
+        Look up a cached transcript.
+
+        Args:
+            video_id (str): YouTube video ID
+            languages (List[str], optional): Preferred language codes
+            kind (str): KIND_TEXT, KIND_SEGMENTS or KIND_RESOLVED
+
+        Returns:
+            Optional[CacheEntry]: The cached entry, or None on a miss or expired entry
+        """
+        key = self.make_key(video_id, languages, kind)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, is_error, error_type, expires_at FROM transcripts WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            payload, is_error, error_type, expires_at = row
+            if expires_at < now:
+                conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+                conn.commit()
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            if is_error:
+                self._stats["negative_hits"] += 1
+            else:
+                self._stats["hits"] += 1
+
+        return CacheEntry(json.loads(payload), bool(is_error), error_type)
+
+    def set(self, video_id: str, languages: Optional[List[str]], kind: str, value: Any) -> None:
+        """
+        Store a successfully fetched transcript.
+
+        Args:
+            video_id (str): YouTube video ID
+            languages (List[str], optional): Preferred language codes
+            kind (str): KIND_TEXT, KIND_SEGMENTS or KIND_RESOLVED
+            value: Transcript text or list of segment dicts
+        """
+        self._put(self.make_key(video_id, languages, kind), value, None, self.ttl)
+
+    def set_negative(
+        self,
+        video_id: str,
+        languages: Optional[List[str]],
+        kind: str,
+        error_type: str,
+        message: str,
+    ) -> None:
+        """
+        Remember that a transcript is not available, so repeat lookups skip the network.
+
+        Args:
+            video_id (str): YouTube video ID
+            languages (List[str], optional): Preferred language codes
+            kind (str): KIND_TEXT, KIND_SEGMENTS or KIND_RESOLVED
+            error_type (str): Short name of the failure, e.g. 'disabled' or 'not_found'
+            message (str): Message to hand back on a cache hit
+        """
+        self._put(self.make_key(video_id, languages, kind), message, error_type, self.negative_ttl)
+
+    def _put(self, key: str, value: Any, error_type: Optional[str], ttl: float) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(key, payload, is_error, error_type, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, payload, int(error_type is not None), error_type, size, now, now + ttl, now)
+            )
+            self._stats["writes"] += 1
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Drop expired rows first, then least recently used rows until both bounds hold
+        cursor = conn.execute("DELETE FROM transcripts WHERE expires_at < ?", (time.time(),))
+        self._stats["evictions"] += max(cursor.rowcount, 0)
+
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM transcripts ORDER BY last_access ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM transcripts WHERE key = ?", victims)
+        self._stats["evictions"] += len(victims)
+
+    def invalidate(self, video_id: str) -> None:
+        """
+        Remove every cached entry for a video.
+
+        Args:
+            video_id (str): YouTube video ID
+        """
+        with self._lock:
+            conn = self._connect()
+            for kind in (KIND_TEXT, KIND_SEGMENTS, KIND_RESOLVED):
+                conn.execute("DELETE FROM transcripts WHERE key LIKE ?", (f"{kind}:{video_id}:%",))
+            conn.commit()
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM transcripts")
+            conn.commit()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters and current cache size.
+
+        Returns:
+            Dict[str, Any]: Counters plus 'entries', 'bytes' and 'hit_rate'
+        """
+        with self._lock:
+            conn = self._connect()
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["entries"] = count
+        stats["bytes"] = total
+        stats["hit_rate"] = (stats["hits"] + stats["negative_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache: Optional[TranscriptCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> Optional[TranscriptCache]:
+    """
+    Get the process-wide transcript cache.
+
+    Set TRANSCRIPT_CACHE_DISABLED=1 to turn caching off.
+
+    Returns:
+        Optional[TranscriptCache]: The shared cache, or None if caching is disabled
+    """
+    global _default_cache
+    if os.getenv("TRANSCRIPT_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = TranscriptCache()
+    return _default_cache
+
+
+def set_transcript_cache(cache: Optional[TranscriptCache]) -> None:
+    """
+    Replace the process-wide transcript cache (e.g. with an in-memory one for tests).
+
+    Args:
+        cache (TranscriptCache, optional): New cache instance
+    """
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
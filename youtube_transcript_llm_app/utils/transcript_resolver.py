@@ -0,0 +1,370 @@
+# Transcript resolution: list a video's caption tracks once, rank them and fetch the best
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+from typing import Any, Dict, List, Optional
+
+from .instrumentation import span
+from .resilience import call_with_timeout, get_backend
+from .shared_cache import SharedCache, get_shared_cache
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_DISABLED = "disabled"
+STATUS_NOT_FOUND = "not_found"
+STATUS_UNAVAILABLE = "unavailable"
+STATUS_ERROR = "error"
+
+# Messages returned in place of transcript text by get_transcript, by status
+STATUS_MESSAGES = {
+    STATUS_DISABLED: "Transcripts are disabled for this video.",
+    STATUS_NOT_FOUND: "No transcript available for this video. The creator may not have added captions.",
+    STATUS_UNAVAILABLE: "The video is unavailable. It might be private or removed.",
+}
+
+# Track listings hold signed caption URLs, so they are only reused for a limited time
+TRACK_LISTING_TTL = float(os.getenv("TRANSCRIPT_LISTING_TTL", 1800))
+# Fetch the runner-up track in parallel if the best one has not arrived after this many seconds
+HEDGE_FETCH = os.getenv("TRANSCRIPT_HEDGE", "").lower() in ("1", "true", "yes")
+HEDGE_DELAY = float(os.getenv("TRANSCRIPT_HEDGE_DELAY", 0.5))
+# Candidates tried before giving up
+MAX_FETCH_ATTEMPTS = 3
+
+
+class TranscriptResult:
+    """
+    Outcome of resolving a video's transcript.
+
+    Attributes:
+        video_id (str): YouTube video ID
+        status (str): One of 'ok', 'disabled', 'not_found', 'unavailable' or 'error'
+        transcript (Transcript, optional): Timestamped transcript when status is 'ok'
+        language_code (str, optional): Language of the returned transcript
+        is_generated (bool, optional): True for YouTube's automatic captions
+        translated_from (str, optional): Source language code if YouTube translated the track
+        message (str): Human-readable explanation when status is not 'ok'
+        normalization (Normalization, optional): Set when `transcript` has been normalized;
+            holds the transcript as fetched and the mapping back to its segments
+    """
+
+    __slots__ = ("video_id", "status", "transcript", "language_code", "is_generated", "translated_from", "message",
+                 "normalization")
+
+    def __init__(
+        self,
+        video_id: str,
+        status: str,
+        transcript: Optional[Transcript] = None,
+        language_code: Optional[str] = None,
+        is_generated: Optional[bool] = None,
+        translated_from: Optional[str] = None,
+        message: str = "",
+    ):
+        self.video_id = video_id
+        self.status = status
+        self.transcript = transcript
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.translated_from = translated_from
+        self.message = message or STATUS_MESSAGES.get(status, "")
+        self.normalization = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+    @property
+    def text(self) -> str:
+        """Joined transcript text, or the status message if there is no transcript."""
+        return self.transcript.text if self.transcript is not None else self.message
+
+    def nbytes(self) -> int:
+        if self.normalization is not None:
+            return self.normalization.nbytes() + len(self.message)
+        return (self.transcript.nbytes() if self.transcript is not None else 0) + len(self.message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize a successful result for the persistent transcript cache.
+
+        The transcript as fetched is stored, so normalization settings can change
+        without invalidating the cache.
+
+        Returns:
+            Dict[str, Any]: Segments plus track metadata
+        """
+        transcript = self.normalization.original if self.normalization is not None else self.transcript
+        return {
+            "segments": transcript.to_segments() if transcript is not None else [],
+            "language_code": self.language_code,
+            "is_generated": self.is_generated,
+            "translated_from": self.translated_from,
+        }
+
+    @classmethod
+    def from_dict(cls, video_id: str, data: Dict[str, Any]) -> "TranscriptResult":
+        return cls(
+            video_id,
+            STATUS_OK,
+            Transcript.from_segments(data["segments"]),
+            data.get("language_code"),
+            data.get("is_generated"),
+            data.get("translated_from"),
+        )
+
+    def __repr__(self) -> str:
+        return f"TranscriptResult({self.video_id!r}, {self.status!r}, language_code={self.language_code!r})"
+
+
+class Candidate:
+    """A caption track to fetch, optionally machine-translated into another language."""
+
+    __slots__ = ("track", "translate_to")
+
+    def __init__(self, track, translate_to: Optional[str] = None):
+        self.track = track
+        self.translate_to = translate_to
+
+    @property
+    def language_code(self) -> str:
+        return self.translate_to or self.track.language_code
+
+    def fetch(self) -> List[Dict]:
+        """
+        Download the track's segments (one round trip).
+
+        Returns:
+            List[Dict]: Segments with 'text', 'start' and 'duration'
+        """
+        track = self.track.translate(self.translate_to) if self.translate_to else self.track
+        # youtube_transcript_api sets no request timeout, so the deadline is enforced around the call
+        return get_backend("youtube").call(lambda remaining: call_with_timeout(track.fetch, remaining))
+
+    def __repr__(self) -> str:
+        kind = "generated" if self.track.is_generated else "manual"
+        suffix = f"->{self.translate_to}" if self.translate_to else ""
+        return f"Candidate({self.track.language_code}{suffix}, {kind})"
+
+
+def _base_language(code: str) -> str:
+    return code.split("-")[0].lower()
+
+
+def rank_tracks(tracks: List[Any], languages: List[str], allow_fallback: bool = True) -> List[Candidate]:
+    """
+    Order caption tracks by how well they match the preferred languages.
+
+    For each preferred language in turn: manual tracks before auto-generated ones,
+    exact codes before regional variants (e.g. 'en-GB' for 'en'). With allow_fallback,
+    tracks translatable into the first preferred language follow, then any other track.
+
+    Args:
+        tracks (List): Track objects from youtube_transcript_api's TranscriptList
+        languages (List[str]): Preferred language codes, most preferred first
+        allow_fallback (bool): Include translations and other-language tracks
+
+    Returns:
+        List[Candidate]: Candidates, best first
+    """
+    manual_first = sorted(tracks, key=lambda track: track.is_generated)
+    ranked = []
+    seen = set()
+
+    def add(track, translate_to=None):
+        key = (id(track), translate_to)
+        if key not in seen:
+            seen.add(key)
+            ranked.append(Candidate(track, translate_to))
+
+    for code in languages:
+        for track in manual_first:
+            if track.language_code == code:
+                add(track)
+        for track in manual_first:
+            if _base_language(track.language_code) == _base_language(code):
+                add(track)
+
+    if allow_fallback and languages:
+        target = languages[0]
+        for track in manual_first:
+            targets = {language["language_code"] for language in track.translation_languages}
+            if track.is_translatable and target in targets:
+                add(track, target)
+        for track in manual_first:
+            add(track)
+    return ranked
+
+
+def get_track_listing_cache() -> SharedCache:
+    """
+    Get the process-wide cache of track listings, keyed by video ID.
+
+    Returns:
+        SharedCache: The 'track_listings' cache
+    """
+    return get_shared_cache("track_listings", max_entries=1024, ttl=TRACK_LISTING_TTL)
+
+
+def list_tracks(video_id: str) -> List[Any]:
+    """
+    List a video's caption tracks, reusing a recent listing if there is one.
+
+    Args:
+        video_id (str): YouTube video ID
+
+    Returns:
+        List: Track objects from youtube_transcript_api
+
+    Raises:
+        The youtube_transcript_api exception for the failure, or a
+        utils.resilience.ResilienceError (nothing is cached then).
+    """
+    # Imported on first use so that importing this module stays cheap
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    def request():
+        return list(get_backend("youtube").call(
+            lambda remaining: call_with_timeout(lambda: YouTubeTranscriptApi.list_transcripts(video_id), remaining)))
+
+    return get_track_listing_cache().get_or_compute(video_id, request)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="transcript-fetch")
+    return _executor
+
+
+def _submit(candidate: Candidate):
+    # Run in a copy of the caller's context so the fetch is attached to the caller's trace
+    return _get_executor().submit(contextvars.copy_context().run, candidate.fetch)
+
+
+def _fetch_hedged(primary: Candidate, secondary: Candidate, hedge_delay: float, errors: List[Exception]):
+    """
+    Fetch the primary track, starting the secondary if the primary is slow or fails.
+
+    The primary is always preferred: once the secondary has arrived, the primary gets
+    one more hedge_delay before the secondary is used instead.
+    """
+    first = _submit(primary)
+    try:
+        return primary, first.result(timeout=hedge_delay)
+    except TimeoutError:
+        pass
+    except Exception as e:
+        errors.append(e)
+        first = None
+
+    second = _submit(secondary)
+    if first is None:
+        try:
+            return secondary, second.result()
+        except Exception as e:
+            errors.append(e)
+            return None
+
+    done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+    if first not in done:
+        if second.exception() is None:
+            wait([first], timeout=hedge_delay)
+        else:
+            wait([first])
+    if first.done() and first.exception() is None:
+        return primary, first.result()
+    if first.done():
+        errors.append(first.exception())
+    try:
+        return secondary, second.result()
+    except Exception as e:
+        errors.append(e)
+        return None
+
+
+def resolve_transcript(
+    video_id: str,
+    languages: Optional[List[str]] = None,
+    allow_fallback: bool = True,
+    hedge: bool = HEDGE_FETCH,
+    hedge_delay: float = HEDGE_DELAY,
+) -> TranscriptResult:
+    """
+    Resolve a video's transcript with one listing request and (usually) one fetch.
+
+    The track listing is cached per video, candidates are ranked by rank_tracks and
+    fetched best first; with hedge, the runner-up is fetched in parallel when the best
+    track is slow. Failures are reported through the result's status, never raised.
+
+    Args:
+        video_id (str): YouTube video ID
+        languages (List[str], optional): Preferred language codes (default ['en'])
+        allow_fallback (bool): Accept translations and other languages when no preferred track exists
+        hedge (bool): Fetch the runner-up in parallel if the best track is slow
+        hedge_delay (float): Seconds to wait for the best track before hedging
+
+    Returns:
+        TranscriptResult: The transcript and its track metadata, or the failure status
+    """
+    from youtube_transcript_api import (
+        NoTranscriptAvailable, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+    )
+
+    languages = languages or ["en"]
+    with span("youtube.resolve", hedge=hedge) as attrs:
+        try:
+            tracks = list_tracks(video_id)
+        except TranscriptsDisabled:
+            return TranscriptResult(video_id, STATUS_DISABLED)
+        except VideoUnavailable:
+            return TranscriptResult(video_id, STATUS_UNAVAILABLE)
+        except (NoTranscriptAvailable, NoTranscriptFound):
+            return TranscriptResult(video_id, STATUS_NOT_FOUND)
+        except Exception as e:
+            logger.warning("Listing transcripts failed for %s: %s", video_id, e)
+            return TranscriptResult(video_id, STATUS_ERROR, message=f"Error listing transcripts: {str(e)}")
+
+        candidates = rank_tracks(tracks, languages, allow_fallback)[:MAX_FETCH_ATTEMPTS]
+        attrs["tracks"] = len(tracks)
+        if not candidates:
+            return TranscriptResult(video_id, STATUS_NOT_FOUND)
+
+        errors: List[Exception] = []
+        fetched = None
+        remaining = candidates
+        if hedge and len(candidates) > 1:
+            fetched = _fetch_hedged(candidates[0], candidates[1], hedge_delay, errors)
+            remaining = candidates[2:]
+        for candidate in remaining:
+            if fetched is not None:
+                break
+            try:
+                fetched = candidate, candidate.fetch()
+            except Exception as e:
+                logger.warning("Fetching %r failed for %s: %s", candidate, video_id, e)
+                errors.append(e)
+
+        attrs["attempts"] = len(errors) + (1 if fetched else 0)
+        if fetched is None:
+            return TranscriptResult(video_id, STATUS_ERROR, message=f"Error fetching transcript: {str(errors[-1])}")
+
+        candidate, segments = fetched
+        attrs["language_code"] = candidate.language_code
+        return TranscriptResult(
+            video_id,
+            STATUS_OK,
+            Transcript.from_segments(segments),
+            language_code=candidate.language_code,
+            is_generated=bool(candidate.track.is_generated),
+            translated_from=candidate.track.language_code if candidate.translate_to else None,
+        )
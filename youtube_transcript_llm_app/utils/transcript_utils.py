@@ -1,14 +1,22 @@
 # Functions for YouTube transcript processing
-from pytube import YouTube
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
-import requests
-import json
+import html
+import logging
+import os
 import re
-import time
-import urllib.request
-import urllib.parse
 from typing import List, Dict, Optional
 from urllib.parse import urlparse, parse_qs
+from .transcript_cache import get_transcript_cache, KIND_SEGMENTS, KIND_RESOLVED
+from .shared_cache import get_shared_cache
+from .http_session import get_session, DEFAULT_TIMEOUT
+from .transcript import Transcript
+from .instrumentation import span
+from .resilience import get_backend
+from .normalize import normalize_result
+from .transcript_resolver import (
+    TranscriptResult, resolve_transcript, STATUS_DISABLED, STATUS_NOT_FOUND, STATUS_UNAVAILABLE, STATUS_ERROR
+)
+
+logger = logging.getLogger(__name__)
 
 def extract_video_id(url: str) -> Optional[str]:
     """
@@ -69,55 +77,55 @@ def get_transcript(video_id_or_url: str, languages: Optional[List[str]] = None)
     Returns:
         str: Full transcript text or error message
     """
+    return get_transcript_result(video_id_or_url, languages).text
+
+def get_transcript_result(video_id_or_url: str, languages: Optional[List[str]] = None) -> TranscriptResult:
+    """
+    Resolve the transcript for a YouTube video into a structured result.
+
+    Lists the video's caption tracks once, picks the best one for the preferred
+    languages (manual before auto-generated, then translations, then any language)
+    and fetches only that track. Results, including "disabled" and "not found",
+    are kept in the persistent transcript cache. The transcript is then cleaned by
+    utils.normalize according to TRANSCRIPT_NORMALIZE.
+
+    Args:
+        video_id_or_url (str): YouTube video ID or URL
+        languages (List[str], optional): Preferred language codes (e.g., ['en', 'en-US'])
+
+    Returns:
+        TranscriptResult: Check .ok, then use .transcript or .text; otherwise .status and .message
+    """
     # Check if input is a URL and extract video_id if needed
     video_id = video_id_or_url
     if "youtube" in video_id_or_url or "youtu.be" in video_id_or_url:
         video_id = extract_video_id(video_id_or_url)
         if not video_id:
-            return "Could not extract video ID from URL."
-    
+            return TranscriptResult(video_id_or_url, STATUS_ERROR, message="Could not extract video ID from URL.")
+
     if not languages:
         languages = ['en']
-        
-    try:
-        # First try to get the transcript in requested languages
-        try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
-            transcript = ' '.join([item['text'] for item in transcript_list])
-            return transcript
-        except NoTranscriptFound:
-            # If transcript not found in requested languages, try to get any available transcript
-            try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                available_transcript = next(iter(transcript_list), None)
-                
-                if available_transcript:
-                    # Try to translate to first requested language if possible
-                    try:
-                        translated_transcript = available_transcript.translate(languages[0])
-                        transcript_data = translated_transcript.fetch()
-                        transcript = ' '.join([item['text'] for item in transcript_data])
-                        return transcript
-                    except Exception:
-                        # If translation fails, use the original transcript
-                        transcript_data = available_transcript.fetch()
-                        transcript = ' '.join([item['text'] for item in transcript_data])
-                        return transcript
-                else:
-                    return "No transcript available for this video."
-            except Exception as list_err:
-                return f"Error listing transcripts: {str(list_err)}"
-                
-    except VideoUnavailable:
-        return "The video is unavailable. It might be private or removed."
-    except TranscriptsDisabled:
-        return "Transcripts are disabled for this video."
-    except Exception as e:
-        error_message = str(e)
-        if "no element found" in error_message:
-            return "No transcript available for this video. The creator may not have added captions."
-        else:
-            return f"Error fetching transcript: {error_message}"
+
+    with span("youtube.get_transcript") as attrs:
+        # Serve repeat videos from the persistent cache without touching the network
+        cache = get_transcript_cache()
+        if cache is not None:
+            cached = cache.get(video_id, languages, KIND_RESOLVED)
+            attrs["cache_hit"] = cached is not None
+            if cached is not None:
+                if cached.is_error:
+                    return TranscriptResult(video_id, cached.error_type, message=cached.value)
+                return normalize_result(TranscriptResult.from_dict(video_id, cached.value))
+
+        result = resolve_transcript(video_id, languages)
+        attrs["status"] = result.status
+
+        if cache is not None:
+            if result.ok:
+                cache.set(video_id, languages, KIND_RESOLVED, result.to_dict())
+            elif result.status in (STATUS_DISABLED, STATUS_NOT_FOUND):
+                cache.set_negative(video_id, languages, KIND_RESOLVED, result.status, result.message)
+        return normalize_result(result)
 
 def get_youtube_transcript(url: str, languages: Optional[List[str]] = None) -> List[Dict]:
     """
@@ -135,34 +143,163 @@ def get_youtube_transcript(url: str, languages: Optional[List[str]] = None) -> L
         VideoUnavailable: If video is private or removed.
         TranscriptsDisabled: If transcripts are disabled for the video.
         NoTranscriptFound: If no transcript is available in requested languages.
+        RuntimeError: If listing or fetching the transcript failed for another reason.
     """
+    from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+
     video_id = extract_video_id(url)
     if not video_id:
         raise ValueError(f"Could not extract video ID from URL: {url}")
 
+    languages = languages or ['en']
+
+    with span("youtube.get_segments") as attrs:
+        # Serve repeat videos (and known-missing transcripts) from the persistent cache
+        cache = get_transcript_cache()
+        if cache is not None:
+            cached = cache.get(video_id, languages, KIND_SEGMENTS)
+            attrs["cache_hit"] = cached is not None
+            if cached is not None:
+                if not cached.is_error:
+                    return cached.value
+                if cached.error_type == "disabled":
+                    raise TranscriptsDisabled(video_id)
+                raise NoTranscriptFound(video_id, languages, cached.value)
+
+        # Only tracks in the requested languages; the track listing is shared with get_transcript_result
+        result = resolve_transcript(video_id, languages, allow_fallback=False)
+        if result.ok:
+            transcript = result.transcript.to_segments()
+            attrs["segments"] = len(transcript)
+            if cache is not None:
+                cache.set(video_id, languages, KIND_SEGMENTS, transcript)
+            return transcript
+
+        if result.status == STATUS_UNAVAILABLE:
+            raise VideoUnavailable(video_id)
+        if result.status == STATUS_DISABLED:
+            if cache is not None:
+                cache.set_negative(video_id, languages, KIND_SEGMENTS, "disabled",
+                                   f"Transcripts are disabled for video '{video_id}'.")
+            raise TranscriptsDisabled(video_id)
+        if result.status == STATUS_NOT_FOUND:
+            message = f"No transcripts found for video '{video_id}' in languages {languages}."
+            if cache is not None:
+                cache.set_negative(video_id, languages, KIND_SEGMENTS, "not_found", message)
+            raise NoTranscriptFound(video_id, languages, message)
+        raise RuntimeError(result.message)
+
+def get_transcript_segments(url: str, languages: Optional[List[str]] = None) -> Transcript:
+    """
+    Fetch a video's timestamped transcript as a compact Transcript.
+
+    Args:
+        url (str): YouTube video URL or ID.
+        languages (List[str], optional): Preferred language codes (e.g., ['en', 'en-US']).
+
+    Returns:
+        Transcript: Columnar transcript with time-range and offset lookups.
+
+    Raises:
+        The same exceptions as get_youtube_transcript.
+    """
+    return Transcript.from_segments(get_youtube_transcript(url, languages))
+
+# Origin for oEmbed and watch-page requests; overridable so benchmarks can point it at a local server
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL", "https://www.youtube.com").rstrip("/")
+
+# Stop scanning a watch page after this many bytes if no <title> has shown up
+_TITLE_SCAN_LIMIT = 512 * 1024
+_TITLE_PATTERN = re.compile(r'<title>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+def get_video_metadata(video_id: str) -> Dict[str, str]:
+    """
+    Get lightweight metadata (title, author, thumbnail) for a YouTube video.
+
+    Uses YouTube's oEmbed endpoint, which returns a few hundred bytes of JSON,
+    and falls back to streaming the watch page until its <title> tag is found.
+    Results are memoized per video ID in the process-wide 'titles' cache.
+
+    Args:
+        video_id (str): YouTube video ID
+
+    Returns:
+        Dict[str, str]: Metadata with at least a 'title' key; empty if lookup failed
+    """
+    return get_shared_cache("titles", max_entries=4096, max_bytes=4 * 1024 * 1024).get_or_compute(
+        video_id,
+        lambda: _fetch_video_metadata(video_id),
+        should_cache=bool
+    )
+
+def _fetch_video_metadata(video_id: str) -> Dict[str, str]:
+    with span("youtube.video_metadata") as attrs:
+        metadata = _request_video_metadata(video_id)
+        attrs["found"] = bool(metadata)
+        return metadata
+
+def _youtube_get(url: str, **kwargs):
+    # GET through the YouTube rate limit, retry and circuit-breaker policy. Throttling and
+    # server errors are raised so they can be retried; other responses are returned as-is
+    def attempt(remaining: float):
+        response = get_session().get(url, timeout=(DEFAULT_TIMEOUT[0], min(DEFAULT_TIMEOUT[1], remaining)), **kwargs)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.close()
+            response.raise_for_status()
+        return response
+
+    return get_backend("youtube").call(attempt)
+
+def _request_video_metadata(video_id: str) -> Dict[str, str]:
+    video_url = f"{YOUTUBE_BASE_URL}/watch?v={video_id}"
+
+    # Method 1: oEmbed metadata endpoint
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(
-            video_id,
-            languages=languages or ['en']
-        )
-        return transcript
-
-    except VideoUnavailable:
-        raise VideoUnavailable(f"Video '{video_id}' is unavailable.")
-    except TranscriptsDisabled:
-        raise TranscriptsDisabled(f"Transcripts are disabled for video '{video_id}'.")
-    except NoTranscriptFound:
-        raise NoTranscriptFound(
-            f"No transcripts found for video '{video_id}' in languages {languages}."
+        response = _youtube_get(
+            f"{YOUTUBE_BASE_URL}/oembed",
+            params={"url": f"https://www.youtube.com/watch?v={video_id}", "format": "json"},
         )
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("title"):
+                return {
+                    "title": data["title"],
+                    "author_name": data.get("author_name", ""),
+                    "thumbnail_url": data.get("thumbnail_url", ""),
+                }
+    except Exception as e:
+        logger.warning("oEmbed lookup failed for %s: %s", video_id, e)
+
+    # Method 2: stream the watch page and stop as soon as <title> is seen
+    try:
+        with _youtube_get(video_url, stream=True) as response:
+            if response.status_code == 200:
+                buffer = b""
+                for chunk in response.iter_content(chunk_size=16 * 1024):
+                    buffer += chunk
+                    title_match = _TITLE_PATTERN.search(buffer.decode("utf-8", errors="ignore"))
+                    if title_match:
+                        title = html.unescape(title_match.group(1)).strip()
+                        if title.endswith(" - YouTube"):
+                            title = title[:-len(" - YouTube")]
+                        if title and title != "YouTube":
+                            return {"title": title}
+                        break
+                    if len(buffer) > _TITLE_SCAN_LIMIT:
+                        break
+    except Exception as e:
+        logger.warning("Watch page title extraction failed for %s: %s", video_id, e)
+
+    return {}
 
 def get_video_title(url):
     """
-    Get the title of a YouTube video using HTML parsing methods.
-    
+    Get the title of a YouTube video.
+
     Args:
         url (str): YouTube video URL
-        
+
     Returns:
         str: Video title
     """
@@ -170,49 +307,10 @@ def get_video_title(url):
     video_id = extract_video_id(url)
     if not video_id:
         return "Invalid YouTube URL"
-        
-    # Method 1: Try using requests to get HTML and extract title
-    try:
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
-        }
-        
-        response = requests.get(video_url, headers=headers)
-        
-        if response.status_code == 200:
-            # Try to extract title from HTML
-            title_match = re.search(r'<title>(.*?) - YouTube</title>', response.text)
-            if title_match:
-                return title_match.group(1)
-                
-            # Alternative pattern
-            title_match = re.search(r'"title":"(.*?)"', response.text)
-            if title_match:
-                return title_match.group(1)
-    except Exception as e:
-        print(f"HTML extraction error: {str(e)}")
-    
-    # Method 2: Try using urllib to get the page title
-    try:
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
-        
-        req = urllib.request.Request(
-            video_url, 
-            data=None, 
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            }
-        )
-        
-        with urllib.request.urlopen(req) as response:
-            html = response.read().decode('utf-8')
-            title_match = re.search(r'<title>(.*?) - YouTube</title>', html)
-            if title_match:
-                return title_match.group(1)
-    except Exception as e:
-        print(f"Urllib error: {str(e)}")
-        
-    # Method 3: Use video ID as title (ultimate fallback)
+
+    metadata = get_video_metadata(video_id)
+    if metadata.get("title"):
+        return metadata["title"]
+
+    # Use video ID as title (ultimate fallback)
     return f"YouTube Video (ID: {video_id})"
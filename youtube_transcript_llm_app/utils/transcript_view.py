@@ -0,0 +1,157 @@
+# Paged, searchable view of a timestamped transcript for the Streamlit UI
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from .transcript import Transcript, format_timestamp
+
+# Segments shown per page of the transcript viewer
+PAGE_SIZE = 50
+
+_WORD_PATTERN = re.compile(r"\w+")
+# Characters that Streamlit's markdown would otherwise interpret ($ starts LaTeX)
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]<>#|~$])")
+
+
+class TranscriptSearchIndex:
+    """
+    Inverted index from lowercase words to the segments that contain them.
+
+    Built once per video so that each search is a few posting-list intersections
+    rather than a scan of the full text. Every query word matches as a prefix
+    ('transcr' finds 'transcript'), so results update usefully while typing.
+    """
+
+    __slots__ = ("_vocabulary", "_postings")
+
+    def __init__(self, transcript: Transcript):
+        postings: Dict[str, array] = {}
+        for index in range(len(transcript)):
+            for word in set(_WORD_PATTERN.findall(transcript.segment_text(index).lower())):
+                postings.setdefault(word, array("I")).append(index)
+        self._vocabulary = sorted(postings)
+        self._postings = postings
+
+    def _matching(self, prefix: str) -> set:
+        # Segments containing any indexed word that starts with prefix
+        matches = set()
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            matches.update(self._postings[self._vocabulary[position]])
+            position += 1
+        return matches
+
+    def search(self, query: str) -> List[int]:
+        """
+        Find the segments containing every word of the query.
+
+        Args:
+            query (str): Search text
+
+        Returns:
+            List[int]: Matching segment indices in transcript order
+        """
+        words = sorted(set(_WORD_PATTERN.findall(query.lower())), key=len, reverse=True)
+        if not words:
+            return []
+        # Longest words first: they usually have the shortest posting lists
+        matches = self._matching(words[0])
+        for word in words[1:]:
+            if not matches:
+                break
+            matches &= self._matching(word)
+        return sorted(matches)
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(word) + len(postings) * postings.itemsize for word, postings in self._postings.items())
+
+
+def page_count(total: int, page_size: int = PAGE_SIZE) -> int:
+    """
+    Get the number of pages needed for a number of segments (at least one).
+
+    Args:
+        total (int): Number of segments
+        page_size (int): Segments per page
+
+    Returns:
+        int: Page count
+    """
+    return max(1, -(-total // page_size))
+
+
+def page_bounds(page: int, total: int, page_size: int = PAGE_SIZE) -> Tuple[int, int]:
+    """
+    Get the half-open range of positions shown on a page.
+
+    Args:
+        page (int): 1-based page number (clamped to the valid range)
+        total (int): Number of segments
+        page_size (int): Segments per page
+
+    Returns:
+        Tuple[int, int]: First position and one past the last
+    """
+    page = min(max(page, 1), page_count(total, page_size))
+    first = (page - 1) * page_size
+    return first, min(first + page_size, total)
+
+
+def timestamp_url(video_id: str, seconds: float) -> str:
+    """
+    Get a YouTube link that starts playback at a time offset.
+
+    Args:
+        video_id (str): YouTube video ID
+        seconds (float): Time offset in seconds
+
+    Returns:
+        str: Watch URL with a 't' parameter
+    """
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+
+def render_segments(transcript: Transcript, indices: Sequence[int], video_id: str, highlight: int = -1) -> str:
+    """
+    Render segments as markdown lines, each led by a link to its timestamp on YouTube.
+
+    Args:
+        transcript (Transcript): Transcript holding the segments
+        indices (Sequence[int]): Segment indices to render, in display order
+        video_id (str): YouTube video ID used in the links
+        highlight (int): Segment index to show in bold, if present
+
+    Returns:
+        str: Markdown text
+    """
+    lines = []
+    for index in indices:
+        start = transcript.starts[index]
+        text = _MARKDOWN_SPECIAL.sub(r"\\\1", transcript.segment_text(index))
+        if index == highlight:
+            text = f"**{text}**"
+        lines.append(f"[`{format_timestamp(start)}`]({timestamp_url(video_id, start)}) {text}")
+    # Two trailing spaces make a markdown line break
+    return "  \n".join(lines)
+
+
+def render_hits(hits: Sequence) -> str:
+    """
+    Render cross-video search hits as markdown lines, each led by a link to its video and time.
+
+    Args:
+        hits (Sequence): Hits with 'video_id', 'title', 'start', 'url' and 'text' (e.g. llm.corpus.CorpusHit)
+
+    Returns:
+        str: Markdown text
+    """
+    lines = []
+    for hit in hits:
+        source = _MARKDOWN_SPECIAL.sub(r"\\\1", hit.title or hit.video_id)
+        when = f" {format_timestamp(hit.start)}" if hit.start is not None else ""
+        text = _MARKDOWN_SPECIAL.sub(r"\\\1", hit.text)
+        lines.append(f"[**{source}**{when}]({hit.url}) {text}")
+    return "\n\n".join(lines)
+